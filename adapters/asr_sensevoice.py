@@ -3,22 +3,42 @@ import os, sys, time
 import numpy as np
 from pathlib import Path
 import config
+from adapters.asr_streaming import StreamingFbank
 
 
 class SenseVoiceAdapter:
     """
     Thin adapter around SenseVoiceAx + tokenizer.
-    Exposes .infer_audio(audio_f32) -> str
+    Exposes .infer_audio(audio_f32, feats=None) -> str
+
+    Streaming front-end: new_stream() returns a StreamingFbank that the mic
+    listener feeds block by block; passing its frames as `feats` makes
+    SenseVoiceAx skip its own fbank pass over the whole utterance (its
+    FunASR-style frontend.fbank() hands them back), so a decode costs the
+    LFR/CMVN reshuffle plus one model pass.
     """
     def __init__(self):
         self._tok = None
         self._asr = None
         self._post = None
+        self._fbank_opts = None
+        self._feats_override = None
 
-    def init_asr(self):
+    def init_asr(self, stub: bool = False, stub_pass_ms: float = 0.0):
         """
         Initialize the SenseVoice ASR model and tokenizer.
+        stub: use StubSenseVoice (host-side work only, no accelerator needed)
         """
+        if stub:
+            from adapters.asr_stub import StubSenseVoice
+
+            self._asr = StubSenseVoice(max_len=256, pass_ms=stub_pass_ms)
+            self._post = lambda s: s
+            if config.ASR_STREAMING_FEATURES:
+                self._hook_frontend()
+            print("[ASR] SenseVoice stand-in initialized (no accelerator).")
+            return
+
         # Ensure the SENSEVOICE ROOT (that contains `utils/`) is on sys.path
         sv_root = Path(config.SENSEVOICE_DIR).resolve()
         sv_root_str = str(sv_root)
@@ -45,16 +65,48 @@ class SenseVoiceAdapter:
 
         # Postprocessing function
         self._post = rich_transcription_postprocess
+        if config.ASR_STREAMING_FEATURES:
+            self._hook_frontend()
         print("[ASR] SenseVoice initialized successfully.")
 
+    def _hook_frontend(self):
+        frontend = getattr(self._asr, "frontend", None)
+        opts = getattr(frontend, "opts", None)
+        if opts is None or not callable(getattr(frontend, "fbank", None)):
+            print("[ASR] SenseVoice frontend has no fbank()/opts, streaming features disabled.")
+            return
+        compute_fbank = frontend.fbank
+
+        def fbank(waveform):
+            feats = self._feats_override
+            if feats is None:
+                return compute_fbank(waveform)
+            return feats, np.array(feats.shape[0]).astype(np.int32)
+
+        frontend.fbank = fbank
+        self._fbank_opts = opts
+
+    def new_stream(self):
+        """A StreamingFbank for one utterance, or None when streaming features are off."""
+        if self._fbank_opts is None:
+            return None
+        return StreamingFbank(self._fbank_opts)
+
 
-    def infer_audio(self, audio_f32: np.ndarray) -> str:
+    def infer_audio(self, audio_f32: np.ndarray, feats: np.ndarray | None = None) -> str:
         """
         audio_f32: mono float32 @ 16kHz
+        feats: fbank frames of exactly this audio (StreamingFbank.features()),
+               used instead of recomputing them
         Returns a single concatenated text string (post-processed).
         """
         t0 = time.time()
-        res = self._asr.infer(audio_f32, print_rtf=False)
+        if feats is not None and self._fbank_opts is not None:
+            self._feats_override = np.asarray(feats, dtype=np.float32)
+        try:
+            res = self._asr.infer(audio_f32, print_rtf=False)
+        finally:
+            self._feats_override = None
         text = " ".join(self._post(s) for s in res).strip()
         # latency = time.time() - t0
         return text
@@ -0,0 +1,40 @@
+# AImy/adapters/asr_streaming.py
+import numpy as np
+import kaldi_native_fbank as knf
+
+
+class StreamingFbank:
+    """
+    Fbank features for one utterance, computed block by block while the
+    user is still speaking. Uses the model frontend's own FbankOptions, so
+    the frames match what SenseVoice would compute from the whole
+    utterance; at commit only the last block's frames are new.
+    """
+
+    def __init__(self, opts, sample_rate: int = 16000, initial_frames: int = 512):
+        self.sample_rate = sample_rate
+        self._fbank = knf.OnlineFbank(opts)
+        self._feats = np.empty((initial_frames, opts.mel_opts.num_bins), dtype=np.float32)
+        self.num_frames = 0
+        self.num_samples = 0
+
+    def accept(self, block: np.ndarray) -> int:
+        """Feed float32 samples in [-1, 1]; returns how many new frames are ready."""
+        # same int16 scale as the frontend's one-shot fbank
+        self._fbank.accept_waveform(self.sample_rate, (np.asarray(block, dtype=np.float32) * 32768.0).tolist())
+        self.num_samples += len(block)
+
+        ready = self._fbank.num_frames_ready
+        if ready > len(self._feats):
+            grown = np.empty((max(ready, 2 * len(self._feats)), self._feats.shape[1]), dtype=np.float32)
+            grown[:self.num_frames] = self._feats[:self.num_frames]
+            self._feats = grown
+        for i in range(self.num_frames, ready):
+            self._feats[i] = self._fbank.get_frame(i)
+        new = ready - self.num_frames
+        self.num_frames = ready
+        return new
+
+    def features(self) -> np.ndarray:
+        """Frames so far, [num_frames, num_bins] (a view; copy before keeping it)."""
+        return self._feats[:self.num_frames]
@@ -0,0 +1,71 @@
+# AImy/adapters/asr_stub.py
+import math
+import time
+
+import numpy as np
+import kaldi_native_fbank as knf
+
+
+class StubFrontend:
+    """SenseVoice's front-end settings (80-bin fbank, LFR 7/6) with the same fbank() shape."""
+
+    def __init__(self, lfr_m: int = 7, lfr_n: int = 6):
+        opts = knf.FbankOptions()
+        opts.frame_opts.samp_freq = 16000
+        opts.frame_opts.dither = 0
+        opts.frame_opts.window_type = "hamming"
+        opts.frame_opts.frame_shift_ms = 10
+        opts.frame_opts.frame_length_ms = 25
+        opts.mel_opts.num_bins = 80
+        opts.energy_floor = 0
+        self.opts = opts
+        self.lfr_m, self.lfr_n = lfr_m, lfr_n
+
+    def fbank(self, waveform: np.ndarray):
+        fbank_fn = knf.OnlineFbank(self.opts)
+        fbank_fn.accept_waveform(self.opts.frame_opts.samp_freq, (waveform * (1 << 15)).tolist())
+        frames = fbank_fn.num_frames_ready
+        mat = np.empty([frames, self.opts.mel_opts.num_bins], dtype=np.float32)
+        for i in range(frames):
+            mat[i, :] = fbank_fn.get_frame(i)
+        return mat, np.array(frames).astype(np.int32)
+
+    def lfr(self, feats: np.ndarray) -> np.ndarray:
+        """Stack lfr_m frames every lfr_n (left-padded with the first frame)."""
+        if len(feats) == 0:
+            return np.zeros((0, feats.shape[1] * self.lfr_m), dtype=np.float32)
+        pad = (self.lfr_m - 1) // 2
+        padded = np.concatenate((np.repeat(feats[:1], pad, axis=0), feats))
+        n_out = math.ceil(len(feats) / self.lfr_n)
+        idx = np.minimum(np.arange(n_out)[:, None] * self.lfr_n + np.arange(self.lfr_m)[None, :], len(padded) - 1)
+        return padded[idx].reshape(n_out, -1)
+
+
+class StubSenseVoice:
+    """
+    Stand-in for SenseVoiceAx when there is no accelerator (or no model):
+    the host-side work (fbank, LFR, CMVN, per-window batching) is real,
+    the model pass is a sleep of pass_ms per max_len window, and the
+    "transcript" just names the audio length. Used to profile the
+    pipeline around the model anywhere.
+    """
+
+    def __init__(self, max_len: int = 256, pass_ms: float = 0.0):
+        self.frontend = StubFrontend()
+        self.max_len = max_len
+        self.pass_ms = pass_ms
+        dim = self.frontend.opts.mel_opts.num_bins * self.frontend.lfr_m
+        self._mean = np.zeros(dim, dtype=np.float32)
+        self._istd = np.ones(dim, dtype=np.float32)
+
+    def infer(self, audio, print_rtf: bool = False):
+        feats, _ = self.frontend.fbank(np.asarray(audio, dtype=np.float32))
+        feats = (self.frontend.lfr(feats) - self._mean) * self._istd
+        windows = max(1, math.ceil(len(feats) / self.max_len))
+        for w in range(windows):
+            chunk = feats[w * self.max_len:(w + 1) * self.max_len]
+            batch = np.zeros((1, self.max_len, feats.shape[1]), dtype=np.float32)
+            batch[0, :len(chunk)] = chunk
+            if self.pass_ms:
+                time.sleep(self.pass_ms / 1000)
+        return [f"<stub {len(audio) / 16000:.2f}s>"]
@@ -0,0 +1,97 @@
+# AImy/adapters/llm_buffers.py
+import numpy as np
+from ml_dtypes import bfloat16
+
+MASK_NEG = -65536
+
+
+class LLMBufferArena:
+    """
+    Input tensors for the Qwen layer sessions, allocated once and updated in
+    place so the decode loop does no per-step numpy allocation.
+
+      decode : indices (1,1) uint32, input (1,1,H) bf16, mask (1,1,N+1) bf16
+      prefill: indices (1,P) uint32, input (1,P,H) bf16, one mask per cache
+               window width (built lazily, reused across requests)
+
+    Also tracks host-side time per decoded token (step wall time minus the
+    time spent inside session.run).
+    """
+
+    def __init__(self, hidden_size: int, kv_len: int, prefill_len: int, expand_len: int):
+        self.hidden_size = hidden_size
+        self.kv_len = kv_len
+        self.prefill_len = prefill_len
+        self.expand_len = expand_len
+
+        # decode
+        self.indices = np.zeros((1, 1), dtype=np.uint32)
+        self.input = np.zeros((1, 1, hidden_size), dtype=bfloat16)
+        self.mask = np.full((1, 1, kv_len + 1), MASK_NEG, dtype=bfloat16)
+
+        # prefill
+        self.prefill_indices = np.zeros((1, prefill_len), dtype=np.uint32)
+        self.prefill_input = np.zeros((1, prefill_len, hidden_size), dtype=bfloat16)
+        self.empty_cache = np.zeros((1, 1, hidden_size), dtype=bfloat16)
+        self._prefill_masks = {}
+        self._causal = np.where(
+            np.tril(np.ones((prefill_len, prefill_len), dtype=bool)), 0, MASK_NEG
+        ).astype(bfloat16)
+        self._arange = np.arange(prefill_len, dtype=np.uint32)
+
+        # host overhead counter
+        self.host_s = 0.0
+        self.tokens = 0
+
+    # ---------- decode ----------
+    def reset_decode_mask(self, visible: int):
+        """Positions [0, visible) attend, everything else is masked."""
+        self.mask[..., :visible] = 0
+        self.mask[..., visible:self.kv_len] = MASK_NEG
+        self.mask[..., self.kv_len] = 0
+
+    def set_decode_input(self, pos: int, embed_row: np.ndarray):
+        self.indices[0, 0] = pos
+        self.input[0, 0, :] = embed_row
+
+    def open_position(self, pos: int):
+        self.mask[..., pos] = 0
+
+    # ---------- prefill ----------
+    def build_prefill_slice(self, embeds: np.ndarray, block_ids: list, pos: int, past_len: int):
+        """
+        Fill indices/input/mask for one prefill block of ids placed at
+        positions pos.., attending over a cache window of past_len rows.
+        Returns (indices, input, mask) views over the arena buffers.
+        """
+        P = self.prefill_len
+        n = len(block_ids)
+        np.add(self._arange, pos, out=self.prefill_indices[0])
+
+        data = self.prefill_input
+        data[0, :n, :] = embeds[block_ids]
+        if n < P:
+            data[0, n:, :] = 0
+
+        mask = self._prefill_masks.get(past_len)
+        if mask is None:
+            mask = np.empty((1, P, past_len + P), dtype=bfloat16)
+            self._prefill_masks[past_len] = mask
+        mask[0, :n, :pos] = 0
+        mask[0, :n, pos:past_len] = MASK_NEG
+        mask[0, :, past_len:] = self._causal
+        mask[0, n:, :] = MASK_NEG
+
+        return self.prefill_indices, data, mask
+
+    # ---------- host overhead ----------
+    def record_step(self, step_s: float, device_s: float):
+        self.host_s += max(0.0, step_s - device_s)
+        self.tokens += 1
+
+    def host_ms_per_token(self) -> float:
+        return 1000.0 * self.host_s / self.tokens if self.tokens else 0.0
+
+    def reset_counters(self):
+        self.host_s = 0.0
+        self.tokens = 0
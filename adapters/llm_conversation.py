@@ -0,0 +1,62 @@
+# AImy/adapters/llm_conversation.py
+import time
+
+
+class Conversation:
+    """
+    Multi-turn chat history for QwenAdapter.
+
+    Token layout (all ids, no text is kept):
+      system prefix ids  +  turn_0  +  turn_1  + ...  +  <new user turn>
+
+    The system prefix ends with the "<|im_start|>user" header and every stored
+    turn ends with the header for the next one, so dropping the oldest turns
+    always leaves a well-formed prompt.
+
+    kv_len counts the leading ids whose K/V rows are valid in the adapter's
+    working caches. It is only meaningful while the adapter reports this
+    conversation as resident; a new turn then prefills from kv_len instead
+    of from the start of the transcript.
+    """
+
+    def __init__(self, max_turns: int = 8, idle_reset_s: float | None = None):
+        self.max_turns = max_turns
+        self.idle_reset_s = idle_reset_s
+        self.turns = []        # list[list[int]]
+        self.kv_len = 0
+        self.last_used = 0.0
+        self.persona = None    # history is only valid under the persona it was built with
+
+    def reset(self):
+        self.turns = []
+        self.kv_len = 0
+
+    def is_stale(self, now: float | None = None) -> bool:
+        if not self.idle_reset_s or not self.turns:
+            return False
+        now = time.time() if now is None else now
+        return now - self.last_used > self.idle_reset_s
+
+    def history_len(self) -> int:
+        return sum(len(t) for t in self.turns)
+
+    def history_ids(self) -> list:
+        ids = []
+        for t in self.turns:
+            ids.extend(t)
+        return ids
+
+    def evict_to_fit(self, budget: int) -> int:
+        """
+        Drop oldest turns until the stored history is <= budget tokens and
+        there is room for one more turn under max_turns. Returns how many
+        turns were dropped; any drop shifts positions, so the resident K/V
+        is no longer reusable.
+        """
+        dropped = 0
+        while self.turns and (self.history_len() > budget or len(self.turns) >= self.max_turns):
+            self.turns.pop(0)
+            dropped += 1
+        if dropped:
+            self.kv_len = 0
+        return dropped
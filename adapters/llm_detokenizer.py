@@ -0,0 +1,51 @@
+# AImy/adapters/llm_detokenizer.py
+
+
+class IncrementalDetokenizer:
+    """
+    Turns a stream of token ids into text deltas.
+
+    Decoding single tokens breaks multi-byte characters and BPE pieces whose
+    spacing depends on their neighbours; re-decoding the whole output every
+    step is O(n^2). Instead this keeps two offsets into the generated ids:
+
+      prefix_offset : start of a short context window that is re-decoded
+      read_offset   : ids before this have already been emitted
+
+    Each push decodes only ids[prefix_offset:], which stays a handful of
+    tokens long, and emits the text beyond what ids[prefix_offset:read_offset]
+    decoded to. Text ending in U+FFFD (an incomplete UTF-8 sequence) is held
+    back until the next token completes it.
+    """
+
+    def __init__(self, tokenizer, skip_special_tokens: bool = True):
+        self.tokenizer = tokenizer
+        self.skip_special_tokens = skip_special_tokens
+        self.ids = []
+        self.prefix_offset = 0
+        self.read_offset = 0
+
+    def _decode(self, ids) -> str:
+        return self.tokenizer.decode(ids, skip_special_tokens=self.skip_special_tokens)
+
+    def push(self, token_id: int) -> str:
+        self.ids.append(token_id)
+
+        prefix_text = self._decode(self.ids[self.prefix_offset:self.read_offset])
+        new_text = self._decode(self.ids[self.prefix_offset:])
+
+        if len(new_text) > len(prefix_text) and not new_text.endswith("�"):
+            delta = new_text[len(prefix_text):]
+            self.prefix_offset = self.read_offset
+            self.read_offset = len(self.ids)
+            return delta
+        return ""
+
+    def flush(self) -> str:
+        """Emit anything still held back (e.g. a dangling partial character)."""
+        if self.read_offset >= len(self.ids):
+            return ""
+        prefix_text = self._decode(self.ids[self.prefix_offset:self.read_offset])
+        new_text = self._decode(self.ids[self.prefix_offset:])
+        self.prefix_offset = self.read_offset = len(self.ids)
+        return new_text[len(prefix_text):].rstrip("�")
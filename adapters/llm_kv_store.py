@@ -0,0 +1,96 @@
+# AImy/adapters/llm_kv_store.py
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+from ml_dtypes import bfloat16
+
+
+def model_fingerprint(*paths) -> str:
+    """
+    Cheap identity for a model build: names, sizes and mtimes of every file
+    under the given paths. Any re-export or re-download changes it.
+    """
+    h = hashlib.sha256()
+    for root in paths:
+        root = Path(root)
+        if not root.exists():
+            continue
+        for p in sorted(root.rglob("*")):
+            if p.is_file() and not p.name.endswith((".tmp", ".bf16.npy", ".kv.npy", ".kv.json")):
+                st = p.stat()
+                h.update(f"{p.relative_to(root)}:{st.st_size}:{int(st.st_mtime)}".encode())
+    return h.hexdigest()[:16]
+
+
+def ids_fingerprint(token_ids: list) -> str:
+    return hashlib.sha256(np.asarray(token_ids, dtype=np.int64).tobytes()).hexdigest()[:16]
+
+
+class KVSnapshotStore:
+    """
+    On-disk prefilled K/V for fixed prompt prefixes (one per persona).
+
+    Each snapshot is two files in `root`:
+      <name>-<model>-<ids>.kv.npy   uint16 array (2, layers, n, kv_dim) = bf16 K and V
+      <name>-<model>-<ids>.kv.json  token ids + metadata
+
+    The key includes the model fingerprint and a hash of the prefix token
+    ids, so a changed prompt, template, tokenizer or model never loads stale
+    rows. Loads are memory-mapped: boot costs no prefill and pages are read
+    on the first copy into the working cache.
+    """
+
+    def __init__(self, root: Path, model_id: str):
+        self.root = Path(root)
+        self.model_id = model_id
+
+    def _base(self, name: str, token_ids: list) -> Path:
+        return self.root / f"{name}-{self.model_id}-{ids_fingerprint(token_ids)}"
+
+    def load(self, name: str, token_ids: list):
+        """Returns (k_list, v_list) of memmapped bf16 views, or None."""
+        base = self._base(name, token_ids)
+        npy, meta = base.with_suffix(".kv.npy"), base.with_suffix(".kv.json")
+        if not npy.exists() or not meta.exists():
+            return None
+        try:
+            info = json.loads(meta.read_text())
+            if info.get("token_ids") != list(token_ids):
+                return None
+            arr = np.load(npy, mmap_mode="r").view(bfloat16)
+        except (OSError, ValueError) as e:
+            logger.warning(f"[LLM] KV snapshot {npy.name} unreadable: {e}")
+            return None
+        return list(arr[0][:, None]), list(arr[1][:, None])
+
+    def save(self, name: str, token_ids: list, k_list: list, v_list: list):
+        self.root.mkdir(parents=True, exist_ok=True)
+        base = self._base(name, token_ids)
+        npy, meta = base.with_suffix(".kv.npy"), base.with_suffix(".kv.json")
+
+        n = len(token_ids)
+        layers = len(k_list)
+        kv_dim = k_list[0].shape[-1]
+        tmp = str(npy) + ".tmp"
+        out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.uint16, shape=(2, layers, n, kv_dim))
+        for i in range(layers):
+            out[0, i] = k_list[i].reshape(n, kv_dim).view(np.uint16)
+            out[1, i] = v_list[i].reshape(n, kv_dim).view(np.uint16)
+        out.flush()
+        del out
+        os.replace(tmp, npy)
+        meta.write_text(json.dumps({"name": name, "model": self.model_id, "token_ids": list(token_ids)}))
+
+        # drop older snapshots for this name (previous prompt / model versions)
+        # (the glob also matches personas named "<name>-…", so compare the parsed name)
+        for old in self.root.glob(f"{name}-*.kv.*"):
+            stem = old.name.split(".kv.")[0]
+            if stem.rsplit("-", 2)[0] == name and stem != base.name:
+                try:
+                    old.unlink()
+                except OSError:
+                    pass
@@ -0,0 +1,137 @@
+# AImy/adapters/llm_limits.py
+import time
+from dataclasses import dataclass, field, fields
+
+import config
+from adapters.sentence_boundary import sentence_end
+
+
+@dataclass
+class GenerationLimits:
+    """
+    Per-request bounds on a Qwen generation. None / 0 disables a limit.
+
+      max_new_tokens     : hard cap on generated tokens
+      stop               : stop strings (not included in the output)
+      deadline_s         : wall-clock budget from the start of the request
+      repeat_ngram       : n for the repetition detector ...
+      repeat_max         : ... stop once any n-gram has been generated this often
+      voice_target_chars : end at the first sentence boundary past this length
+    """
+    max_new_tokens: int | None = None
+    stop: list = field(default_factory=list)
+    deadline_s: float | None = None
+    repeat_ngram: int = 0
+    repeat_max: int = 0
+    voice_target_chars: int | None = None
+
+    @classmethod
+    def from_payload(cls, overrides: dict | None = None, voice: bool = False) -> "GenerationLimits":
+        """config defaults, then any keys from a REQUEST_LLM "limits" dict."""
+        limits = cls(
+            max_new_tokens=config.LLM_MAX_NEW_TOKENS,
+            stop=list(config.LLM_STOP_STRINGS),
+            deadline_s=config.LLM_DEADLINE_S,
+            repeat_ngram=config.LLM_REPEAT_NGRAM,
+            repeat_max=config.LLM_REPEAT_MAX,
+            voice_target_chars=config.LLM_VOICE_TARGET_CHARS if voice else None,
+        )
+        names = {f.name for f in fields(cls)}
+        for k, v in (overrides or {}).items():
+            if k in names:
+                setattr(limits, k, list(v) if k == "stop" else v)
+        return limits
+
+
+class LimitTracker:
+    """
+    Applies GenerationLimits to one generation.
+
+      on_token(id)     -> stop reason or None (token count, repetition, deadline)
+      on_text(delta)   -> (text safe to emit, stop reason or None)
+      finish()         -> text held back for a possible stop string
+
+    Text that could still turn out to be the start of a stop string is held
+    back, so streamed consumers never see a partial stop sequence.
+    """
+
+    def __init__(self, limits: GenerationLimits, start_time: float | None = None):
+        self.limits = limits
+        self.start_time = time.monotonic() if start_time is None else start_time
+        self.n_tokens = 0
+        self.reason = None
+
+        self._ngrams = {}
+        self._recent = []
+
+        self._text = ""
+        self._emitted = 0
+        self._hold = max((len(s) for s in limits.stop), default=1) - 1
+
+    # ---------- token-level ----------
+    def on_token(self, token_id: int):
+        lim = self.limits
+        self.n_tokens += 1
+
+        if lim.max_new_tokens and self.n_tokens >= lim.max_new_tokens:
+            return self._stop("max_new_tokens")
+
+        if lim.deadline_s and time.monotonic() - self.start_time >= lim.deadline_s:
+            return self._stop("deadline")
+
+        n = lim.repeat_ngram
+        if n and lim.repeat_max:
+            self._recent.append(token_id)
+            if len(self._recent) > n:
+                self._recent.pop(0)
+            if len(self._recent) == n:
+                key = tuple(self._recent)
+                count = self._ngrams.get(key, 0) + 1
+                self._ngrams[key] = count
+                if count >= lim.repeat_max:
+                    return self._stop("repetition")
+        return None
+
+    # ---------- text-level ----------
+    def on_text(self, delta: str):
+        if self.reason in ("stop", "voice_target") or not delta:
+            return "", None
+
+        start = max(0, len(self._text) - self._hold)
+        self._text += delta
+        lim = self.limits
+
+        cut = None
+        for s in lim.stop:
+            if not s:
+                continue
+            i = self._text.find(s, start)
+            if i >= 0 and (cut is None or i < cut):
+                cut = i
+        if cut is not None:
+            self._text = self._text[:cut]
+            return self._take(len(self._text)), self._stop("stop")
+
+        if lim.voice_target_chars and len(self._text) >= lim.voice_target_chars:
+            end = sentence_end(self._text, max(0, lim.voice_target_chars - 1))
+            if end is not None:
+                self._text = self._text[:end].rstrip()
+                return self._take(len(self._text)), self._stop("voice_target")
+
+        return self._take(len(self._text) - self._hold), None
+
+    def finish(self) -> str:
+        if self.reason in ("stop", "voice_target"):
+            return ""
+        return self._take(len(self._text))
+
+    def _take(self, end: int) -> str:
+        if end <= self._emitted:
+            return ""
+        out = self._text[self._emitted:end]
+        self._emitted = end
+        return out
+
+    def _stop(self, reason: str):
+        self.reason = reason
+        return reason
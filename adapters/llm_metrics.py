@@ -0,0 +1,98 @@
+# AImy/adapters/llm_metrics.py
+import threading
+from dataclasses import dataclass, field
+
+from adapters.llm_speculative import SpeculativeStats
+
+
+@dataclass
+class GenerationMetrics:
+    """Timings for one QwenAdapter request (seconds unless noted)."""
+    n_layers: int = 0
+    prompt_tokens: int = 0
+    reused_tokens: int = 0          # K/V rows reused (system prefix / conversation)
+    new_tokens: int = 0
+    prefill_slice_s: list = field(default_factory=list)
+    ttft_s: float = 0.0             # request start -> first token sampled
+    decode_s: float = 0.0           # all decode steps (layers + post + sampling)
+    sample_s: float = 0.0
+    layer_run_s: list = field(default_factory=list)   # decode session.run time per layer
+    host_ms_per_token: float = 0.0
+    total_s: float = 0.0
+    kv_slides: int = 0              # sliding-window re-prefills
+    spec: SpeculativeStats = field(default_factory=SpeculativeStats)
+    stop_reason: str | None = None
+
+    def __post_init__(self):
+        if not self.layer_run_s:
+            self.layer_run_s = [0.0] * self.n_layers
+
+    @property
+    def prefill_s(self) -> float:
+        return sum(self.prefill_slice_s)
+
+    @property
+    def tokens_per_s(self) -> float:
+        # the first token comes out of prefill; the rest are decode steps
+        steps = self.new_tokens - 1
+        return steps / self.decode_s if steps > 0 and self.decode_s > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "reused_tokens": self.reused_tokens,
+            "new_tokens": self.new_tokens,
+            "prefill_s": round(self.prefill_s, 4),
+            "prefill_slice_s": [round(t, 4) for t in self.prefill_slice_s],
+            "ttft_s": round(self.ttft_s, 4),
+            "decode_s": round(self.decode_s, 4),
+            "sample_s": round(self.sample_s, 4),
+            "layer_run_s": [round(t, 4) for t in self.layer_run_s],
+            "host_ms_per_token": round(self.host_ms_per_token, 3),
+            "tokens_per_s": round(self.tokens_per_s, 2),
+            "total_s": round(self.total_s, 4),
+            "kv_slides": self.kv_slides,
+            "speculative": self.spec.as_dict(),
+            "stop_reason": self.stop_reason,
+        }
+
+
+class LLMStats:
+    """Running totals over requests plus the most recent GenerationMetrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_tokens = 0
+        self.ttft_s = 0.0
+        self.prefill_s = 0.0
+        self.decode_s = 0.0
+        self.stop_reasons = {}
+        self.spec = SpeculativeStats()
+        self.last = None
+
+    def record(self, m: GenerationMetrics):
+        with self._lock:
+            self.requests += 1
+            self.new_tokens += m.new_tokens
+            self.ttft_s += m.ttft_s
+            self.prefill_s += m.prefill_s
+            self.decode_s += m.decode_s
+            self.stop_reasons[m.stop_reason] = self.stop_reasons.get(m.stop_reason, 0) + 1
+            self.spec.add(m.spec)
+            self.last = m
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            n = self.requests
+            steps = self.new_tokens - n
+            return {
+                "requests": n,
+                "new_tokens": self.new_tokens,
+                "avg_ttft_s": round(self.ttft_s / n, 4) if n else 0.0,
+                "avg_prefill_s": round(self.prefill_s / n, 4) if n else 0.0,
+                "avg_tokens_per_s": round(steps / self.decode_s, 2) if steps > 0 and self.decode_s else 0.0,
+                "stop_reasons": dict(self.stop_reasons),
+                "speculative": self.spec.as_dict(),
+                "last": self.last.as_dict() if self.last else None,
+            }
@@ -1,10 +1,24 @@
 # AImy/adapters/llm_qwen.py
-import sys, os
+import sys, os, time
+import hashlib
+import json
+from collections import namedtuple
+from pathlib import Path
 import numpy as np
 import config
+from loguru import logger
 from ml_dtypes import bfloat16
+import transformers
 from transformers import AutoTokenizer, AutoConfig
 from axengine import InferenceSession
+from adapters.llm_buffers import LLMBufferArena
+from adapters.llm_sampler import Sampler
+from adapters.llm_detokenizer import IncrementalDetokenizer
+from adapters.llm_limits import GenerationLimits, LimitTracker
+from adapters.llm_metrics import GenerationMetrics, LLMStats
+from adapters.llm_kv_store import KVSnapshotStore, model_fingerprint
+from adapters.llm_speculative import PromptLookupDrafter
+from adapters.llm_sessions import KVSwapStore
 
 # ====== Constants ======
 SYSTEM_PROMPT = config.LLM_SYSTEM_PROMPT
@@ -16,49 +30,17 @@ INPUT_PREFILL_LEN = 128
 KV_MASK_EXPAND_LEN = 128
 LAST_N = 2559
 
-def _softmax_np(x: np.ndarray) -> np.ndarray:
-    x = x - x.max()
-    e = np.exp(x)
-    return e / e.sum()
-
-def _top_p(prob: np.ndarray, p: float) -> np.ndarray:
-    idx = np.argsort(prob)[::-1]
-    res = prob.copy()
-    cum = 0.0
-    cutoff = False
-    for i in idx:
-        cum += res[i]
-        if cum >= p:
-            cutoff = True
-            continue
-        if cutoff:
-            res[i] = 0.0
-    s = res.sum()
-    if s > 0:
-        res = res / s
-    return res
-
-def _sample_logits_to_id(logits: np.ndarray, topk=TOPK, topp=TOPP, temperature=TEMPERATURE) -> int:
-    r = logits.astype(np.float32).flatten()
-    # topk
-    cand_idx = np.argpartition(r, -topk)[-topk:]
-    cand_val = r[cand_idx]
-    # temp
-    cand_val = cand_val / temperature
-    # softmax
-    prob = _softmax_np(cand_val)
-    # topp
-    prob = _top_p(prob, topp)
-    prob = prob / prob.sum()
-    pos = np.random.multinomial(1, prob).argmax()
-    next_token = int(cand_idx[pos])
-    return next_token
-
-def _gen_slice_indices(token_len: int, prefill=INPUT_PREFILL_LEN, expand=KV_MASK_EXPAND_LEN):
-    remaining = max(0, token_len - prefill)
-    extra_blocks = (remaining + expand - 1) // expand
-    return list(range(extra_blocks + 1))
+# Prompts used to check tokenizer / template-fragment parity at init
+PARITY_SAMPLES = (
+    "What's the weather like today?",
+    "  leading spaces and trailing  ",
+    "Calculate 12.5% of $1,299.99, please.",
+    "Translate: 你好，世界 🌍",
+    "line one\nline two",
+)
 
+# One item from QwenAdapter.generate_tokens(); id is None for the final text flush
+GeneratedToken = namedtuple("GeneratedToken", ["id", "text"])
 
 class QwenAdapter:
     """
@@ -66,6 +48,8 @@ class QwenAdapter:
     Provides:
       - generate(user_text) -> full string
       - generate_stream(user_text, chunk_cb=callable) -> full string, emits chunks as they’re decoded
+      - generate_tokens(user_text) -> generator of GeneratedToken (the engine both use)
+      - stats() -> per-request timings and running totals
     """
 
     def __init__(self, hf_model_path: str, axmodel_path: str):
@@ -79,20 +63,73 @@ class QwenAdapter:
         self.v_caches = None
         self.sessions = None
         self.post_session = None
+        self._arena = None
+        self.last_stop_reason = None
+
+        # per-request timings (set while a generation is running) + totals
+        self._metrics = None
+        self._stats = LLMStats()
+
+        self.sampler = Sampler(
+            topk=TOPK,
+            topp=TOPP,
+            temperature=TEMPERATURE,
+            repetition_penalty=config.LLM_REPETITION_PENALTY,
+            presence_penalty=config.LLM_PRESENCE_PENALTY,
+            seed=config.LLM_SEED,
+        )
+
+        # personas: name -> {"system", "ids", "k", "v"}; the active one's
+        # prefix (token ids + per-layer K/V rows) is mirrored below
+        self.personas = {}
+        self.persona = None
+        self._system_prompt = SYSTEM_PROMPT
+        self._prefix_ids = None
+        self._prefix_k = None
+        self._prefix_v = None
+
+        # fixed chat-template pieces around user/assistant content
+        self._user_tail_ids = None   # "<|im_end|>\n<|im_start|>assistant\n"
+        self._turn_sep_ids = None    # "\n<|im_start|>user\n" (after the reply's <|im_end|>)
+        self._fragments_ok = False
+
+        # conversation whose K/V rows currently sit in the working caches;
+        # other sessions' rows wait in host memory (None = always re-prefill)
+        self._kv_owner = None
+        self._kv_swap = None
+        if config.LLM_SESSION_SWAP_MB:
+            self._kv_swap = KVSwapStore(int(config.LLM_SESSION_SWAP_MB * 2**20))
+
+        # usable context (<= the LAST_N rows the decode sessions are compiled
+        # for) and what to do when a generation reaches it
+        self.max_context = min(int(config.LLM_MAX_CONTEXT), LAST_N)
+        self.kv_mode = config.LLM_KV_MODE          # "fixed" | "sliding"
+        self.kv_window = min(int(config.LLM_KV_WINDOW), self.max_context // 2)
+        self._kv_high_water = 0
+
+        # speculative prefill of a partial transcript: (owner, persona, ids)
+        # whose rows sit in the working caches until the next request
+        self._spec = None
+        self._spec_stats = {"prefills": 0, "hits": 0, "partial": 0, "misses": 0, "expired": 0, "reused_tokens": 0}
 
     # ---------- init ----------
     def init_model(self):
         self.cfg = AutoConfig.from_pretrained(self.hf_model_path, trust_remote_code=True)
-        self.tokenizer = AutoTokenizer.from_pretrained(self.hf_model_path, trust_remote_code=True, use_fast=False)
+        self.tokenizer = self._load_tokenizer()
 
         # embeddings
-        self.embeds = np.load(os.path.join(self.axmodel_path, "model.embed_tokens.weight.npy"))
+        self.embeds = self._load_embeddings()
 
         # caches
         kv_dim = self.cfg.hidden_size // self.cfg.num_attention_heads * self.cfg.num_key_value_heads
         self.k_caches = [np.zeros((1, LAST_N, kv_dim), dtype=bfloat16) for _ in range(self.cfg.num_hidden_layers)]
         self.v_caches = [np.zeros((1, LAST_N, kv_dim), dtype=bfloat16) for _ in range(self.cfg.num_hidden_layers)]
 
+        self._log_kv_memory()
+
+        # preallocated session inputs (decode + prefill)
+        self._arena = LLMBufferArena(self.cfg.hidden_size, LAST_N, INPUT_PREFILL_LEN, KV_MASK_EXPAND_LEN)
+
         # layer sessions
         self.sessions = []
         for i in range(self.cfg.num_hidden_layers):
@@ -102,176 +139,760 @@ class QwenAdapter:
         # postprocess session
         self.post_session = InferenceSession(os.path.join(self.axmodel_path, "qwen2_post.axmodel"))
 
+        # system prompt prefix: prefill once, reuse its K/V rows every request
+        self._init_system_prefix()
+
+    def _load_embeddings(self):
+        """
+        Returns the (vocab, hidden) embedding table as bfloat16.
+
+        With config.LLM_EMBED_MMAP the fp32 .npy is converted once to a
+        bf16 copy on disk (stored as uint16) and memory-mapped, so only rows
+        that are actually gathered become resident.
+        """
+        src = os.path.join(self.axmodel_path, "model.embed_tokens.weight.npy")
+        if not config.LLM_EMBED_MMAP:
+            return np.load(src).astype(bfloat16)
+
+        dst = str(config.QWEN_EMBED_BF16_PATH)
+        if not os.path.exists(dst) or os.path.getmtime(dst) < os.path.getmtime(src):
+            logger.info(f"[LLM] Converting embeddings to bf16 → {dst}")
+            t0 = time.time()
+            table = np.load(src, mmap_mode="r")
+            tmp = dst + ".tmp"
+            out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.uint16, shape=table.shape)
+            step = 8192
+            for r in range(0, table.shape[0], step):
+                out[r:r + step] = table[r:r + step].astype(bfloat16).view(np.uint16)
+            out.flush()
+            del out
+            os.replace(tmp, dst)
+            logger.info(f"[LLM] Embedding conversion done in {time.time() - t0:.1f}s")
+
+        return np.load(dst, mmap_mode="r").view(bfloat16)
+
     # ---------- prompt builder ----------
-    def _build_prompt_ids(self, user_text: str):
+    def _render_prompt(self, user_text: str, system: str | None = None) -> str:
         messages = [
-            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "system", "content": self._system_prompt if system is None else system},
             {"role": "user", "content": user_text}
         ]
-        text = self.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
-        model_inputs = self.tokenizer([text], return_tensors="pt").to("cpu")
-        token_ids = model_inputs.input_ids[0].cpu().numpy().tolist()
-        return token_ids
+        return self.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+
+    def _tokenize(self, text: str) -> list:
+        # plain python ids, no torch tensors
+        return self.tokenizer.encode(text, add_special_tokens=False)
+
+    def _build_prompt_ids(self, user_text: str):
+        """Only the user content is tokenized; template pieces are cached."""
+        if self._fragments_ok:
+            return self._prefix_ids + self._tokenize(user_text) + self._user_tail_ids
+        return self._tokenize(self._render_prompt(user_text))
+
+    # ---------- tokenizer ----------
+    def _load_tokenizer(self):
+        """
+        Slow (sentencepiece/python BPE) tokenizer by default. With
+        config.LLM_FAST_TOKENIZER the Rust tokenizer is used instead, after
+        checking it produces the same ids as the slow one on PARITY_SAMPLES.
+        The verdict is kept in config.LLM_TOKENIZER_PARITY_CACHE keyed by the
+        tokenizer files and library version, so the slow tokenizer is only
+        loaded the first time.
+        """
+        def slow():
+            return AutoTokenizer.from_pretrained(self.hf_model_path, trust_remote_code=True, use_fast=False)
+
+        if not config.LLM_FAST_TOKENIZER:
+            return slow()
+
+        try:
+            fast = AutoTokenizer.from_pretrained(self.hf_model_path, trust_remote_code=True, use_fast=True)
+        except Exception as e:
+            logger.warning(f"[LLM] Fast tokenizer unavailable ({e}); using slow tokenizer")
+            return slow()
+
+        if not config.LLM_TOKENIZER_PARITY_CHECK:
+            return fast
+
+        cache_path = config.LLM_TOKENIZER_PARITY_CACHE
+        samples = hashlib.sha256("\x00".join((SYSTEM_PROMPT,) + PARITY_SAMPLES).encode()).hexdigest()[:16]
+        key = f"{model_fingerprint(self.hf_model_path)}:{transformers.__version__}:{samples}"
+        verdicts = {}
+        if cache_path and Path(cache_path).exists():
+            try:
+                verdicts = json.loads(Path(cache_path).read_text())
+            except (OSError, ValueError):
+                verdicts = {}
+        if key in verdicts:
+            logger.info(f"[LLM] Fast tokenizer parity: cached {'pass' if verdicts[key] else 'mismatch'}")
+            return fast if verdicts[key] else slow()
+
+        ref = slow()
+        ok = True
+        for text in PARITY_SAMPLES:
+            rendered = ref.apply_chat_template(
+                [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": text}],
+                tokenize=False, add_generation_prompt=True,
+            )
+            for t in (text, rendered):
+                if ok and fast.encode(t, add_special_tokens=False) != ref.encode(t, add_special_tokens=False):
+                    logger.warning(f"[LLM] Fast tokenizer mismatch on {t[:40]!r}; using slow tokenizer")
+                    ok = False
+
+        if cache_path:
+            try:
+                Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+                Path(cache_path).write_text(json.dumps({**verdicts, key: ok}, indent=2))
+            except OSError as e:
+                logger.warning(f"[LLM] Could not save tokenizer parity result: {e}")
+        if not ok:
+            return ref
+        logger.info(f"[LLM] Fast tokenizer passed parity check ({len(PARITY_SAMPLES)} samples)")
+        return fast
+
+    def _check_fragments(self):
+        """Cached-fragment prompts must match full chat-template tokenization."""
+        for text in PARITY_SAMPLES:
+            full = self._tokenize(self._render_prompt(text))
+            pieced = self._prefix_ids + self._tokenize(text) + self._user_tail_ids
+            if full != pieced:
+                logger.warning(f"[LLM] Template fragments differ on {text[:40]!r}; tokenizing full prompts")
+                return False
+        return True
+
+    # ---------- system prefix cache / personas ----------
+    def _init_system_prefix(self):
+        """
+        Tokenize the fixed chat-template pieces, then for every persona
+        prefill everything before the user content (system turn + the
+        "<|im_start|>user" header) and keep its K/V rows. With
+        config.LLM_KV_SNAPSHOT_DIR the rows are persisted and later boots
+        memory-map them instead of running prefill.
+        """
+        sentinel = "\x00USER\x00"
+        tail_text = self._render_prompt(sentinel, SYSTEM_PROMPT).split(sentinel, 1)[1]
+        self._user_tail_ids = self._tokenize(tail_text)
+
+        eos = self.tokenizer.eos_token
+        sep = self.tokenizer.apply_chat_template(
+            [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": "a"},
+                {"role": "assistant", "content": sentinel},
+                {"role": "user", "content": sentinel},
+            ],
+            tokenize=False,
+        ).split(sentinel)[1]
+        if sep.startswith(eos):
+            sep = sep[len(eos):]
+        self._turn_sep_ids = self._tokenize(sep)
+
+        store = None
+        if config.LLM_CACHE_SYSTEM_PREFIX and config.LLM_KV_SNAPSHOT_DIR:
+            store = KVSnapshotStore(
+                config.LLM_KV_SNAPSHOT_DIR,
+                model_fingerprint(self.axmodel_path, self.hf_model_path),
+            )
+
+        personas = dict(config.LLM_PERSONAS) or {"default": SYSTEM_PROMPT}
+        for name, system in personas.items():
+            ids = self._tokenize(self._render_prompt(sentinel, system).split(sentinel, 1)[0])
+            entry = {"system": system, "ids": ids, "k": None, "v": None}
+            self.personas[name] = entry
+            if not config.LLM_CACHE_SYSTEM_PREFIX or not ids:
+                continue
+
+            loaded = store.load(name, ids) if store else None
+            if loaded:
+                entry["k"], entry["v"] = loaded
+                logger.info(f"[LLM] Persona '{name}' prefix loaded from snapshot ({len(ids)} tokens)")
+                continue
+
+            self._run_prefill(ids, 0)
+            n = len(ids)
+            entry["k"] = [k[:, :n, :].copy() for k in self.k_caches]
+            entry["v"] = [v[:, :n, :].copy() for v in self.v_caches]
+            if store:
+                store.save(name, ids, entry["k"], entry["v"])
+            logger.info(f"[LLM] Persona '{name}' prefix prefilled ({n} tokens)")
+
+        default = config.LLM_DEFAULT_PERSONA
+        self._activate_persona(default if default in self.personas else next(iter(self.personas)))
+        self._fragments_ok = self._check_fragments()
+
+    def _activate_persona(self, name: str | None) -> str:
+        """Make `name` the system prompt for the next request (None = default)."""
+        if name is None:
+            name = config.LLM_DEFAULT_PERSONA
+        if name not in self.personas:
+            logger.warning(f"[LLM] Unknown persona {name!r}, using {self.persona!r}")
+            return self.persona
+        if name != self.persona:
+            entry = self.personas[name]
+            self.persona = name
+            self._system_prompt = entry["system"]
+            self._prefix_ids = entry["ids"]
+            self._prefix_k = entry["k"]
+            self._prefix_v = entry["v"]
+        return name
+
+    def _use_system_prefix(self, token_ids: list) -> int:
+        """
+        If token_ids starts with the cached prefix, restore its K/V rows into
+        the working caches and return the position prefill should start at.
+        """
+        prefix = self._prefix_ids
+        if self._prefix_k is None or not prefix or len(token_ids) <= len(prefix) or token_ids[:len(prefix)] != prefix:
+            return 0
+
+        n = len(prefix)
+        for i in range(self.cfg.num_hidden_layers):
+            self.k_caches[i][:, :n, :] = self._prefix_k[i]
+            self.v_caches[i][:, :n, :] = self._prefix_v[i]
+        return n
+
+    # ---------- conversation turns ----------
+    def _prepare_prompt(self, user_text: str, conversation=None):
+        """
+        Returns (token_ids, start_pos, user_start). Without a conversation
+        this is the stateless two-message prompt; with one, the new user turn
+        is appended to the stored history and prefill resumes from the rows
+        still resident for that conversation.
+        """
+        spec, self._spec = self._spec, None
+
+        if conversation is None:
+            self._release_working_cache(None)
+            token_ids = self._fit_prompt(self._build_prompt_ids(user_text))
+            start_pos = self._use_system_prefix(token_ids)
+            return token_ids, self._reuse_spec(spec, None, token_ids, start_pos), 0
+
+        self._bind_conversation(conversation)
+        user_ids = self._fit_user_turn(self._tokenize(user_text) + self._user_tail_ids)
+        budget = self.max_context - config.LLM_REPLY_RESERVE - len(self._prefix_ids) - len(user_ids)
+        dropped = conversation.evict_to_fit(budget)
+        if dropped:
+            logger.info(f"[LLM] Conversation compacted: dropped {dropped} oldest turn(s)")
+
+        history = self._prefix_ids + conversation.history_ids()
+        token_ids = history + user_ids
+
+        reusable = 0 < conversation.kv_len <= len(history)
+        if self._kv_owner is conversation and reusable:
+            start_pos = conversation.kv_len
+        else:
+            self._release_working_cache(conversation)
+            start_pos = self._use_system_prefix(token_ids)
+            if self._kv_swap is not None:
+                if reusable and self._kv_swap.restore(
+                    conversation, self.k_caches, self.v_caches, start_pos, conversation.kv_len
+                ):
+                    start_pos = conversation.kv_len
+                else:
+                    self._kv_swap.drop(conversation)
+        self._kv_owner = conversation
+        return token_ids, self._reuse_spec(spec, conversation, token_ids, start_pos), len(history)
+
+    # ---------- speculative prefill ----------
+    def speculative_prefill(self, partial_text: str, conversation=None, persona=None):
+        """
+        Prefill the prompt for a partial transcript (without the assistant
+        header) and leave its rows in the working caches. If the next
+        request's prompt starts with the same ids, prefill resumes after
+        them; wherever it diverges, the rows from there on are simply
+        overwritten, which is the rollback.
+        """
+        if not self._fragments_ok or not partial_text.strip():
+            return 0
+        self._activate_persona(persona)
+        token_ids, start_pos, _ = self._prepare_prompt(partial_text, conversation)
+        ids = token_ids[:len(token_ids) - len(self._user_tail_ids)]
+        if start_pos < len(ids):
+            self._run_prefill(ids, start_pos)
+            self._kv_high_water = max(self._kv_high_water, len(ids))
+        self._spec = (conversation, self.persona, ids)
+        self._spec_stats["prefills"] += 1
+        logger.debug(f"[LLM] speculative prefill: {len(ids) - start_pos} new rows for {partial_text!r}")
+        return len(ids) - start_pos
+
+    def _reuse_spec(self, spec, conversation, token_ids: list, start_pos: int) -> int:
+        """Resume point after matching token_ids against a pending speculative prefill."""
+        if spec is None:
+            return start_pos
+        owner, persona, ids = spec
+        stats = self._spec_stats
+        if owner is not conversation or persona != self.persona:
+            stats["expired"] += 1
+            return start_pos
+
+        n = 0
+        limit = min(len(ids), len(token_ids) - 1)   # leave one token to produce logits
+        while n < limit and ids[n] == token_ids[n]:
+            n += 1
+        if n <= start_pos:
+            stats["misses"] += 1
+            return start_pos
+        stats["hits" if n == len(ids) else "partial"] += 1
+        stats["reused_tokens"] += n - start_pos
+        logger.debug(f"[LLM] speculative prefill reused: rows {start_pos}..{n} of {len(ids)}")
+        return n
+
+    # ---------- sessions ----------
+    def _release_working_cache(self, new_owner):
+        """Park the current owner's rows in host memory before someone else uses the caches."""
+        owner = self._kv_owner
+        self._kv_owner = None
+        if owner is None or owner is new_owner or self._kv_swap is None or owner.kv_len <= 0:
+            return
+        entry = self.personas.get(owner.persona) or {}
+        start = len(entry["ids"]) if entry.get("k") is not None else 0
+        self._kv_swap.save(owner, self.k_caches, self.v_caches, min(start, owner.kv_len), owner.kv_len)
+
+    def drop_session(self, conversation):
+        """Forget any K/V kept for a conversation that is being discarded."""
+        if self._kv_owner is conversation:
+            self._kv_owner = None
+        if self._kv_swap is not None:
+            self._kv_swap.drop(conversation)
+
+    def _fit_prompt(self, token_ids: list) -> list:
+        """Left-truncate an oversized prompt, keeping the system prefix pinned."""
+        limit = self.max_context - config.LLM_REPLY_RESERVE
+        if len(token_ids) <= limit:
+            return token_ids
+        pinned = self._pinned_len(token_ids)
+        if limit - pinned <= len(self._user_tail_ids or []):
+            raise ValueError(
+                f"No room for a user turn: a {pinned}-token system prefix plus "
+                f"LLM_REPLY_RESERVE={config.LLM_REPLY_RESERVE} fill LLM_MAX_CONTEXT={self.max_context}"
+            )
+        logger.warning(f"[LLM] Prompt of {len(token_ids)} tokens truncated to {limit}")
+        return token_ids[:pinned] + token_ids[len(token_ids) - (limit - pinned):]
+
+    def _fit_user_turn(self, user_ids: list) -> list:
+        """
+        Left-truncate a user turn that alone would not fit after the system
+        prefix (history is evicted afterwards to fit what remains). Raises
+        ValueError when not even the turn template plus one token of user
+        text fits, rather than sending the model an empty message.
+        """
+        limit = self.max_context - config.LLM_REPLY_RESERVE - len(self._prefix_ids)
+        if len(user_ids) <= limit:
+            return user_ids
+        if limit <= len(self._user_tail_ids):
+            raise ValueError(
+                f"No room for a user turn: a {len(self._prefix_ids)}-token system prefix plus "
+                f"LLM_REPLY_RESERVE={config.LLM_REPLY_RESERVE} fill LLM_MAX_CONTEXT={self.max_context}"
+            )
+        logger.warning(f"[LLM] User turn of {len(user_ids)} tokens truncated to {limit}")
+        return user_ids[len(user_ids) - limit:]
+
+    def _commit_turn(self, conversation, token_ids: list, prompt_len: int, user_start: int):
+        """Store the finished turn and record how many K/V rows are valid."""
+        if conversation is None:
+            return
+
+        reply = token_ids[prompt_len:]
+        if reply and reply[-1] == self.tokenizer.eos_token_id:
+            reply = reply[:-1]
+
+        # every sampled token except the last one has been run through the layers
+        computed = len(token_ids) - 1
+        conversation.turns.append(token_ids[user_start:prompt_len] + reply + [self.tokenizer.eos_token_id] + self._turn_sep_ids)
+        conversation.kv_len = min(computed, prompt_len + len(reply))
+        conversation.last_used = time.time()
+
+    def _bind_conversation(self, conversation):
+        """History built under another persona's system prompt is dropped."""
+        if conversation.persona != self.persona:
+            if conversation.turns:
+                logger.info(f"[LLM] Persona changed to '{self.persona}', conversation reset")
+            conversation.reset()
+            conversation.persona = self.persona
+
+    def record_turn(self, conversation, user_text: str, answer: str, persona=None):
+        """
+        Append a turn that was answered without running the model (e.g. from
+        the response cache). Rows already resident stay valid; the new turn
+        is prefilled together with the next request.
+        """
+        if conversation is None:
+            return
+        self._activate_persona(persona)
+        self._bind_conversation(conversation)
+        user_ids = self._tokenize(user_text) + self._user_tail_ids
+        reply = self._tokenize(answer)
+        conversation.turns.append(user_ids + reply + [self.tokenizer.eos_token_id] + self._turn_sep_ids)
+        conversation.last_used = time.time()
+
+    # ---------- response cache support ----------
+    def is_deterministic(self) -> bool:
+        return self.sampler.is_greedy
+
+    def cache_context(self, persona: str | None = None) -> dict:
+        """Everything besides the user text that decides a (greedy) answer."""
+        s = self.sampler
+        entry = self.personas.get(persona or config.LLM_DEFAULT_PERSONA) or self.personas.get(self.persona) or {}
+        return {
+            "model": str(self.axmodel_path),
+            "system": entry.get("system", SYSTEM_PROMPT),
+            "sampling": [s.topk, s.topp, s.temperature, s.repetition_penalty, s.presence_penalty],
+        }
 
     # ---------- prefill ----------
-    def _prefill(self, token_ids: list):
-        embeds = self.embeds
+    def _run_prefill(self, token_ids: list, start_pos: int = 0):
+        """
+        Prefill token_ids[start_pos:] in INPUT_PREFILL_LEN blocks, assuming
+        K/V rows [0, start_pos) are already valid. Blocks may start at any
+        position: each one attends over the smallest KV_MASK_EXPAND_LEN-aligned
+        cache window covering the valid rows, with the unused tail masked off.
+        Returns the hidden state of the last token.
+        """
+        metrics = self._metrics
         token_len = len(token_ids)
-        prefill_data = np.take(embeds, token_ids, axis=0).astype(bfloat16)
-
-        slice_indices = _gen_slice_indices(token_len, INPUT_PREFILL_LEN, KV_MASK_EXPAND_LEN)
 
+        pos = start_pos
         data = None
-        for slice_index in slice_indices:
-            current_slice_len = INPUT_PREFILL_LEN if slice_index == 0 else KV_MASK_EXPAND_LEN
-
-            indices = np.array(
-                list(range(slice_index * INPUT_PREFILL_LEN, (slice_index + 1) * INPUT_PREFILL_LEN)),
-                np.uint32
-            ).reshape((1, INPUT_PREFILL_LEN))
-
-            mask = (np.zeros((1, INPUT_PREFILL_LEN, current_slice_len * slice_index + INPUT_PREFILL_LEN)) - 65536).astype(bfloat16)
-
-            data = np.zeros((1, INPUT_PREFILL_LEN, self.cfg.hidden_size), dtype=bfloat16)
-            for i, t in enumerate(range(slice_index * INPUT_PREFILL_LEN, (slice_index + 1) * INPUT_PREFILL_LEN)):
-                if t < token_len:
-                    mask[:, i, : slice_index * INPUT_PREFILL_LEN + i + 1] = 0
-                    data[:, i:i+1, :] = prefill_data[t].reshape((1,1,self.cfg.hidden_size)).astype(bfloat16)
-
-            if slice_index == slice_indices[-1]:
-                curlen_procd = token_len - slice_index * INPUT_PREFILL_LEN
-            else:
-                curlen_procd = INPUT_PREFILL_LEN
-
-            for i in range(self.cfg.num_hidden_layers):
-                input_feed = {
-                    "K_cache": (self.k_caches[i][:, 0: current_slice_len * slice_index, :]
-                                if slice_index else np.zeros((1, 1, self.cfg.hidden_size), dtype=bfloat16)),
-                    "V_cache": (self.v_caches[i][:, 0: current_slice_len * slice_index, :]
-                                if slice_index else np.zeros((1, 1, self.cfg.hidden_size), dtype=bfloat16)),
-                    "indices": indices,
-                    "input": data,
-                    "mask": mask,
-                }
-                outputs = self.sessions[i].run(None, input_feed, shape_group=slice_index + 1)
-                self.k_caches[i][:, slice_index * INPUT_PREFILL_LEN : slice_index * INPUT_PREFILL_LEN + curlen_procd, :] = outputs[0][:, :curlen_procd, :]
-                self.v_caches[i][:, slice_index * INPUT_PREFILL_LEN : slice_index * INPUT_PREFILL_LEN + curlen_procd, :] = outputs[1][:, :curlen_procd, :]
-                data = outputs[2]
-
-        post_inp = data[:, token_len - (len(slice_indices) - 1) * INPUT_PREFILL_LEN - 1, None, :]
+        last_row = 0
+        while pos < token_len:
+            t0 = time.perf_counter()
+            n = min(INPUT_PREFILL_LEN, token_len - pos)
+            data = self._prefill_block(token_ids[pos:pos + n], pos)
+            last_row = n - 1
+            pos += n
+            if metrics is not None:
+                metrics.prefill_slice_s.append(time.perf_counter() - t0)
+
+        return data[:, last_row, None, :]
+
+    def _prefill_block(self, block_ids: list, pos: int):
+        """
+        Run block_ids (at most INPUT_PREFILL_LEN) at positions pos.. through
+        every layer in one pass, writing their K/V rows. Returns the final
+        hidden states, shape (1, INPUT_PREFILL_LEN, hidden); rows past
+        len(block_ids) are padding.
+        """
+        arena = self._arena
+        n = len(block_ids)
+        past_blocks = (pos + KV_MASK_EXPAND_LEN - 1) // KV_MASK_EXPAND_LEN
+        past_len = past_blocks * KV_MASK_EXPAND_LEN
+
+        indices, data, mask = arena.build_prefill_slice(self.embeds, block_ids, pos, past_len)
+
+        for i in range(self.cfg.num_hidden_layers):
+            input_feed = {
+                "K_cache": self.k_caches[i][:, 0:past_len, :] if past_len else arena.empty_cache,
+                "V_cache": self.v_caches[i][:, 0:past_len, :] if past_len else arena.empty_cache,
+                "indices": indices,
+                "input": data,
+                "mask": mask,
+            }
+            outputs = self.sessions[i].run(None, input_feed, shape_group=past_blocks + 1)
+            self.k_caches[i][:, pos:pos + n, :] = outputs[0][:, :n, :]
+            self.v_caches[i][:, pos:pos + n, :] = outputs[1][:, :n, :]
+            data = outputs[2]
+        return data
+
+    def _sample(self, post_out, token_ids: list) -> int:
+        t0 = time.perf_counter()
+        tok = self.sampler.sample(post_out, token_ids)
+        if self._metrics is not None:
+            self._metrics.sample_s += time.perf_counter() - t0
+        return tok
+
+    def _prefill(self, token_ids: list, start_pos: int = 0):
+        token_len = len(token_ids)
+        post_inp = self._run_prefill(token_ids, start_pos)
         post_out = self.post_session.run(None, {"input": post_inp})[0]
-        next_token = _sample_logits_to_id(post_out, TOPK, TOPP, TEMPERATURE)
+        next_token = self._sample(post_out, token_ids)
         return token_len, next_token
 
-    # ---------- decode loop (shared) ----------
-    def _decode_tokens(self, token_ids: list, token_len: int, max_steps=LAST_N):
-        kv_cache_len = LAST_N
+    # ---------- decode step ----------
+    def _decode_step(self, pos: int, token_id: int):
+        """
+        Run one token at position pos through every layer, writing its K/V
+        row, and return the last hidden state. Inputs live in the arena.
+        """
+        arena = self._arena
+        layer_s = self._metrics.layer_run_s if self._metrics is not None else None
+        t0 = time.perf_counter()
+        device_s = 0.0
 
-        mask = np.zeros((1, 1, kv_cache_len + 1), dtype=np.float32).astype(bfloat16)
-        mask[:, :, :kv_cache_len] -= 65536
-        if INPUT_PREFILL_LEN > 0:
-            mask[:, :, :token_len] = 0
+        arena.set_decode_input(pos, self.embeds[token_id])
+        data = arena.input
+        for i in range(self.cfg.num_hidden_layers):
+            input_feed = {
+                "K_cache": self.k_caches[i],
+                "V_cache": self.v_caches[i],
+                "indices": arena.indices,
+                "input": data,
+                "mask": arena.mask,
+            }
+            t_run = time.perf_counter()
+            outputs = self.sessions[i].run(None, input_feed, shape_group=0)
+            dt = time.perf_counter() - t_run
+            device_s += dt
+            if layer_s is not None:
+                layer_s[i] += dt
+            self.k_caches[i][:, pos, :] = outputs[0][:, :, :]
+            self.v_caches[i][:, pos, :] = outputs[1][:, :, :]
+            data = outputs[2]
+
+        arena.open_position(pos)
+        arena.record_step(time.perf_counter() - t0, device_s)
+        return data
+
+    # ---------- speculative decoding ----------
+    @staticmethod
+    def _verify_fits(pos: int) -> bool:
+        """
+        A verify pass at pos attends over the KV_MASK_EXPAND_LEN-aligned window
+        covering rows [0, pos) plus one INPUT_PREFILL_LEN block; near the end
+        of the LAST_N-row caches that exceeds both the cache and the exported
+        shape groups, so the last positions decode one token at a time.
+        """
+        past_len = (pos + KV_MASK_EXPAND_LEN - 1) // KV_MASK_EXPAND_LEN * KV_MASK_EXPAND_LEN
+        return past_len + INPUT_PREFILL_LEN <= LAST_N + 1
 
-        # iterate positions
-        for pos in range(kv_cache_len):
-            if INPUT_PREFILL_LEN > 0 and pos < token_len:
-                continue
+    def _verify_drafts(self, pos: int, token_ids: list, drafts: list) -> list:
+        """
+        One multi-token pass over [token_ids[-1]] + drafts at positions
+        pos.. (the same 128-token prefill shape group), then sample row by
+        row and keep drafts while they agree with the model. Appends the
+        accepted drafts plus the model's own next token to token_ids and
+        returns them; K/V rows are valid for the fed token and the accepted
+        drafts. Rows written for rejected drafts stay masked off in the
+        decode mask and are overwritten later, which is the rollback.
+        """
+        feed = token_ids[-1:] + drafts
+        data = self._prefill_block(feed, pos)
+
+        out = []
+        for j in range(len(feed)):
+            post_out = self.post_session.run(None, {"input": data[:, j, None, :]})[0]
+            tok = self._sample(post_out, token_ids)
+            token_ids.append(tok)
+            out.append(tok)
+            if j == len(drafts) or tok != drafts[j]:
+                break
 
-            next_token = token_ids[pos]
-            indices = np.array([pos], np.uint32).reshape((1,1))
-            data = self.embeds[next_token, :].reshape((1,1,self.cfg.hidden_size)).astype(bfloat16)
-
-            for i in range(self.cfg.num_hidden_layers):
-                input_feed = {
-                    "K_cache": self.k_caches[i],
-                    "V_cache": self.v_caches[i],
-                    "indices": indices,
-                    "input": data,
-                    "mask": mask,
-                }
-                outputs = self.sessions[i].run(None, input_feed, shape_group=0)
-                self.k_caches[i][:, pos, :] = outputs[0][:, :, :]
-                self.v_caches[i][:, pos, :] = outputs[1][:, :, :]
-                data = outputs[2]
-
-            mask[..., pos] = 0
-
-            if pos >= token_len - 1:
-                post_out = self.post_session.run(None, {"input": data})[0]
-                next_token = _sample_logits_to_id(post_out, TOPK, TOPP, TEMPERATURE)
-                token_ids.append(next_token)
-                if next_token == self.tokenizer.eos_token_id and next_token > token_len:
-                    break
+        # rows for the fed token and the accepted drafts become visible
+        for p in range(pos, pos + len(out)):
+            self._arena.open_position(p)
+        if self._metrics is not None:
+            self._metrics.spec.record(len(drafts), len(out) - 1)
+        return out
 
-        return token_ids
+    def host_overhead_ms_per_token(self) -> float:
+        """Host-side (non-session.run) time per decoded token for the last request."""
+        return self._arena.host_ms_per_token() if self._arena else 0.0
+
+    # ---------- KV window ----------
+    def _pinned_len(self, token_ids: list) -> int:
+        prefix = self._prefix_ids or []
+        return len(prefix) if token_ids[:len(prefix)] == prefix else 0
+
+    def _slide_window(self, resident: list, pinned: int) -> int:
+        """
+        Sliding-window mode: keep the pinned prefix plus the most recent
+        kv_window ids of `resident` (everything whose K/V is in the cache),
+        re-prefill them at contiguous positions and return the new length.
+        Rows must be recomputed because positions are baked into K.
+        """
+        kept = resident[:pinned] + resident[max(pinned, len(resident) - self.kv_window):]
+        start = self._use_system_prefix(kept) if pinned else 0
+        self._run_prefill(kept, start)
+        self._arena.reset_decode_mask(len(kept))
+        logger.debug(f"[LLM] KV window slid: {len(resident)} -> {len(kept)} positions")
+        return len(kept)
+
+    def kv_memory(self) -> dict:
+        """
+        KV cache footprint. The working caches are allocated at the full
+        LAST_N rows the decode sessions expect, but rows past the highest
+        position ever written are untouched zero pages, so resident memory
+        follows high_water_rows rather than allocated_rows.
+        """
+        if not self.k_caches:
+            return {}
+        layers = len(self.k_caches)
+        row_bytes = 2 * layers * self.k_caches[0].shape[-1] * self.k_caches[0].itemsize
+        snap = sum(
+            a.nbytes
+            for p in self.personas.values()
+            for a in (p["k"] or []) + (p["v"] or [])
+        )
+        return {
+            "layers": layers,
+            "allocated_rows": self.k_caches[0].shape[1],
+            "max_context": self.max_context,
+            "mode": self.kv_mode,
+            "window": self.kv_window if self.kv_mode == "sliding" else None,
+            "high_water_rows": self._kv_high_water,
+            "allocated_mb": round(row_bytes * self.k_caches[0].shape[1] / 2**20, 2),
+            "touched_mb": round(row_bytes * self._kv_high_water / 2**20, 2),
+            "prefix_snapshot_mb": round(snap / 2**20, 2),
+            "personas": list(self.personas),
+            "swap": self._kv_swap.stats() if self._kv_swap is not None else None,
+        }
+
+    def _log_kv_memory(self):
+        m = self.kv_memory()
+        logger.info(
+            f"[LLM] KV cache: {m['layers']} layers x {m['allocated_rows']} rows = {m['allocated_mb']} MB, "
+            f"context {m['max_context']} ({m['mode']})"
+        )
+
+    # ---------- stats ----------
+    def stats(self) -> dict:
+        """Aggregate generation stats plus the last request's GenerationMetrics."""
+        snap = self._stats.snapshot()
+        snap["kv"] = self.kv_memory()
+        snap["speculative_prefill"] = self.spec_prefill_stats()
+        return snap
+
+    def spec_prefill_stats(self) -> dict:
+        s = dict(self._spec_stats)
+        decided = s["hits"] + s["partial"] + s["misses"] + s["expired"]
+        s["hit_rate"] = round((s["hits"] + s["partial"]) / decided, 3) if decided else 0.0
+        return s
+
+    def last_metrics(self):
+        """GenerationMetrics of the most recent request (read it on the executor worker)."""
+        return self._stats.last
+
+    # ---------- generation engine ----------
+    def generate_tokens(self, user_text: str, conversation=None, limits=None, persona=None):
+        """
+        Token generator every public mode is built on. Yields
+        GeneratedToken(id, text) per sampled token, where text is the
+        newly completed output (may be ""); a last item with id None carries
+        any held-back tail. `persona` picks a configured system prompt
+        (None = default). Stops on EOS, the end of the KV cache, or a
+        GenerationLimits bound. Closing the generator early is safe: the
+        conversation and metrics are committed in either case.
+        """
+        t_start = time.perf_counter()
+        limits = limits or GenerationLimits.from_payload()
+        tracker = LimitTracker(limits)
+        metrics = GenerationMetrics(n_layers=self.cfg.num_hidden_layers)
+        self._metrics = metrics
+
+        reason = None
+        token_ids = None
+        try:
+            self._activate_persona(persona)
+            token_ids, start_pos, user_start = self._prepare_prompt(user_text, conversation)
+            metrics.prompt_tokens = len(token_ids)
+            metrics.reused_tokens = start_pos
+
+            token_len, next_token = self._prefill(token_ids, start_pos)
+            token_ids.append(next_token)
+            metrics.ttft_s = time.perf_counter() - t_start
+            self._kv_high_water = max(self._kv_high_water, token_len)
+
+            detok = IncrementalDetokenizer(self.tokenizer)
+            self._arena.reset_decode_mask(token_len)
+            self._arena.reset_counters()
+
+            drafter = None
+            if config.LLM_SPECULATIVE:
+                drafter = PromptLookupDrafter(
+                    num_draft=min(config.LLM_SPEC_NUM_DRAFT, INPUT_PREFILL_LEN - 1),
+                    max_ngram=config.LLM_SPEC_MAX_NGRAM,
+                    min_ngram=config.LLM_SPEC_MIN_NGRAM,
+                )
+                drafter.reset(token_ids[:-1])
+
+            pos = token_len
+            pinned = self._pinned_len(token_ids)
+            window_start = pinned      # token_ids[window_start:] sits right after the pinned rows
+            fresh = token_ids[-1:]     # sampled but not yet emitted (several after a verify pass)
+            while True:
+                for j, tok in enumerate(fresh):
+                    if tok == self.tokenizer.eos_token_id:
+                        reason = "eos"
+                    else:
+                        piece, reason = tracker.on_text(detok.push(tok))
+                        yield GeneratedToken(tok, piece)
+                        reason = reason or tracker.on_token(tok)
+                    if reason:
+                        # drop ids accepted past the stopping one
+                        del token_ids[len(token_ids) - (len(fresh) - 1 - j):]
+                        break
+                if reason:
+                    break
+                if pos >= self.max_context:
+                    if self.kv_mode != "sliding":
+                        reason = "context"
+                        break
+                    resident = token_ids[:pinned] + token_ids[window_start:-1]
+                    pos = self._slide_window(resident, pinned)
+                    window_start = len(token_ids) - 1 - (pos - pinned)
+                    metrics.kv_slides += 1
+
+                t_step = time.perf_counter()
+                drafts = []
+                if drafter is not None:
+                    drafter.extend(fresh)
+                    if self._verify_fits(pos):
+                        drafts = drafter.propose(limit=self.max_context - pos - 1)
+                    if len(drafts) < config.LLM_SPEC_MIN_DRAFT:
+                        drafts = []
+                if drafts:
+                    fresh = self._verify_drafts(pos, token_ids, drafts)
+                    self._kv_high_water = max(self._kv_high_water, pos + 1 + len(drafts))
+                else:
+                    data = self._decode_step(pos, token_ids[-1])
+                    post_out = self.post_session.run(None, {"input": data})[0]
+                    token_ids.append(self._sample(post_out, token_ids))
+                    fresh = token_ids[-1:]
+                metrics.decode_s += time.perf_counter() - t_step
+                pos += len(fresh)
+                self._kv_high_water = max(self._kv_high_water, pos)
+
+            piece, _ = tracker.on_text(detok.flush())
+            tail = piece + tracker.finish()
+            if tail:
+                yield GeneratedToken(None, tail)
+        finally:
+            self._metrics = None
+            self.last_stop_reason = reason or "closed"
+            if len(token_ids or ()) > metrics.prompt_tokens:
+                metrics.stop_reason = self.last_stop_reason
+                metrics.new_tokens = len(token_ids) - metrics.prompt_tokens
+                metrics.host_ms_per_token = self._arena.host_ms_per_token()
+                metrics.total_s = time.perf_counter() - t_start
+                self._stats.record(metrics)
+                self._commit_turn(conversation, token_ids, metrics.prompt_tokens, user_start)
+                if metrics.kv_slides and conversation is not None:
+                    # cache holds a compacted layout, not the conversation's ids
+                    conversation.kv_len = 0
+                    self._kv_owner = None
+            elif conversation is not None:
+                # failed before the first token; resident rows can't be trusted
+                self._kv_owner = None
+            logger.debug(
+                f"[LLM] stop={metrics.stop_reason} prompt={metrics.prompt_tokens} "
+                f"(reused {metrics.reused_tokens}) new={metrics.new_tokens} "
+                f"ttft={metrics.ttft_s * 1000:.0f}ms {metrics.tokens_per_s:.1f} tok/s "
+                f"host={metrics.host_ms_per_token:.2f}ms/token"
+            )
 
     # ---------- public: one-shot ----------
-    def generate(self, user_text: str) -> str:
-        token_ids = self._build_prompt_ids(user_text)
-        token_len, next_token = self._prefill(token_ids)
-        token_ids.append(next_token)
-        token_ids = self._decode_tokens(token_ids, token_len)
-        out = self.tokenizer.decode(token_ids[token_len:], skip_special_tokens=True)
-        return out.strip()
+    def generate(self, user_text: str, conversation=None, limits=None, persona=None) -> str:
+        return "".join(t.text for t in self.generate_tokens(user_text, conversation, limits, persona)).strip()
 
     # ---------- public: streaming ----------
-    def generate_stream(self, user_text: str, chunk_cb=None) -> str:
+    def generate_stream(self, user_text: str, chunk_cb=None, conversation=None, limits=None, persona=None) -> str:
         """
         Same as generate(), but calls chunk_cb(piece) as tokens come out.
         Returns the full text at the end.
         """
-        token_ids = self._build_prompt_ids(user_text)
-        token_len, next_token = self._prefill(token_ids)
-        token_ids.append(next_token)
-
-        # first piece
-        full_text_parts = []
-        first_piece = self.tokenizer.decode([next_token], skip_special_tokens=True)
-        if first_piece:
-            full_text_parts.append(first_piece)
-            if chunk_cb:
-                chunk_cb(first_piece)
-
-        kv_cache_len = LAST_N
-        mask = np.zeros((1, 1, kv_cache_len + 1), dtype=np.float32).astype(bfloat16)
-        mask[:, :, :kv_cache_len] -= 65536
-        if INPUT_PREFILL_LEN > 0:
-            mask[:, :, :token_len] = 0
-
-        for pos in range(kv_cache_len):
-            if pos < token_len:
-                continue
-
-            last_id = token_ids[pos]
-            indices = np.array([pos], np.uint32).reshape((1,1))
-            data = self.embeds[last_id, :].reshape((1,1,self.cfg.hidden_size)).astype(bfloat16)
-
-            for i in range(self.cfg.num_hidden_layers):
-                input_feed = {
-                    "K_cache": self.k_caches[i],
-                    "V_cache": self.v_caches[i],
-                    "indices": indices,
-                    "input": data,
-                    "mask": mask,
-                }
-                outputs = self.sessions[i].run(None, input_feed, shape_group=0)
-                self.k_caches[i][:, pos, :] = outputs[0][:, :, :]
-                self.v_caches[i][:, pos, :] = outputs[1][:, :, :]
-                data = outputs[2]
-
-            mask[..., pos] = 0
-
-            post_out = self.post_session.run(None, {"input": data})[0]
-            next_token = _sample_logits_to_id(post_out, TOPK, TOPP, TEMPERATURE)
-            token_ids.append(next_token)
-
-            if next_token == self.tokenizer.eos_token_id and next_token > token_len:
-                break
-
-            piece = self.tokenizer.decode([next_token], skip_special_tokens=True)
-            if piece:
-                full_text_parts.append(piece)
+        parts = []
+        for t in self.generate_tokens(user_text, conversation, limits, persona):
+            if t.text:
+                parts.append(t.text)
                 if chunk_cb:
-                    chunk_cb(piece)
-
-        return "".join(full_text_parts).strip()
+                    chunk_cb(t.text)
+        return "".join(parts).strip()
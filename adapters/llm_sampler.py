@@ -0,0 +1,83 @@
+# AImy/adapters/llm_sampler.py
+import numpy as np
+
+
+class Sampler:
+    """
+    Next-token sampler for the Qwen post session logits.
+
+      - greedy fast path (topk == 1 or temperature <= 0): a single argmax
+      - otherwise top-k -> temperature -> top-p, fully vectorized
+      - optional repetition (HF style) and presence penalties over the
+        last `penalty_window` ids
+      - seedable RNG so benchmark runs are reproducible
+    """
+
+    def __init__(self, topk: int = 1, topp: float = 1.0, temperature: float = 1.0,
+                 repetition_penalty: float = 1.0, presence_penalty: float = 0.0,
+                 penalty_window: int = 64, seed: int | None = None):
+        self.topk = max(1, int(topk))
+        self.topp = float(topp)
+        self.temperature = float(temperature)
+        self.repetition_penalty = float(repetition_penalty)
+        self.presence_penalty = float(presence_penalty)
+        self.penalty_window = int(penalty_window)
+        self.rng = np.random.default_rng(seed)
+
+    def reseed(self, seed: int | None):
+        self.rng = np.random.default_rng(seed)
+
+    @property
+    def is_greedy(self) -> bool:
+        return self.topk == 1 or self.temperature <= 0
+
+    @property
+    def has_penalties(self) -> bool:
+        return self.repetition_penalty != 1.0 or self.presence_penalty != 0.0
+
+    def sample(self, logits: np.ndarray, prev_ids=None) -> int:
+        r = logits.reshape(-1)
+
+        if self.has_penalties and prev_ids:
+            r = self._apply_penalties(r.astype(np.float32), prev_ids)
+
+        if self.is_greedy:
+            return int(np.argmax(r))
+
+        r = r.astype(np.float32, copy=False)
+
+        # top-k (unordered), then order the k candidates by logit
+        k = min(self.topk, r.shape[0])
+        cand_idx = np.argpartition(r, -k)[-k:]
+        cand_val = r[cand_idx]
+        order = np.argsort(cand_val)[::-1]
+        cand_idx = cand_idx[order]
+        cand_val = cand_val[order]
+
+        # temperature + softmax
+        z = (cand_val - cand_val[0]) / self.temperature
+        prob = np.exp(z)
+        prob /= prob.sum()
+
+        # top-p: keep tokens whose preceding mass is still < p
+        if self.topp < 1.0:
+            cum = np.cumsum(prob)
+            keep = int(np.searchsorted(cum - prob, self.topp, side="left"))
+            keep = max(1, keep)
+            prob = prob[:keep]
+            cand_idx = cand_idx[:keep]
+            cum = np.cumsum(prob)
+        else:
+            cum = np.cumsum(prob)
+
+        pos = int(np.searchsorted(cum, self.rng.random() * cum[-1], side="right"))
+        return int(cand_idx[min(pos, len(cand_idx) - 1)])
+
+    def _apply_penalties(self, r: np.ndarray, prev_ids) -> np.ndarray:
+        ids = np.unique(np.asarray(prev_ids[-self.penalty_window:], dtype=np.int64))
+        if self.repetition_penalty != 1.0:
+            vals = r[ids]
+            r[ids] = np.where(vals > 0, vals / self.repetition_penalty, vals * self.repetition_penalty)
+        if self.presence_penalty != 0.0:
+            r[ids] -= self.presence_penalty
+        return r
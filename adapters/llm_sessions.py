@@ -0,0 +1,93 @@
+# AImy/adapters/llm_sessions.py
+import threading
+from collections import OrderedDict
+
+from loguru import logger
+
+
+class KVSwapStore:
+    """
+    Host-memory copies of conversation K/V rows.
+
+    QwenAdapter has one set of working caches. When another session needs
+    them, the current owner's valid rows are copied here, and copied back
+    when that session's next turn arrives, so a follow-up only prefills its
+    new tokens instead of the whole transcript.
+
+    Only rows past the (already snapshotted) persona prefix are stored.
+    Entries are evicted least recently saved first once the total exceeds
+    budget_bytes; an evicted session simply re-prefills on its next turn.
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self._entries = OrderedDict()   # conversation -> (start, n, k_rows, v_rows, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.saves = 0
+        self.restores = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def save(self, key, k_caches, v_caches, start: int, n: int):
+        """Copy rows [start, n) of every layer out of the working caches."""
+        if n <= start:
+            return
+        k_rows = [k[:, start:n, :].copy() for k in k_caches]
+        v_rows = [v[:, start:n, :].copy() for v in v_caches]
+        nbytes = sum(a.nbytes for a in k_rows) + sum(a.nbytes for a in v_rows)
+        if nbytes > self.budget_bytes:
+            return
+
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (start, n, k_rows, v_rows, nbytes)
+            self._bytes += nbytes
+            self.saves += 1
+            while self._bytes > self.budget_bytes:
+                old, _ = next(iter(self._entries.items()))
+                self._pop(old)
+                self.evictions += 1
+                logger.debug("[LLM] KV swap budget reached, evicted a saved session")
+
+    def restore(self, key, k_caches, v_caches, start: int, n: int) -> bool:
+        """
+        Copy a saved context back if it covers exactly rows [start, n).
+        The entry is consumed either way: once its session owns the working
+        caches again the saved copy is out of date.
+        """
+        with self._lock:
+            entry = self._pop(key)
+        if entry is None or entry[0] != start or entry[1] != n:
+            self.misses += 1
+            return False
+
+        _, _, k_rows, v_rows, _ = entry
+        for i in range(len(k_caches)):
+            k_caches[i][:, start:n, :] = k_rows[i]
+            v_caches[i][:, start:n, :] = v_rows[i]
+        self.restores += 1
+        return True
+
+    def drop(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._entries),
+                "used_mb": round(self._bytes / 2**20, 2),
+                "budget_mb": round(self.budget_bytes / 2**20, 2),
+                "saves": self.saves,
+                "restores": self.restores,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[4]
+        return entry
@@ -0,0 +1,83 @@
+# AImy/adapters/llm_speculative.py
+
+
+class PromptLookupDrafter:
+    """
+    Draft tokens for speculative decoding by prompt lookup (no draft model).
+
+    The last n generated ids (n = max_ngram down to min_ngram) are looked
+    up among everything seen so far - system prompt, history, question and
+    the reply itself - and the ids that followed the most recent earlier
+    occurrence are proposed. Answers that echo the question or follow a
+    fixed template match often.
+
+    The index maps each n-gram to the position right after its latest
+    occurrence and is updated as ids are appended, so a lookup is
+    O(max_ngram) dict probes per step.
+    """
+
+    def __init__(self, num_draft: int = 8, max_ngram: int = 3, min_ngram: int = 1):
+        self.num_draft = num_draft
+        self.max_ngram = max_ngram
+        self.min_ngram = min_ngram
+        self._ids = []
+        self._index = {}
+
+    def reset(self, token_ids: list):
+        self._ids = []
+        self._index = {}
+        self.extend(token_ids)
+
+    def extend(self, new_ids: list):
+        ids = self._ids
+        for t in new_ids:
+            # ids[end] now has a follower: index the n-grams ending right before it
+            end = len(ids)
+            ids.append(t)
+            for n in range(self.min_ngram, self.max_ngram + 1):
+                if end - n < 0:
+                    break
+                self._index[tuple(ids[end - n:end])] = end
+
+    def propose(self, limit: int | None = None) -> list:
+        """Draft ids continuing the current sequence ([] when nothing matches)."""
+        ids = self._ids
+        k = self.num_draft if limit is None else min(self.num_draft, limit)
+        if k <= 0:
+            return []
+        for n in range(self.max_ngram, self.min_ngram - 1, -1):
+            if len(ids) <= n:
+                continue
+            start = self._index.get(tuple(ids[-n:]))
+            if start is not None:
+                return ids[start:start + k]
+        return []
+
+
+class SpeculativeStats:
+    """Counters for draft verification (per request or running totals)."""
+
+    def __init__(self):
+        self.passes = 0       # multi-token verify passes
+        self.drafted = 0      # draft ids sent for verification
+        self.accepted = 0     # draft ids the model agreed with
+
+    def record(self, drafted: int, accepted: int):
+        self.passes += 1
+        self.drafted += drafted
+        self.accepted += accepted
+
+    def add(self, other: "SpeculativeStats"):
+        self.passes += other.passes
+        self.drafted += other.drafted
+        self.accepted += other.accepted
+
+    def as_dict(self) -> dict:
+        return {
+            "passes": self.passes,
+            "drafted": self.drafted,
+            "accepted": self.accepted,
+            "acceptance_rate": round(self.accepted / self.drafted, 3) if self.drafted else 0.0,
+            # tokens produced per verify pass: accepted drafts + the model's own next token
+            "tokens_per_pass": round((self.accepted + self.passes) / self.passes, 2) if self.passes else 0.0,
+        }
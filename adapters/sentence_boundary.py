@@ -0,0 +1,26 @@
+# AImy/adapters/sentence_boundary.py
+import re
+
+# Sentence end: terminal punctuation (optionally followed by a closing
+# quote/bracket) that is followed by whitespace. Requiring the trailing
+# whitespace keeps "3.5" from splitting; words in ABBREVIATIONS ("e.g. this",
+# "Dr. Smith") are skipped as well.
+_sentence_end_re = re.compile(r"[.!?…]+[\"')\]]*\s")
+
+ABBREVIATIONS = frozenset((
+    "e.g.", "i.e.", "etc.", "vs.", "cf.", "approx.", "a.m.", "p.m.",
+    "mr.", "mrs.", "ms.", "dr.", "prof.", "st.", "jr.", "sr.", "no.",
+))
+
+
+def sentence_end(text: str, start: int = 0) -> int | None:
+    """
+    Offset just past the first sentence boundary (including the trailing
+    whitespace) found at or after `start`, or None. Shared by the streaming
+    TTS chunker and the LLM voice-length limit so both split alike.
+    """
+    for m in _sentence_end_re.finditer(text, start):
+        word = text[:m.end()].split()[-1].lstrip("\"'([").lower()
+        if word not in ABBREVIATIONS:
+            return m.end()
+    return None
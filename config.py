@@ -17,6 +17,14 @@ YOLO11X_LABELS_PATH = YOLO11X_DIR / "coco.txt"
 CAM_CAPTURE_WIDTH = 1280
 CAM_CAPTURE_HEIGHT = 720
 
+# =====================================================
+# Microphone - one capture stream shared by wake word, ASR and the mic meter
+# =====================================================
+AUDIO_INPUT_DEVICE = None    # sounddevice device index/name; None = system default
+AUDIO_CAPTURE_RATE = None    # device rate, resampled once to 16 kHz; None = device default
+AUDIO_BLOCK_MS     = 30
+AUDIO_RING_S       = 30      # history kept in the ring (>= MAX_UTTER_MS + pre-roll)
+
 # =====================================================
 # Wake Word Detection - Porcupine (picovoice) or Vosk
 # =====================================================
@@ -36,6 +44,16 @@ PORCUPINE_SENSITIVITY = 0.6
 VOSK_MODEL_PATH = MODELS_DIR / "Vosk"
 VOSK_WAKEWORD = "hey amy"
 
+# "hey amy, what time is it" in one breath: speech that follows the wake
+# phrase goes straight to SenseVoice, without the greeting or a second listen.
+# Vosk finds the end of the wake phrase from its word timings; Porcupine
+# keeps reading frames after the keyword until the speaker pauses.
+WAKE_COMMAND_ENABLED    = True
+WAKE_COMMAND_MIN_MS     = 400     # less post-wake speech than this = wake word only
+WAKE_COMMAND_WAIT_MS    = 700     # Porcupine: how long to wait for speech after the keyword
+WAKE_COMMAND_END_SIL_MS = 600     # Porcupine: silence that ends the command
+WAKE_COMMAND_MAX_MS     = 10000   # longest command taken from the wake utterance
+
 # =====================================================
 # ASR - SenseVoice
 # =====================================================
@@ -43,6 +61,53 @@ SENSEVOICE_DIR = MODELS_DIR / "sensevoice"
 SENSEVOICE_MODEL_PATH = SENSEVOICE_DIR / "models" / "sensevoice.axmodel"
 SENSEVOICE_BPE_PATH   = SENSEVOICE_DIR / "models" / "chn_jpn_yue_eng_ko_spectok.bpe.model"
 
+# Audio from before REQUEST_LISTEN (or before the command after a keyword)
+# included in the utterance, so the first syllable is not clipped
+ASR_PREROLL_MS = 300
+
+# Voice activity detection for the mic listener (and the Porcupine command capture).
+#   "rms"      : fixed RMS thresholds (the original behaviour)
+#   "spectral" : speech-band SNR over a tracked noise floor + flatness/ZCR gating
+#   "silero"   : Silero VAD ONNX on the CPU (falls back to "spectral" if missing)
+# Calibrate a room with scripts/calibrate_vad.py and select it with VAD_PROFILE;
+# compare settings offline with scripts/eval_vad.py.
+VAD_ENGINE          = "spectral"
+VAD_PROFILE         = None      # name of a calibrated environment in VAD_PROFILE_PATH
+VAD_PROFILE_PATH    = THIS_DIR / "cache" / "vad_profiles.json"
+VAD_BAND_HZ         = (300, 3400)
+VAD_START_MARGIN_DB = 9.0       # above the floor to start an utterance
+VAD_END_MARGIN_DB   = 5.0       # above the floor to keep it going
+VAD_MAX_FLATNESS    = 0.45      # flatter (noise-like) frames are not voiced
+VAD_ZCR_UNVOICED    = 0.25      # fricatives keep an utterance alive
+VAD_FLOOR_WINDOW_MS = 3000      # noise floor = quietest frame in this window
+VAD_SILERO_PATH     = MODELS_DIR / "vad" / "silero_vad.onnx"
+VAD_SILERO_THRESHOLD     = 0.5
+VAD_SILERO_NEG_THRESHOLD = 0.35
+
+# Compute fbank frames per block while the user speaks instead of over the
+# whole utterance after it ends; decodes then only run the model
+ASR_STREAMING_FEATURES = True
+
+# Long-form dictation: instead of the MAX_UTTER_MS cut, an utterance is split
+# into chunks the model window can hold (max_len 256 LFR frames = 15.36 s),
+# at pauses when there is one, else at ASR_CHUNK_S with ASR_CHUNK_OVERLAP_S of
+# overlap. Chunks are decoded while the user keeps talking and stitched with
+# the repeated overlap words removed. Files: scripts/asr_batch.py --longform.
+ASR_LONGFORM            = False
+ASR_LONGFORM_MAX_S      = 120      # whole utterance
+ASR_LONGFORM_END_SIL_MS = 1500     # silence that ends a dictation (END_SIL_MS is for short commands)
+ASR_CHUNK_S             = 12.0
+ASR_CHUNK_MIN_S         = 4.0      # no pause cuts before this
+ASR_CHUNK_PAUSE_MS      = 200      # a pause this long may end a chunk
+ASR_CHUNK_OVERLAP_S     = 1.0      # fixed-window cuts only
+
+# Partial transcripts while the user is still speaking (extra ASR passes).
+# A partial is "stable" when two in a row agree or one is taken once the
+# speaker has paused; stable partials drive LLM_SPECULATIVE_PREFILL.
+ASR_PARTIALS            = False
+ASR_PARTIAL_INTERVAL_MS = 600    # speech between periodic partial decodes
+ASR_PARTIAL_PAUSE_MS    = 150    # silence that triggers a partial right away
+
 # =====================================================
 # LLM - Qwen2.5-1.5B-Instruct-Int8
 # =====================================================
@@ -50,16 +115,112 @@ QWEN_DIR = MODELS_DIR / "qwen2.5-1.5b-it"
 QWEN_HF_PATH = QWEN_DIR / "Qwen2.5-1.5B-Instruct-GPTQ-Int8"
 QWEN_AX_PATH = QWEN_DIR / "Qwen2.5-1.5B-Instruct-GPTQ-Int8_axmodel"
 
+# bf16 copy of the embedding table, written on first boot and memory-mapped
+LLM_EMBED_MMAP = True
+QWEN_EMBED_BF16_PATH = QWEN_AX_PATH / "model.embed_tokens.weight.bf16.npy"
+
 LLM_SYSTEM_PROMPT = (
     "You are 'ay mee', an efficient assistant running on a Raspberry Pi 5 with an Axera 8850 accelerator. "
     "Answer clearly and concisely. "
     "When doing calculations, do not share reasoning steps in the final answer."
 )
 
+# Named system prompts; a REQUEST_LLM payload may pick one with "persona".
+# Each persona's prefilled prefix is snapshotted to LLM_KV_SNAPSHOT_DIR and
+# memory-mapped on later boots, so switching persona is a copy, not a prefill.
+LLM_PERSONAS = {
+    "home": LLM_SYSTEM_PROMPT,
+    "kiosk": (
+        "You are 'ay mee', a friendly assistant on a public information kiosk. "
+        "Keep answers short and polite, and never ask for personal information."
+    ),
+    "demo": (
+        "You are 'ay mee', a voice assistant demo running fully offline on a Raspberry Pi 5 "
+        "with an Axera 8850 accelerator. Answer briefly and enthusiastically."
+    ),
+}
+LLM_DEFAULT_PERSONA  = "home"
+LLM_KV_SNAPSHOT_DIR  = THIS_DIR / "cache" / "kv"   # None = keep snapshots in memory only
+
 # Sampling controls
 LLM_TEMPERATURE = 0.6     # higher = more creative, lower = more precise
 LLM_TOPP        = 0.9     # nucleus sampling
-LLM_TOPK        = 1       # keep 1 unless you explicitly want diversity
+LLM_TOPK        = 1       # keep 1 unless you explicitly want diversity (1 = greedy fast path)
+LLM_REPETITION_PENALTY = 1.0   # >1.0 discourages recently used tokens
+LLM_PRESENCE_PENALTY   = 0.0   # flat logit penalty for recently used tokens
+LLM_SEED               = None  # set an int for reproducible sampling / benchmarks
+
+# Generation budgets (defaults; a REQUEST_LLM payload may override them via "limits")
+LLM_MAX_NEW_TOKENS     = 384
+LLM_STOP_STRINGS       = []
+LLM_DEADLINE_S         = 30.0   # wall-clock budget per request, incl. prefill
+LLM_REPEAT_NGRAM       = 6      # stop when any 6-token sequence ...
+LLM_REPEAT_MAX         = 3      # ... has been generated this many times
+LLM_VOICE_TARGET_CHARS = 280    # voice replies end at the first sentence boundary past this
+
+# Tokenizer: Rust "fast" tokenizer, verified against the slow one once per
+# tokenizer build (the verdict is cached, later boots skip the slow load)
+LLM_FAST_TOKENIZER         = True
+LLM_TOKENIZER_PARITY_CHECK = True
+LLM_TOKENIZER_PARITY_CACHE = THIS_DIR / "cache" / "tokenizer_parity.json"   # None = check every boot
+
+# Context window. The decode sessions are compiled for 2559 KV rows, so that is
+# the upper bound; a smaller LLM_MAX_CONTEXT caps the positions actually used.
+LLM_MAX_CONTEXT = 2559
+LLM_KV_MODE     = "fixed"   # "fixed": stop at the limit; "sliding": keep prefix + recent window
+LLM_KV_WINDOW   = 768       # recent positions kept when the sliding window moves
+
+# Prefill the system prompt once at boot and reuse its KV rows every request
+LLM_CACHE_SYSTEM_PREFIX = True
+
+# OpenAI-compatible /v1/chat/completions on the main API (:7000)
+API_COMPLETION_TIMEOUT_S = 180   # includes time spent queued behind other requests
+
+# Skill router: trivial intents answered locally, before the LLM
+SKILLS_ENABLED             = True
+SKILLS_BUILTIN             = ["time", "date", "stop"]
+SKILL_PLUGINS              = []      # module paths exposing register(registry)
+SKILL_CLASSIFIER           = False   # example-based fallback when no pattern matches
+SKILL_CLASSIFIER_MIN_SCORE = 0.75
+
+# Speculative decoding by prompt lookup: draft ids are copied from earlier
+# n-gram matches in the prompt/history and verified in one 128-token prefill
+# pass; the longest agreeing prefix is kept. Off by default.
+LLM_SPECULATIVE      = False
+LLM_SPEC_NUM_DRAFT   = 8     # max draft ids per verify pass (< 128)
+LLM_SPEC_MIN_DRAFT   = 2     # shorter drafts use a plain decode step instead
+LLM_SPEC_MAX_NGRAM   = 3
+LLM_SPEC_MIN_NGRAM   = 1
+
+# Prefill the prompt for a stable partial transcript during the end-of-speech
+# silence; the final request reuses the rows it shares with it (needs ASR_PARTIALS)
+LLM_SPECULATIVE_PREFILL = False
+
+# Multi-turn memory: keep the previous turns' KV rows and prefill only the new turn
+LLM_MULTI_TURN           = True
+LLM_HISTORY_MAX_TURNS    = 8      # oldest turns are dropped past this
+LLM_HISTORY_IDLE_RESET_S = 180    # forget the conversation after this much silence
+LLM_REPLY_RESERVE        = 512    # context positions kept free for the reply
+
+# Sessions: each chat session (payload "session", default LLM_DEFAULT_SESSION)
+# keeps its own conversation. When sessions take turns on the one working
+# KV cache, the idle ones' rows are parked in host memory up to this budget.
+LLM_DEFAULT_SESSION  = "local"   # voice + dashboard chat
+LLM_MAX_SESSIONS     = 32        # least recently used conversations beyond this are dropped
+LLM_SESSION_SWAP_MB  = 256       # 0 = no swap, a session switch re-prefills
+
+# Response cache for repeated prompts (greedy sampling only, first turn only)
+LLM_CACHE_ENABLED          = True
+LLM_CACHE_MAX_ENTRIES      = 256                 # in-memory LRU size
+LLM_CACHE_TTL_S            = 7 * 24 * 3600
+LLM_CACHE_DB_PATH          = THIS_DIR / "cache" / "llm_answers.sqlite"  # None = memory only
+LLM_CACHE_DISK_MAX_ENTRIES = 2000
+
+# Streamed voice replies: speak sentence-by-sentence while Qwen is still decoding
+LLM_STREAM_TTS              = True
+TTS_STREAM_FIRST_MIN_CHARS  = 12    # first chunk may break at a clause after this many chars
+TTS_STREAM_CLAUSE_MIN_CHARS = 60    # later chunks only break at clauses past this length
+TTS_STREAM_MAX_CHARS        = 220   # force a break (on a space) if no punctuation shows up
 
 # =====================================================
 # TTS - MeloTTS
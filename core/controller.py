@@ -12,9 +12,11 @@ from .event_names import (
     GREETING_STARTED,
     GREETING_DONE,
     REQUEST_LISTEN,
+    REQUEST_TRANSCRIBE,
     USER_TEXT_READY,
     REQUEST_LLM,
     REQUEST_SPEAK,
+    REQUEST_SPEAK_CHUNK,
     SPEECH_PLAYED,
     ERROR,
 )
@@ -35,6 +37,7 @@ class StateController:
         bus.subscribe(GREETING_DONE, self._on_greeting_done)
         bus.subscribe(USER_TEXT_READY, self._on_user_text_ready)
         bus.subscribe(REQUEST_SPEAK, self._on_request_speak)
+        bus.subscribe(REQUEST_SPEAK_CHUNK, self._on_request_speak)
         bus.subscribe(SPEECH_PLAYED, self._on_speech_played)
         bus.subscribe(ERROR, self._on_error)
 
@@ -72,6 +75,12 @@ class StateController:
     def _on_wakeword(self, evt):
         if self.get_state() == AssistantState.LOOKING:
             self.bus.publish(VISION_INFER_PAUSED, None)
+            audio = (evt.payload or {}).get("command_audio")
+            if audio is not None:
+                # command spoken with the wake phrase: no greeting, no second listen
+                self.set_state(AssistantState.LISTENING)
+                self.bus.publish(REQUEST_TRANSCRIBE, {"audio": audio, "source": "voice"})
+                return
             self.set_state(AssistantState.GREETING)
             self.bus.publish(GREETING_STARTED, None)
     
@@ -101,6 +110,8 @@ class StateController:
             )
 
     def _on_request_speak(self, evt: Event):
+        # Also fires on the first streamed chunk (even an empty final one,
+        # so a blank answer still ends with SPEECH_PLAYED -> LOOKING)
         if self.get_state() == AssistantState.THINKING:
             self.set_state(AssistantState.SPEAKING)
 
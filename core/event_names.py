@@ -19,12 +19,18 @@ GREETING_DONE   = "GREETING_DONE"     # greeting audio finished (ready to listen
 
 CHAT_USER_MESSAGE = "chat.user.message"
 CHAT_ASSISTANT_MESSAGE = "chat.assistant.message"
+CHAT_ASSISTANT_DELTA   = "chat.assistant.delta"   # LLM -> UI/API: {"request_id", "session", "source", "delta"}
 
 REQUEST_LISTEN  = "REQUEST_LISTEN"    # controller -> ASR: capture one utterance
+REQUEST_TRANSCRIBE = "REQUEST_TRANSCRIBE"  # controller -> ASR: transcribe captured audio ({"audio", "source"})
 USER_TEXT_READY = "USER_TEXT_READY"   # ASR -> controller: final transcript ready
+USER_TEXT_PARTIAL = "USER_TEXT_PARTIAL"  # ASR -> LLM: partial transcript while speaking ({"text", "stable"})
 
 REQUEST_LLM     = "REQUEST_LLM"       # controller -> LLM: run inference
 REQUEST_SPEAK   = "REQUEST_SPEAK"     # LLM -> TTS: speak this text
+REQUEST_SPEAK_CHUNK = "REQUEST_SPEAK_CHUNK"  # LLM -> TTS: speak one streamed sentence ({"text", "final"})
+LLM_REQUEST_QUEUED  = "LLM_REQUEST_QUEUED"   # LLM: {"request_id", "session", "position"} jobs ahead
+LLM_RESPONSE_DONE   = "LLM_RESPONSE_DONE"    # LLM: final text + finish_reason/usage/timing, always fires
 
 SPEECH_PLAYED   = "SPEECH_PLAYED"     # Audio playback completed
 
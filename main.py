@@ -5,15 +5,21 @@ import subprocess
 import sys
 import requests
 import time
+import queue
 from pathlib import Path
 from core.events import EventBus
 from core.controller import StateController
 from core.axcl_executor import AxclExecutor
 from services.audio_out import AudioOut
+from services.audio_capture import AudioCaptureHub
+from ui.mic_level import publish_block_level
 from adapters.asr_sensevoice import SenseVoiceAdapter
 from services.asr_sensevoice_service import ASRService
 from adapters.llm_qwen import QwenAdapter
-from services.llm_service import LLMService
+from services.llm_service import LLMService, new_request_id
+from services import completion_api
+from services.skill_router import SkillRegistry, SkillRouter
+from services.skills import builtin as builtin_skills
 from adapters.tts_melotts import MeloTTSAdapter
 from services.tts_service import TTSService
 from core.states import AssistantState
@@ -31,6 +37,7 @@ from core.event_names import (
     CHAT_USER_MESSAGE,
     WAKEWORD_DETECTED,
     CHAT_ASSISTANT_MESSAGE,
+    CHAT_ASSISTANT_DELTA,
     ERROR
 )
 import config
@@ -44,7 +51,41 @@ def ui_post(path, payload):
     except Exception:
         pass
 
+# Chat pushes go through one queue so deltas and the final message reach the
+# UI in order, and the decode loop (which publishes the deltas) never waits
+# on HTTP. Consecutive deltas of one message are merged into a single post.
+ui_chat_q = queue.Queue()
+
+def ui_chat_push(path, payload):
+    ui_chat_q.put((path, payload))
+
+def ui_chat_forwarder():
+    while True:
+        batch = [ui_chat_q.get()]
+        while True:
+            try:
+                batch.append(ui_chat_q.get_nowait())
+            except queue.Empty:
+                break
+
+        merged = []
+        for path, payload in batch:
+            if (path == "/push_chat_delta" and merged and merged[-1][0] == path
+                    and merged[-1][1]["id"] == payload["id"]):
+                merged[-1][1]["delta"] += payload["delta"]
+            else:
+                merged.append((path, dict(payload)))
+        for path, payload in merged:
+            ui_post(path, payload)
+
+threading.Thread(target=ui_chat_forwarder, daemon=True, name="ui-chat").start()
+
 bus = None
+llm = None
+llm_service = None
+skill_router = None
+completions = None
+mic_hub = None
 api = Flask("AImyAPI")
 
 @api.route("/chat", methods=["POST"])
@@ -54,10 +95,82 @@ def api_chat():
     source = data.get("source", "text")
 
     bus.publish(CHAT_USER_MESSAGE, {"text": text})
-    bus.publish(REQUEST_LLM, {"text": text, "source": source})
+    req = {"text": text, "source": source}
+    if data.get("limits"):
+        req["limits"] = data["limits"]
+    if data.get("persona"):
+        req["persona"] = data["persona"]
+    if data.get("session_id"):
+        req["session"] = data["session_id"]
+    bus.publish(REQUEST_LLM, req)
 
     return jsonify({"ok": True})
 
+@api.route("/v1/chat/completions", methods=["POST"])
+def api_chat_completions():
+    """OpenAI-compatible chat completion (blocking, or SSE with "stream": true)."""
+    if completions is None:
+        return jsonify({"error": {"message": "LLM not loaded", "type": "unavailable"}}), 503
+    data = request.get_json(force=True, silent=True) or {}
+    try:
+        payload = completion_api.parse_request(data)
+    except completion_api.InvalidRequest as e:
+        return jsonify(e.body()), 400
+    if not payload["text"]:
+        return jsonify({"error": {"message": "no user message", "type": "invalid_request_error"}}), 400
+
+    request_id = new_request_id()
+    headers = {"X-Request-Id": request_id}
+    q = completions.start(request_id, payload)
+
+    if data.get("stream"):
+        events = completion_api.stream_events(
+            completions, request_id, q, config.API_COMPLETION_TIMEOUT_S,
+            position_fn=lambda: llm_service.queue_position(request_id),
+        )
+        headers["Cache-Control"] = "no-cache"
+        return Response(events, mimetype="text/event-stream", headers=headers)
+
+    created = int(time.time())
+    deadline = time.monotonic() + config.API_COMPLETION_TIMEOUT_S
+    position = 0
+    try:
+        while True:
+            kind, evt = q.get(timeout=max(0.0, deadline - time.monotonic()))
+            if kind == "queued":
+                position = evt.get("position", 0)
+            elif kind == "done":
+                body = completion_api.completion_body(request_id, created, evt, position)
+                return jsonify(body), (500 if evt.get("error") else 200), headers
+    except queue.Empty:
+        err = {"message": "timed out waiting for the model", "type": "timeout", "request_id": request_id}
+        return jsonify({"error": err}), 504, headers
+    finally:
+        completions.finish(request_id)
+
+@api.route("/llm/stats")
+def api_llm_stats():
+    if llm is None:
+        return jsonify({"ok": False, "error": "LLM not loaded"}), 503
+    return jsonify({
+        "ok": True,
+        "llm": llm.stats(),
+        "cache": llm_service.cache_stats() if llm_service else {},
+        "sessions": llm_service.session_stats() if llm_service else {},
+    })
+
+@api.route("/audio/stats")
+def api_audio_stats():
+    if mic_hub is None:
+        return jsonify({"ok": False, "error": "capture not started"}), 503
+    return jsonify({"ok": True, "capture": mic_hub.stats()})
+
+@api.route("/skills/stats")
+def api_skill_stats():
+    if skill_router is None:
+        return jsonify({"ok": False, "error": "skills disabled"}), 503
+    return jsonify({"ok": True, "skills": skill_router.stats.snapshot()})
+
 @api.route("/video_feed")
 def video_feed():
     def gen():
@@ -139,7 +252,7 @@ def wait_for_ui(timeout=10.0):
 
 #----------------- MAIN LOOP -----------------
 def main():
-    global bus
+    global bus, llm, llm_service, skill_router, completions, mic_hub
     logger.add("assistant.log", rotation="1 MB", level="INFO")
 
     bus = EventBus()
@@ -155,7 +268,7 @@ def main():
     #----------- CHAT WINDOW --------------
     bus.subscribe(
         CHAT_USER_MESSAGE,
-        lambda evt: ui_post(
+        lambda evt: ui_chat_push(
             "/push_chat",
             {
                 "role": "user",
@@ -164,13 +277,23 @@ def main():
         )
     )
 
+    # assistant replies stream in as deltas; the final message replaces the
+    # assembled text (same id) with the cleaned-up answer
+    def on_assistant_delta(evt):
+        p = evt.payload or {}
+        if p.get("source") != "api" and p.get("delta"):
+            ui_chat_push("/push_chat_delta", {"id": p.get("request_id"), "delta": p["delta"]})
+
+    bus.subscribe(CHAT_ASSISTANT_DELTA, on_assistant_delta)
+
     bus.subscribe(
         CHAT_ASSISTANT_MESSAGE,
-        lambda evt: ui_post(
+        lambda evt: ui_chat_push(
             "/push_chat",
             {
                 "role": "assistant",
-                "text": evt.payload.get("text", "")
+                "text": evt.payload.get("text", ""),
+                "id": evt.payload.get("request_id"),
             }
         )
     )
@@ -187,12 +310,34 @@ def main():
     llm = QwenAdapter(config.QWEN_HF_PATH, config.QWEN_AX_PATH)
     llm.init_model()
     logger.info("[LLM] Qwen initialized.")
-    llm_service = LLMService(bus, executor, llm)
+
+    if config.SKILLS_ENABLED:
+        registry = SkillRegistry()
+        builtin_skills.register(registry, config.SKILLS_BUILTIN)
+        registry.load_plugins(config.SKILL_PLUGINS)
+        skill_router = SkillRouter(
+            bus, registry,
+            use_classifier=config.SKILL_CLASSIFIER,
+            min_score=config.SKILL_CLASSIFIER_MIN_SCORE,
+        )
+        logger.info(f"[SKILL] Router ready: {[s.name for s in registry.skills()]}")
+    llm_service = LLMService(bus, executor, llm, router=skill_router)
+    completions = completion_api.CompletionBridge(bus)
 
     asr = SenseVoiceAdapter()
     asr.init_asr()
     logger.info("[ASR] SenseVoice initialized.")
-    asr_service = ASRService(bus, executor, asr)
+    # one always-open mic stream for wake word, ASR and the mic meter
+    mic_hub = AudioCaptureHub(
+        device=config.AUDIO_INPUT_DEVICE,
+        capture_rate=config.AUDIO_CAPTURE_RATE,
+        block_ms=config.AUDIO_BLOCK_MS,
+        ring_s=config.AUDIO_RING_S,
+    )
+    mic_hub.add_listener(publish_block_level)
+    mic_hub.start()
+
+    asr_service = ASRService(bus, executor, asr, mic_hub)
 
     tts = MeloTTSAdapter()
     tts.init_tts()
@@ -208,6 +353,7 @@ def main():
         wakeword = WakeWordService(
             bus=bus,
             controller=controller,
+            hub=mic_hub,
             keyword_path=config.PORCUPINE_KEYWORD_PATH,
             sensitivity=config.PORCUPINE_SENSITIVITY,
             access_key=config.PORCUPINE_ACCESS_KEY,
@@ -223,6 +369,7 @@ def main():
         wakeword = WakeWordService(
             bus=bus,
             controller=controller,
+            hub=mic_hub,
         )
         logger.info(
             "[WAKEWORD] Vosk loaded successfully.  "
@@ -279,11 +426,9 @@ def main():
     bus.subscribe(GREETING_STARTED, on_greeting_started)
 
     # ---------- After speech finishes, resume vision inference ----------
+    # (the wake word listener stays up and picks up again on LOOKING)
     def on_speech_played(evt):
         bus.publish(VISION_INFER_RESUMED, None)
-        if config.WAKEWORD_ENGINE == "vosk":
-            logger.info("[WAKEWORD] Restarting Vosk listener")
-            wakeword.start()
 
     bus.subscribe(SPEECH_PLAYED, on_speech_played)
 
@@ -309,6 +454,10 @@ def main():
             wakeword.stop()
         except Exception:
             pass
+        try:
+            mic_hub.stop()
+        except Exception:
+            pass
         try:
             if ui_process:
                 logger.info("[UI] Shutting down dashboard")
@@ -0,0 +1,188 @@
+# AImy/scripts/asr_batch.py
+"""
+Batch transcription + real-time-factor benchmark for SenseVoiceAdapter.
+
+    python scripts/asr_batch.py <wav dir> [--out asr_batch.json] [--workers 2] [--queue 4]
+    python scripts/asr_batch.py <wav dir> --stub on --stub-pass-ms 60
+    python scripts/asr_batch.py <wav dir> --longform      # recordings longer than the model window
+
+WAVs are decoded and resampled to 16 kHz by --workers CPU threads into a
+bounded queue (--queue files in flight, so memory stays flat); inference
+runs on the main thread, one file at a time, as it does on the
+accelerator. Without an accelerator (--stub auto) a stand-in SenseVoice
+runs the real fbank/LFR host work and sleeps --stub-pass-ms per model
+window, so host-side costs can be profiled anywhere.
+
+The JSON report has every transcript with its decode / queue-wait /
+inference times and RTF (inference time / audio length), plus percentiles.
+With --longform each file goes through LongFormTranscriber (chunks cut at
+pauses or with overlap, stitched), and the per-chunk texts are kept.
+"""
+from pathlib import Path
+import argparse
+import json
+import queue
+import statistics
+import sys
+import threading
+import time
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+from adapters.asr_sensevoice import SenseVoiceAdapter
+from services.asr_longform import LongFormTranscriber
+from services.audio_utils import load_wav_16k
+
+SAMPLE_RATE = 16000
+
+
+def pct(values, p):
+    values = sorted(values)
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))], 4)
+
+
+def spread(values) -> dict:
+    return {
+        "p50": pct(values, 50), "p90": pct(values, 90), "p99": pct(values, 99), "max": pct(values, 100),
+        "mean": round(statistics.fmean(values), 4) if values else None,
+    }
+
+
+def load_adapter(stub: str, pass_ms: float) -> tuple[SenseVoiceAdapter, bool]:
+    asr = SenseVoiceAdapter()
+    if stub != "on":
+        try:
+            asr.init_asr()
+            return asr, False
+        except Exception as e:
+            if stub == "off":
+                raise
+            print(f"[ASR] SenseVoice unavailable ({e!r}), using the stand-in")
+    asr.init_asr(stub=True, stub_pass_ms=pass_ms)
+    return asr, True
+
+
+def decoder(path_q: queue.Queue, work_q: queue.Queue):
+    while True:
+        path = path_q.get()
+        if path is None:
+            work_q.put(None)
+            return
+        t0 = time.perf_counter()
+        try:
+            audio, err = load_wav_16k(path), None
+        except Exception as e:
+            audio, err = None, repr(e)
+        work_q.put((path, audio, time.perf_counter() - t0, time.perf_counter(), err))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("data", help="directory of .wav files (searched recursively)")
+    ap.add_argument("--out", default="asr_batch.json")
+    ap.add_argument("--workers", type=int, default=2, help="CPU threads decoding/resampling WAVs")
+    ap.add_argument("--queue", type=int, default=4, help="decoded files waiting for inference")
+    ap.add_argument("--stub", choices=("auto", "on", "off"), default="auto")
+    ap.add_argument("--stub-pass-ms", type=float, default=0.0, help="stand-in model time per window")
+    ap.add_argument("--warmup", type=int, default=1, help="untimed passes on the first file")
+    ap.add_argument("--longform", action="store_true", help="chunk + stitch files longer than ASR_CHUNK_S")
+    args = ap.parse_args()
+
+    paths = sorted(Path(args.data).rglob("*.wav"))
+    if not paths:
+        raise SystemExit(f"no .wav files under {args.data}")
+    asr, stubbed = load_adapter(args.stub, args.stub_pass_ms)
+    longform = LongFormTranscriber(asr) if args.longform else None
+
+    if args.warmup:
+        first = load_wav_16k(paths[0])
+        for _ in range(args.warmup):
+            asr.infer_audio(first)
+
+    path_q = queue.Queue()
+    for p in paths:
+        path_q.put(p)
+    for _ in range(args.workers):
+        path_q.put(None)
+    work_q = queue.Queue(maxsize=max(1, args.queue))
+
+    t_start = time.perf_counter()
+    workers = [threading.Thread(target=decoder, args=(path_q, work_q), daemon=True) for _ in range(args.workers)]
+    for w in workers:
+        w.start()
+
+    files, done = [], 0
+    while done < args.workers:
+        item = work_q.get()
+        if item is None:
+            done += 1
+            continue
+        path, audio, decode_s, queued_at, err = item
+        rec = {"path": str(path), "decode_ms": round(1000 * decode_s, 2)}
+        if err is not None:
+            rec["error"] = err
+            files.append(rec)
+            print(f"[ERR] {path}: {err}")
+            continue
+
+        t0 = time.perf_counter()
+        try:
+            if longform is not None:
+                result = longform.transcribe(audio)
+                text = result["text"]
+                rec["chunks"] = result["chunks"]
+            else:
+                text = asr.infer_audio(audio)
+        except Exception as e:
+            rec["error"] = repr(e)
+            files.append(rec)
+            print(f"[ERR] {path}: {e!r}")
+            continue
+        infer_s = time.perf_counter() - t0
+        duration = len(audio) / SAMPLE_RATE
+        rec.update({
+            "text": text,
+            "duration_s": round(duration, 3),
+            "wait_ms": round(1000 * (t0 - queued_at), 2),
+            "infer_ms": round(1000 * infer_s, 2),
+            "rtf": round(infer_s / duration, 4) if duration else None,
+        })
+        files.append(rec)
+        print(f"{rec['rtf'] or 0:.3f} RTF  {rec['infer_ms']:8.1f} ms  {path.name}: {text}")
+
+    wall = time.perf_counter() - t_start
+    ok = [f for f in files if "error" not in f]
+    audio_s = sum(f["duration_s"] for f in ok)
+    infer_s = sum(f["infer_ms"] for f in ok) / 1000
+    summary = {
+        "files": len(files),
+        "errors": len(files) - len(ok),
+        "audio_s": round(audio_s, 2),
+        "wall_s": round(wall, 2),
+        "speed_x_realtime": round(audio_s / wall, 2) if wall else None,
+        "rtf_wall": round(wall / audio_s, 4) if audio_s else None,
+        "rtf_infer": round(infer_s / audio_s, 4) if audio_s else None,
+        "infer_ms": spread([f["infer_ms"] for f in ok]),
+        "decode_ms": spread([f["decode_ms"] for f in files]),
+        "wait_ms": spread([f["wait_ms"] for f in ok]),
+        "rtf": spread([f["rtf"] for f in ok if f["rtf"] is not None]),
+    }
+    report = {
+        "settings": {**vars(args), "stand_in": stubbed},
+        "summary": summary,
+        "files": files,
+    }
+    Path(args.out).write_text(json.dumps(report, indent=2, ensure_ascii=False))
+
+    print(f"\n{summary['files']} files, {audio_s:.1f}s audio in {wall:.1f}s "
+          f"({summary['speed_x_realtime']}x realtime), inference RTF {summary['rtf_infer']}"
+          f"{' [stand-in]' if stubbed else ''}")
+    print(f"  infer_ms p50={summary['infer_ms']['p50']} p90={summary['infer_ms']['p90']} "
+          f"p99={summary['infer_ms']['p99']}  -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
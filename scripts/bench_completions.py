@@ -0,0 +1,111 @@
+# AImy/scripts/bench_completions.py
+"""
+Load test for the OpenAI-compatible endpoint on a running assistant.
+
+    python scripts/bench_completions.py [--url http://127.0.0.1:7000] [--requests 8] [--concurrency 2]
+
+Each worker sends streaming /v1/chat/completions requests and records
+time to first content, total latency, completion tokens and the queue
+position reported while waiting; percentiles are printed at the end.
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+
+import requests
+
+PROMPTS = (
+    "Give me one tip for sleeping better.",
+    "What is the capital of Australia?",
+    "Explain what a heat pump does in two sentences.",
+    "Suggest a name for a grey cat.",
+)
+
+
+def one_request(url: str, prompt: str, max_tokens: int, session: str | None) -> dict:
+    body = {"messages": [{"role": "user", "content": prompt}], "stream": True, "max_tokens": max_tokens}
+    if session:
+        body["session_id"] = session
+    t0 = time.perf_counter()
+    first = None
+    max_position = 0
+    usage, timing = {}, {}
+    with requests.post(f"{url}/v1/chat/completions", json=body, stream=True, timeout=600) as r:
+        r.raise_for_status()
+        for line in r.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data: "):
+                continue
+            data = line[len("data: "):]
+            if data == "[DONE]":
+                break
+            evt = json.loads(data)
+            max_position = max(max_position, evt.get("queue_position") or 0)
+            for choice in evt.get("choices", []):
+                if choice.get("delta", {}).get("content") and first is None:
+                    first = time.perf_counter() - t0
+            usage = evt.get("usage", usage)
+            timing = evt.get("timing", timing)
+    return {
+        "first_s": first,
+        "total_s": time.perf_counter() - t0,
+        "tokens": usage.get("completion_tokens", 0),
+        "server_ttft_s": timing.get("ttft_s"),
+        "queue_s": timing.get("queue_s"),
+        "max_position": max_position,
+    }
+
+
+def pct(values, p):
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default="http://127.0.0.1:7000")
+    ap.add_argument("--requests", type=int, default=8)
+    ap.add_argument("--concurrency", type=int, default=2)
+    ap.add_argument("--max-tokens", type=int, default=96)
+    ap.add_argument("--sessions", action="store_true", help="one session per worker instead of stateless")
+    args = ap.parse_args()
+
+    results, lock = [], threading.Lock()
+    counter = iter(range(args.requests))
+
+    def worker(w):
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            res = one_request(args.url, PROMPTS[i % len(PROMPTS)], args.max_tokens,
+                              f"bench-{w}" if args.sessions else None)
+            with lock:
+                results.append(res)
+            print(f"[{i}] first={res['first_s'] or 0:.2f}s total={res['total_s']:.2f}s "
+                  f"tokens={res['tokens']} queued_behind={res['max_position']}")
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+
+    tokens = sum(r["tokens"] for r in results)
+    print(f"\n{len(results)} requests in {wall:.1f}s, {tokens / wall:.1f} completion tok/s overall")
+    for key in ("first_s", "total_s", "server_ttft_s", "queue_s"):
+        vals = [r[key] for r in results if r[key] is not None]
+        if not vals:
+            continue
+        print(f"  {key:14s} p50={pct(vals, 50):.3f}  p90={pct(vals, 90):.3f}  "
+              f"max={pct(vals, 100):.3f}  mean={statistics.fmean(vals):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# AImy/scripts/calibrate_vad.py
+"""
+Calibrate the spectral VAD for a room and save it as a named profile.
+
+    python scripts/calibrate_vad.py --name living_room [--seconds 5]
+    python scripts/calibrate_vad.py --name kiosk --wav ambient.wav
+
+Record (or pass) a few seconds of the room's normal background noise with
+nobody talking; the noise floor and margins are written to
+config.VAD_PROFILE_PATH. Set config.VAD_PROFILE to the name to use it.
+"""
+from pathlib import Path
+import argparse
+import json
+import sys
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+import config
+from services.audio_utils import load_wav_16k
+from services.vad import SpectralVAD, save_profile
+
+
+def record(seconds: float):
+    from services.audio_capture import AudioCaptureHub, SAMPLE_RATE
+
+    hub = AudioCaptureHub(device=config.AUDIO_INPUT_DEVICE, capture_rate=config.AUDIO_CAPTURE_RATE,
+                          block_ms=config.AUDIO_BLOCK_MS, ring_s=seconds + 1)
+    hub.start()
+    try:
+        print(f"Recording {seconds:.0f}s of background noise, stay quiet…")
+        audio = hub.reader("calibrate").read(int(seconds * SAMPLE_RATE), timeout=seconds + 5)
+        if audio is None:
+            raise SystemExit("no audio from the microphone")
+        return audio.copy()
+    finally:
+        hub.stop()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--name", required=True, help="environment / profile name")
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--wav", help="use a recording instead of the microphone")
+    args = ap.parse_args()
+
+    ambient = load_wav_16k(args.wav) if args.wav else record(args.seconds)
+    profile = SpectralVAD.calibrate(ambient)
+    save_profile(args.name, profile)
+    print(json.dumps(profile, indent=2))
+    print(f"Saved profile '{args.name}' to {config.VAD_PROFILE_PATH}")
+
+
+if __name__ == "__main__":
+    main()
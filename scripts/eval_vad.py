@@ -0,0 +1,147 @@
+# AImy/scripts/eval_vad.py
+"""
+Offline endpointing evaluation over labeled WAV files.
+
+    python scripts/eval_vad.py data/vad/ [--vad rms,spectral,silero] [--end-sil-ms 450] [--json out.json]
+
+Each <name>.wav needs speech labels next to it, either <name>.txt in
+Audacity label format ("start<TAB>end[<TAB>label]" in seconds, one
+utterance per line) or <name>.json {"speech": [[start, end], ...]}.
+
+Every file is streamed through the same Endpointer the mic listener uses,
+in 30 ms blocks; after each commit the endpointer is reset as a new listen
+would. Per engine it reports:
+  endpoint latency : commit time - labeled end of the utterance
+  false cuts       : commits more than --tolerance-ms before an utterance ends
+  missed           : utterances with no speech start, or no commit before the next one
+  false triggers   : speech starts outside every labeled utterance
+"""
+from pathlib import Path
+import argparse
+import json
+import statistics
+import sys
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+from services.audio_utils import load_wav_16k
+from services.asr_sensevoice_service import BLOCK_MS, BLOCK_SAMPLES, MIN_SPEECH_MS, END_SIL_MS, MAX_UTTER_MS
+from services.vad import Endpointer, make_vad
+
+
+def load_labels(wav: Path):
+    txt, js = wav.with_suffix(".txt"), wav.with_suffix(".json")
+    if js.exists():
+        return [tuple(map(float, seg[:2])) for seg in json.loads(js.read_text())["speech"]]
+    if txt.exists():
+        segs = []
+        for line in txt.read_text().splitlines():
+            parts = line.split()
+            if len(parts) >= 2 and not line.startswith("\\"):   # skip Audacity spectral-selection lines
+                segs.append((float(parts[0]), float(parts[1])))
+        return sorted(segs)
+    return None
+
+
+def run_file(audio, engine: str, profile, end_sil_ms: int, min_speech_ms: int):
+    """(speech start times, [(commit time, reason)]) in seconds."""
+    ep = Endpointer(make_vad(engine, profile, BLOCK_MS), BLOCK_MS, min_speech_ms, end_sil_ms, MAX_UTTER_MS)
+    starts, commits = [], []
+    for i in range(len(audio) // BLOCK_SAMPLES):
+        t = (i + 1) * BLOCK_MS / 1000
+        was = ep.speaking
+        reason = ep.push(audio[i * BLOCK_SAMPLES:(i + 1) * BLOCK_SAMPLES])
+        if ep.speaking and not was:
+            starts.append(t)
+        if reason:
+            commits.append((t, reason))
+            ep.reset()
+    return starts, commits
+
+
+def score(labels, starts, commits, tolerance_s: float, duration_s: float):
+    out = {"utterances": len(labels), "latency_ms": [], "false_cuts": 0, "missed": 0, "false_triggers": 0, "maxlen": 0}
+    for i, (s, e) in enumerate(labels):
+        horizon = labels[i + 1][0] if i + 1 < len(labels) else duration_s + 1
+        if not any(s - tolerance_s <= t <= e + tolerance_s for t in starts):
+            out["missed"] += 1
+            continue
+        ended = False
+        for t, reason in commits:
+            if t <= s or t > horizon:
+                continue
+            if t < e - tolerance_s:
+                out["false_cuts"] += 1
+                out["maxlen"] += reason == "maxlen"
+            elif not ended:
+                out["latency_ms"].append(1000 * (t - e))
+                ended = True
+        if not ended:
+            out["missed"] += 1
+    out["false_triggers"] = sum(
+        1 for t in starts if not any(s - tolerance_s <= t <= e + tolerance_s for s, e in labels)
+    )
+    return out
+
+
+def pct(values, p):
+    values = sorted(values)
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))], 1)
+
+
+def summarize(results: list) -> dict:
+    lat = [v for r in results for v in r["latency_ms"]]
+    return {
+        "files": len(results),
+        "utterances": sum(r["utterances"] for r in results),
+        "latency_ms": {
+            "p50": pct(lat, 50), "p90": pct(lat, 90), "max": pct(lat, 100),
+            "mean": round(statistics.fmean(lat), 1) if lat else None,
+        },
+        "false_cuts": sum(r["false_cuts"] for r in results),
+        "maxlen_cuts": sum(r["maxlen"] for r in results),
+        "missed": sum(r["missed"] for r in results),
+        "false_triggers": sum(r["false_triggers"] for r in results),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("data", help="directory of labeled .wav files")
+    ap.add_argument("--vad", default="rms,spectral", help="comma-separated engines: rms, spectral, silero")
+    ap.add_argument("--profile", help="calibration profile for the spectral VAD")
+    ap.add_argument("--end-sil-ms", type=int, default=END_SIL_MS)
+    ap.add_argument("--min-speech-ms", type=int, default=MIN_SPEECH_MS)
+    ap.add_argument("--tolerance-ms", type=int, default=200)
+    ap.add_argument("--json", help="write the full report here")
+    args = ap.parse_args()
+
+    wavs = sorted(p for p in Path(args.data).rglob("*.wav") if load_labels(p) is not None)
+    if not wavs:
+        raise SystemExit(f"no labeled .wav files under {args.data}")
+    audio = {p: load_wav_16k(p) for p in wavs}
+
+    report = {"settings": vars(args), "engines": {}}
+    for engine in args.vad.split(","):
+        files = {}
+        for p in wavs:
+            starts, commits = run_file(audio[p], engine, args.profile, args.end_sil_ms, args.min_speech_ms)
+            files[str(p)] = score(load_labels(p), starts, commits, args.tolerance_ms / 1000, len(audio[p]) / 16000)
+        summary = summarize(list(files.values()))
+        report["engines"][engine] = {"summary": summary, "files": files}
+
+        lat = summary["latency_ms"]
+        print(f"{engine:9s} utterances={summary['utterances']:4d}  latency p50={lat['p50']} p90={lat['p90']} "
+              f"mean={lat['mean']} ms  false_cuts={summary['false_cuts']}  missed={summary['missed']}  "
+              f"false_triggers={summary['false_triggers']}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+        print(f"report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
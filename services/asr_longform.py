@@ -0,0 +1,158 @@
+# AImy/services/asr_longform.py
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+import config
+from services.vad import frame_signal, spectral_features
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+
+# ---------- chunk planning ----------
+def find_pauses(audio: np.ndarray, pause_ms: int) -> list:
+    """
+    Sample positions in the middle of every pause of at least pause_ms.
+    Frames are speech when their band energy is VAD_END_MARGIN_DB over the
+    quietest frame of the surrounding VAD_FLOOR_WINDOW_MS.
+    """
+    frame_len = SAMPLE_RATE * FRAME_MS // 1000
+    frames = frame_signal(audio, frame_len)
+    if len(frames) == 0:
+        return []
+    band_db = spectral_features(frames, band_hz=config.VAD_BAND_HZ)["band_db"]
+    win = min(len(band_db), max(1, config.VAD_FLOOR_WINDOW_MS // FRAME_MS))
+    floor = sliding_window_view(np.pad(band_db, (win // 2, win - 1 - win // 2), mode="edge"), win).min(axis=1)
+    speech = band_db > floor + config.VAD_END_MARGIN_DB
+
+    # runs of silent frames
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], (~speech).astype(np.int8), [0]))))
+    min_frames = max(1, pause_ms // FRAME_MS)
+    return [
+        (a + b) // 2 * frame_len
+        for a, b in zip(edges[0::2], edges[1::2])
+        if b - a >= min_frames and a > 0 and b < len(speech)
+    ]
+
+
+def plan_chunks(audio: np.ndarray, chunk_s: float, min_s: float, overlap_s: float, pause_ms: int) -> list:
+    """
+    [(start, end, overlaps_previous)] covering the audio. A chunk ends at the
+    last pause between min_s and chunk_s; with no pause there it is cut at
+    chunk_s and the next chunk starts overlap_s earlier.
+    """
+    n = len(audio)
+    size, min_len, overlap = (int(s * SAMPLE_RATE) for s in (chunk_s, min_s, overlap_s))
+    pauses = find_pauses(audio, pause_ms)
+
+    chunks, start, overlapped = [], 0, False
+    while n - start > size:
+        cuts = [p for p in pauses if start + min_len <= p <= start + size]
+        if cuts:
+            chunks.append((start, cuts[-1], overlapped))
+            start, overlapped = cuts[-1], False
+        else:
+            chunks.append((start, start + size, overlapped))
+            start, overlapped = start + size - overlap, True
+    chunks.append((start, n, overlapped))
+    return chunks
+
+
+# ---------- stitching ----------
+_CJK_RANGES = "\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af"   # kana, CJK ideographs, hangul
+_TOKEN = re.compile(f"[{_CJK_RANGES}]|[^\\s{_CJK_RANGES}]+")
+_CJK = re.compile(f"[{_CJK_RANGES}]")
+
+
+def _tokens(text: str) -> list:
+    """Words, with CJK split per character (no spaces to split on)."""
+    return _TOKEN.findall(text or "")
+
+
+def _norm(tok: str) -> str:
+    return re.sub(r"[^\w]", "", tok.lower())
+
+
+def _join(tokens: list) -> str:
+    out = ""
+    for tok in tokens:
+        if out and not (_CJK.match(tok) and _CJK.match(out[-1])):
+            out += " "
+        out += tok
+    return out
+
+
+def _overlap(a: list, b: list, max_tokens: int):
+    """
+    (tokens to drop from the end of a, tokens to drop from the start of b)
+    so the text the two chunks share is kept once. A word cut in half at
+    the boundary shows up as a fragment at the end of a or the start of b,
+    so alignments that skip one such token are tried as well.
+    """
+    na, nb = [_norm(t) for t in a], [_norm(t) for t in b]
+    for skip_a, skip_b in ((0, 0), (1, 0), (0, 1), (1, 1)):
+        aa, bb = na[:len(na) - skip_a], nb[skip_b:]
+        for k in range(min(len(aa), len(bb), max_tokens), 0, -1):
+            if aa[-k:] == bb[:k] and any(aa[-k:]):
+                return skip_a, skip_b + k
+    return 0, 0
+
+
+def stitch(texts: list, overlapped: list, max_tokens: int = 16) -> str:
+    """Join chunk transcripts; where a chunk overlaps the previous one, drop the repeated words."""
+    out = []
+    for text, ov in zip(texts, overlapped):
+        toks = _tokens(text)
+        if ov and out and toks:
+            drop_a, drop_b = _overlap(out, toks, max_tokens)
+            out, toks = out[:len(out) - drop_a], toks[drop_b:]
+        out.extend(toks)
+    return _join(out)
+
+
+# ---------- file / buffer transcription ----------
+class LongFormTranscriber:
+    """
+    Transcribes audio of any length through SenseVoiceAdapter: plan_chunks()
+    splits it, a helper thread slices the next chunk and computes its fbank
+    frames while the model decodes the current one, and stitch() merges
+    the transcripts.
+    """
+
+    def __init__(self, asr, chunk_s: float | None = None, min_s: float | None = None,
+                 overlap_s: float | None = None, pause_ms: int | None = None):
+        self.asr = asr
+        self.chunk_s = chunk_s or config.ASR_CHUNK_S
+        self.min_s = min_s or config.ASR_CHUNK_MIN_S
+        self.overlap_s = config.ASR_CHUNK_OVERLAP_S if overlap_s is None else overlap_s
+        self.pause_ms = pause_ms or config.ASR_CHUNK_PAUSE_MS
+
+    def _prepare(self, audio: np.ndarray, start: int, end: int):
+        chunk = np.array(audio[start:end], dtype=np.float32)
+        stream = self.asr.new_stream()
+        if stream is None:
+            return chunk, None
+        stream.accept(chunk)
+        return chunk, stream.features().copy()
+
+    def transcribe(self, audio: np.ndarray) -> dict:
+        """{"text", "chunks": [{"start_s", "end_s", "overlap", "text"}]}"""
+        chunks = plan_chunks(audio, self.chunk_s, self.min_s, self.overlap_s, self.pause_ms)
+        texts = []
+        with ThreadPoolExecutor(max_workers=1) as prep:
+            nxt = prep.submit(self._prepare, audio, *chunks[0][:2])
+            for i in range(len(chunks)):
+                chunk, feats = nxt.result()
+                if i + 1 < len(chunks):
+                    nxt = prep.submit(self._prepare, audio, *chunks[i + 1][:2])
+                texts.append(self.asr.infer_audio(chunk, feats))
+
+        return {
+            "text": stitch(texts, [ov for _, _, ov in chunks]),
+            "chunks": [
+                {"start_s": round(s / SAMPLE_RATE, 3), "end_s": round(e / SAMPLE_RATE, 3), "overlap": ov, "text": t}
+                for (s, e, ov), t in zip(chunks, texts)
+            ],
+        }
@@ -1,11 +1,11 @@
 # AImy/services/asr_sensevoice_service.py
-import queue, time
+import time
 import numpy as np
 import threading
-import sounddevice as sd
 from loguru import logger
-from core.event_names import REQUEST_LISTEN, USER_TEXT_READY, CHAT_USER_MESSAGE
-from ui.mic_level import publish_mic_level
+from core.event_names import REQUEST_LISTEN, REQUEST_TRANSCRIBE, USER_TEXT_READY, USER_TEXT_PARTIAL, CHAT_USER_MESSAGE
+from services.vad import Endpointer, make_vad
+from services.asr_longform import stitch
 
 
 import config  
@@ -14,118 +14,207 @@ SAMPLE_RATE   = 16000
 BLOCK_MS      = 30
 BLOCK_SAMPLES = SAMPLE_RATE * BLOCK_MS // 1000
 
-# basic VAD thresholds
-RMS_START     = 0.015   # start talking
-RMS_END       = 0.010   # stay talking
+# endpointing (the per-block speech decision is config.VAD_ENGINE, see services/vad.py)
 MIN_SPEECH_MS = 250
 END_SIL_MS    = 450
 MAX_UTTER_MS  = 10000  # 10s
 
-def rms(x: np.ndarray) -> float:
-    return float(np.sqrt(np.mean(x * x, dtype=np.float32)) + 1e-12)
-
 
 class SenseVoiceMicListener:
     """
-    One-shot ASR:
+    One-shot ASR on the shared capture hub:
+      - starts ASR_PREROLL_MS in the past, so a first syllable spoken
+        before REQUEST_LISTEN arrived is not lost
       - waits for speech
       - captures one utterance
       - publishes USER_TEXT_READY
       - exits cleanly
+
+    With config.ASR_STREAMING_FEATURES the fbank frames are computed per
+    block as audio arrives (adapter.new_stream()), so partial and final
+    decodes only run the model.
+
+    With config.ASR_PARTIALS it also decodes the speech so far every
+    ASR_PARTIAL_INTERVAL_MS and once per pause, publishing USER_TEXT_PARTIAL
+    (stable when two partials agree or the speaker has paused).
+
+    With config.ASR_LONGFORM the utterance may run to ASR_LONGFORM_MAX_S and
+    only ends after ASR_LONGFORM_END_SIL_MS of silence:
+    speech_buf then holds only the current chunk, which is cut at a pause
+    (or at ASR_CHUNK_S, carrying ASR_CHUNK_OVERLAP_S into the next chunk)
+    and decoded right away; the final transcript stitches the chunks.
     """
 
-    def __init__(self, bus, executor, asr_adapter):
+    def __init__(self, bus, executor, asr_adapter, hub, vad=None):
         self.bus = bus
         self.executor = executor
         self.asr = asr_adapter
+        self.hub = hub
+        self.longform = config.ASR_LONGFORM
+        if self.longform:
+            end_sil_ms, max_utter_ms = config.ASR_LONGFORM_END_SIL_MS, config.ASR_LONGFORM_MAX_S * 1000
+        else:
+            end_sil_ms, max_utter_ms = END_SIL_MS, MAX_UTTER_MS
+        self.ep = Endpointer(vad or make_vad(block_ms=BLOCK_MS), BLOCK_MS, MIN_SPEECH_MS, end_sil_ms, max_utter_ms)
+        self.stream = asr_adapter.new_stream()
+        self._feat_s = 0.0
+
+        # long-form chunks: texts are filled in by executor callbacks, in order
+        self._chunk_texts = []
+        self._chunk_overlaps = []
+        self._next_overlapped = False
 
-        self.q = queue.Queue()
         self._reset_state()
         self._stopped = False
+        self._committed = False
+
+        # partial transcripts
+        self._partial_busy = False
+        self._last_partial = ""
+        self._last_partial_ms = 0
+        self._pause_partial_done = False
 
     # ---------- state ----------
     def _reset_state(self):
-        self.speaking = False
         self.speech_buf = []
-        self.above_ms = 0
-        self.silence_ms = 0
-        self.utter_ms = 0
-
-    # ---------- audio callback ----------
-    def _audio_cb(self, indata, frames, time_info, status):
-        if status:
-            logger.warning(f"[ASR] callback status: {status}")
-        mono = indata.mean(axis=1).astype(np.float32, copy=False)
-        try:
-            self.q.put_nowait(mono)
-        except queue.Full:
-            logger.warning("[ASR] input queue full, dropping block")
-
-    # ---------- mic open ----------
-    def _open_mic(self):
-        return sd.InputStream(
-            channels=1,
-            samplerate=SAMPLE_RATE,
-            blocksize=BLOCK_SAMPLES,
-            dtype="float32",
-            callback=self._audio_cb,
-        )
-
-    # ---------- VAD ----------
-    def _is_speech(self, energy: float) -> bool:
-        threshold = RMS_END if self.speaking else RMS_START
-        return energy > threshold
+        self.ep.reset()
 
     def _process_block(self, block: np.ndarray):
+        # views into the hub's ring, valid for AUDIO_RING_S; concatenated (copied) on commit
         self.speech_buf.append(block)
+        if self.stream is not None:
+            t0 = time.perf_counter()
+            self.stream.accept(block)
+            self._feat_s += time.perf_counter() - t0
+
+        was_speaking = self.ep.speaking
+        reason = self.ep.push(block)
+        if self.ep.speaking and not was_speaking:
+            logger.debug(f"[ASR] speech start ({self.ep.vad.name} VAD)")
+
+        if self.longform and not reason:
+            self._maybe_cut_chunk()
+        if self.ep.speaking and config.ASR_PARTIALS and not reason:
+            self._maybe_partial()
+        return reason
+
+    # ---------- long-form chunks ----------
+    def _restart_chunk(self, blocks: list):
+        """Start the next chunk from `blocks` (the overlap carried over, or recent lead-in)."""
+        self.speech_buf = list(blocks)
+        self.stream = self.asr.new_stream()
+        if self.stream is not None:
+            for b in self.speech_buf:
+                self.stream.accept(b)
+
+    def _maybe_cut_chunk(self):
+        chunk_ms = len(self.speech_buf) * BLOCK_MS
+        if not self.ep.speaking:
+            # bounded lead-in while waiting for speech (the views must stay inside the ring)
+            if chunk_ms > 10000:
+                self._restart_chunk(self.speech_buf[-(2000 // BLOCK_MS):])
+            return
+        if chunk_ms >= config.ASR_CHUNK_MIN_S * 1000 and self.ep.silence_ms >= config.ASR_CHUNK_PAUSE_MS:
+            self._cut_chunk(0)
+        elif chunk_ms >= config.ASR_CHUNK_S * 1000:
+            self._cut_chunk(int(config.ASR_CHUNK_OVERLAP_S * 1000) // BLOCK_MS)
+
+    def _cut_chunk(self, overlap_blocks: int):
+        audio = np.concatenate(self.speech_buf, axis=0)
+        feats = self.stream.features().copy() if self.stream is not None else None
+        idx = len(self._chunk_texts)
+        self._chunk_texts.append("")
+        self._chunk_overlaps.append(self._next_overlapped)
+        self._next_overlapped = overlap_blocks > 0
+        logger.info(f"[ASR] long-form chunk {idx}: {len(audio) / SAMPLE_RATE:.1f}s "
+                    f"({'fixed window' if overlap_blocks else 'pause'})")
+        self._restart_chunk(self.speech_buf[-overlap_blocks:] if overlap_blocks else [])
 
-        energy = rms(block)
-
-        # --- mic level scaling for UI ---
-        # Map ~0.01–0.06 RMS → 0.0–1.0
-        ui_level = min(1.0, max(0.0, (energy - 0.01) * 20))
+        def task():
+            return self.asr.infer_audio(audio, feats)
 
-        publish_mic_level(ui_level)
+        def cb(text):
+            self._chunk_texts[idx] = (text or "").strip()
+            logger.debug(f"[ASR] chunk {idx}: {self._chunk_texts[idx]!r}")
+
+        self.executor.submit("ASR:SenseVoice:chunk", task, cb)
+
+    def _stitched(self, last: str) -> str:
+        if not self._chunk_texts:
+            return last
+        return stitch(self._chunk_texts + [last], self._chunk_overlaps + [self._next_overlapped]).strip()
+
+    # ---------- partials ----------
+    def _maybe_partial(self):
+        silence_ms, utter_ms = self.ep.silence_ms, self.ep.utter_ms
+        if silence_ms == 0:
+            self._pause_partial_done = False
+        if self._partial_busy or self._committed:
+            return
 
-        if self._is_speech(energy):
-            self.above_ms += BLOCK_MS
-            self.silence_ms = 0
-        else:
-            self.silence_ms += BLOCK_MS
-            self.above_ms = max(0, self.above_ms - BLOCK_MS // 2)
+        pause = silence_ms >= config.ASR_PARTIAL_PAUSE_MS
+        if pause:
+            if self._pause_partial_done:
+                return
+            self._pause_partial_done = True
+        elif silence_ms or utter_ms - self._last_partial_ms < config.ASR_PARTIAL_INTERVAL_MS:
+            return
 
-        if not self.speaking and self.above_ms >= MIN_SPEECH_MS:
-            self.speaking = True
-            self.utter_ms = 0
-            logger.debug("[ASR] speech start")
+        self._last_partial_ms = utter_ms
+        audio = np.concatenate(self.speech_buf, axis=0)
+        feats = self.stream.features().copy() if self.stream is not None else None
+        self._partial_busy = True
 
-        if self.speaking:
-            self.utter_ms += BLOCK_MS
-            return self._check_commit()
+        def task():
+            try:
+                return self.asr.infer_audio(audio, feats)
+            finally:
+                self._partial_busy = False
 
-        return None
+        def cb(text):
+            text = self._stitched((text or "").strip())
+            if self._committed or not text:
+                return
+            stable = pause or text == self._last_partial
+            self._last_partial = text
+            logger.debug(f"[ASR] partial ({'stable' if stable else 'unstable'}): {text!r}")
+            self.bus.publish(USER_TEXT_PARTIAL, {"text": text, "stable": stable, "source": "voice"})
 
-    def _check_commit(self):
-        if self.silence_ms >= END_SIL_MS:
-            return "silence"
-        if self.utter_ms >= MAX_UTTER_MS:
-            return "maxlen"
-        return None
+        self.executor.submit("ASR:SenseVoice:partial", task, cb)
 
     # ---------- commit ----------
     def _commit_and_stop(self, reason: str):
+        self._committed = True
         audio_full = np.concatenate(self.speech_buf, axis=0)
-        logger.info(f"[ASR] committing {len(audio_full)} samples (reason={reason})")
+        feats = self.stream.features().copy() if self.stream is not None else None
+        if feats is not None:
+            logger.info(
+                f"[ASR] committing {len(audio_full)} samples (reason={reason}, "
+                f"{len(feats)} fbank frames ready, {1000 * self._feat_s:.0f} ms spent on features while listening)"
+            )
+        else:
+            logger.info(f"[ASR] committing {len(audio_full)} samples (reason={reason})")
+
+        # long-form: a last chunk that is only the closing silence is not decoded
+        # (the no-op task still runs after the pending chunks, keeping the order)
+        tail_silent = bool(self._chunk_texts) and self.ep.silence_ms >= len(self.speech_buf) * BLOCK_MS
+        if self._chunk_texts:
+            logger.info(f"[ASR] long-form: {len(self._chunk_texts)} chunks decoded, last chunk "
+                        f"{'skipped (silence)' if tail_silent else 'pending'}")
 
         self._reset_state()
+        t_commit = time.perf_counter()
 
         def task():
-            return self.asr.infer_audio(audio_full)
+            if tail_silent:
+                return ""
+            return self.asr.infer_audio(audio_full, feats)
 
         def cb(text):
-            text = (text or "").strip()
+            text = self._stitched((text or "").strip())
             if text:
-                logger.info(f"[ASR] final text ({reason}): {text!r}")
+                latency_ms = 1000 * (time.perf_counter() - t_commit)
+                logger.info(f"[ASR] final text ({reason}, {latency_ms:.0f} ms after commit): {text!r}")
                 #self.bus.publish(USER_TEXT_READY, {"text": text})
                 # 1️ Publish user message to chat
                 self.bus.publish(
@@ -147,54 +236,80 @@ class SenseVoiceMicListener:
 
         self.executor.submit("ASR:SenseVoice:infer", task, cb)
 
-    # ---------- fallback ----------
-    def _fallback_no_mic(self, err: Exception):
-        logger.error(f"[ASR] Mic failed to open: {err!r}")
-        self._stopped = True
-
     # ---------- main loop ----------
     def listen_once(self):
-        logger.info("[ASR] Listening once… (opening mic)")
+        logger.info("[ASR] Listening once…")
         start_ts = time.time()
+        reader = self.hub.reader("asr", preroll_ms=config.ASR_PREROLL_MS)
 
-        try:
-            stream = self._open_mic()
-        except Exception as e:
-            self._fallback_no_mic(e)
-            return
-
-        with stream:
-            while not self._stopped:
-                try:
-                    block = self.q.get(timeout=0.5)
-                except queue.Empty:
-                    continue
+        while not self._stopped:
+            block = reader.read(BLOCK_SAMPLES)
 
+            if block is not None:
                 reason = self._process_block(block)
                 if reason:
                     self._commit_and_stop(reason)
                     break
 
-                # hard timeout
-                if (time.time() - start_ts) * 1000 > (MAX_UTTER_MS + 4000):
-                    logger.warning("[ASR] hard timeout")
-                    if self.speech_buf:
-                        self._commit_and_stop("hard_timeout")
-                    self._stopped = True
+            # hard timeout
+            if (time.time() - start_ts) * 1000 > (self.ep.max_utter_ms + 4000):
+                logger.warning("[ASR] hard timeout")
+                if self.speech_buf:
+                    self._commit_and_stop("hard_timeout")
+                self._stopped = True
 
 class ASRService:
     """
     Event-driven ASR service.
-    REQUEST_LISTEN → SenseVoiceMicListener.listen_once()
+    REQUEST_LISTEN     → SenseVoiceMicListener.listen_once()
+    REQUEST_TRANSCRIBE → transcribe audio captured elsewhere (the command
+                         spoken right after the wake word); an empty
+                         transcript falls back to a normal listen.
+
+    The VAD outlives the listeners: between turns it keeps watching the
+    hub's audio, so its noise floor is current when the next listen starts.
     """
 
-    def __init__(self, bus, executor, asr_adapter):
+    def __init__(self, bus, executor, asr_adapter, hub):
         self.bus = bus
         self.executor = executor
         self.asr = asr_adapter
+        self.hub = hub
         self._listening = False
 
+        self.vad = make_vad(block_ms=BLOCK_MS)
+        hub.add_listener(self._observe)
+        logger.info(f"[ASR] VAD: {self.vad.name}")
+
         bus.subscribe(REQUEST_LISTEN, self._on_request_listen)
+        bus.subscribe(REQUEST_TRANSCRIBE, self._on_request_transcribe)
+
+    def _observe(self, block):
+        if not self._listening:
+            self.vad.observe(block)
+
+    def _on_request_transcribe(self, evt):
+        payload = evt.payload or {}
+        audio = payload.get("audio")
+        if audio is None or len(audio) == 0:
+            self._on_request_listen(evt)
+            return
+        logger.info(f"[ASR] transcribing {len(audio)} samples from the wake utterance")
+
+        def task():
+            return self.asr.infer_audio(np.asarray(audio, dtype=np.float32))
+
+        def cb(text):
+            text = (text or "").strip()
+            if not text:
+                logger.info("[ASR] wake utterance had no transcript, listening instead")
+                self._on_request_listen(evt)
+                return
+            logger.info(f"[ASR] final text (wake utterance): {text!r}")
+            self.bus.publish(CHAT_USER_MESSAGE, {"text": text})
+            self.bus.publish(USER_TEXT_READY, {"text": text, "source": payload.get("source", "voice")})
+
+        self.executor.submit("ASR:SenseVoice:infer", task, cb)
 
     def _on_request_listen(self, evt):
         if self._listening:
@@ -206,7 +321,7 @@ class ASRService:
 
         def run():
             try:
-                listener = SenseVoiceMicListener(self.bus, self.executor, self.asr)
+                listener = SenseVoiceMicListener(self.bus, self.executor, self.asr, self.hub, self.vad)
                 listener.listen_once()
             finally:
                 self._listening = False
@@ -0,0 +1,184 @@
+# AImy/services/audio_capture.py
+import queue
+import threading
+
+import numpy as np
+import sounddevice as sd
+from loguru import logger
+
+from services.audio_utils import StreamingResampler
+
+SAMPLE_RATE = 16000
+
+
+class AudioReader:
+    """
+    A subscriber's cursor into the hub's ring. read() blocks until the next
+    n samples exist and returns them as a read-only view of the ring (no
+    copy): keep it only while it is younger than the ring, copy otherwise.
+    A reader that falls more than a ring behind skips ahead and counts an
+    overrun.
+    """
+
+    def __init__(self, hub, position: int, name: str):
+        self.hub = hub
+        self.position = position
+        self.name = name
+        self.overruns = 0
+
+    def read(self, n: int, timeout: float = 0.5):
+        """Next n samples (float32 @ 16 kHz), or None on timeout / hub stopped."""
+        hub = self.hub
+        with hub._cond:
+            if not hub._cond.wait_for(
+                lambda: hub.written >= self.position + n or not hub._running, timeout
+            ) or hub.written < self.position + n:
+                return None
+            oldest = hub.written - hub.capacity
+            if self.position < oldest:
+                logger.warning(f"[AUDIO] reader '{self.name}' overrun, skipping {oldest - self.position} samples")
+                self.overruns += 1
+                self.position = hub.written - n
+            start = self.position
+            self.position += n
+        return hub.window(start, n)
+
+    def seek_live(self):
+        """Drop anything not read yet; the next read() returns new audio."""
+        self.position = self.hub.written
+
+
+class AudioCaptureHub:
+    """
+    The one always-open microphone. Blocks from the device are resampled
+    once (polyphase) to 16 kHz mono and written into a preallocated ring;
+    wake word, ASR and anything else read it through AudioReaders, and
+    push listeners (the mic meter) get each new block as it lands.
+
+    The ring is mirrored (every sample is stored at i and i + capacity),
+    so any window of up to `capacity` samples is one contiguous view.
+    Positions are absolute sample counts since start().
+    """
+
+    def __init__(self, device=None, capture_rate=None, block_ms: int = 30, ring_s: float = 30.0):
+        self.device = device
+        self.capture_rate = capture_rate
+        self.block_ms = block_ms
+        self.capacity = int(ring_s * SAMPLE_RATE)
+
+        self._ring = np.zeros(2 * self.capacity, dtype=np.float32)
+        self._ring_ro = self._ring.view()
+        self._ring_ro.flags.writeable = False
+        self.written = 0
+
+        self._cond = threading.Condition()
+        self._listeners = []
+        self._raw_q = queue.Queue(maxsize=64)
+        self._running = False
+        self._stream = None
+        self._thread = None
+        self.dropped_blocks = 0
+
+    # ---------- lifecycle ----------
+    def start(self):
+        if self._running:
+            return
+        rate = self.capture_rate
+        if rate is None:
+            rate = int(sd.query_devices(self.device, "input")["default_samplerate"])
+        self.capture_rate = rate
+        self._resampler = StreamingResampler(rate, SAMPLE_RATE)
+
+        self._running = True
+        self._thread = threading.Thread(target=self._pump, daemon=True)
+        self._thread.start()
+        self._stream = sd.InputStream(
+            device=self.device,
+            channels=1,
+            samplerate=rate,
+            blocksize=rate * self.block_ms // 1000,
+            dtype="float32",
+            callback=self._audio_cb,
+        )
+        self._stream.start()
+        logger.info(f"[AUDIO] Capture hub started: {rate} Hz -> {SAMPLE_RATE} Hz, ring {self.capacity / SAMPLE_RATE:.0f}s")
+
+    def stop(self):
+        self._running = False
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+        with self._cond:
+            self._cond.notify_all()
+
+    # ---------- subscribers ----------
+    def reader(self, name: str, preroll_ms: int = 0) -> AudioReader:
+        """A reader starting preroll_ms in the past (as far as the ring reaches)."""
+        with self._cond:
+            back = min(preroll_ms * SAMPLE_RATE // 1000, self.written, self.capacity)
+            return AudioReader(self, self.written - back, name)
+
+    def add_listener(self, fn):
+        """fn(block) on the capture thread for every new 16 kHz block; keep it cheap."""
+        self._listeners.append(fn)
+
+    def remove_listener(self, fn):
+        if fn in self._listeners:
+            self._listeners.remove(fn)
+
+    def window(self, start: int, n: int) -> np.ndarray:
+        """Read-only view of samples [start, start + n); start must still be in the ring."""
+        if n > self.capacity or start < self.written - self.capacity or start + n > self.written:
+            raise ValueError(f"[AUDIO] window {start}+{n} is outside the ring")
+        i = start % self.capacity
+        return self._ring_ro[i:i + n]
+
+    def stats(self) -> dict:
+        return {
+            "capture_rate": self.capture_rate,
+            "sample_rate": SAMPLE_RATE,
+            "ring_s": self.capacity / SAMPLE_RATE,
+            "written_s": round(self.written / SAMPLE_RATE, 1),
+            "dropped_blocks": self.dropped_blocks,
+            "listeners": len(self._listeners),
+        }
+
+    # ---------- capture ----------
+    def _audio_cb(self, indata, frames, time_info, status):
+        if status:
+            logger.warning(f"[AUDIO] callback status: {status}")
+        try:
+            self._raw_q.put_nowait(indata[:, 0].copy())
+        except queue.Full:
+            self.dropped_blocks += 1
+
+    def _write(self, block: np.ndarray):
+        n, cap = len(block), self.capacity
+        if n > cap:
+            block, n = block[-cap:], cap
+        i = self.written % cap
+        first = min(n, cap - i)
+        for base in (0, cap):
+            self._ring[base + i:base + i + first] = block[:first]
+            self._ring[base:base + n - first] = block[first:]
+        with self._cond:
+            self.written += n
+            self._cond.notify_all()
+
+    def _pump(self):
+        while self._running:
+            try:
+                raw = self._raw_q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            block = self._resampler.process(raw)
+            if len(block) == 0:
+                continue
+            self._write(block)
+            view = self.window(self.written - len(block), len(block))
+            for fn in list(self._listeners):
+                try:
+                    fn(view)
+                except Exception as e:
+                    logger.exception(f"[AUDIO] listener failed: {e}")
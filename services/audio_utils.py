@@ -7,3 +7,97 @@ def rms_level(samples: np.ndarray) -> float:
     samples = samples.astype(np.float32)
     rms = np.sqrt(np.mean(samples ** 2))
     return min(rms / 32768.0, 1.0)  # normalize 0–1
+
+
+def resample_poly(samples: np.ndarray, orig_sr: int, target_sr: int) -> np.ndarray:
+    """Polyphase resample to target_sr; returns float32."""
+    samples = np.asarray(samples, dtype=np.float32)
+    if orig_sr == target_sr or len(samples) == 0:
+        return samples
+    from math import gcd
+    from scipy.signal import resample_poly as _resample_poly   # ships with librosa
+
+    g = gcd(int(orig_sr), int(target_sr))
+    return _resample_poly(samples, target_sr // g, orig_sr // g).astype(np.float32, copy=False)
+
+
+class StreamingResampler:
+    """
+    Block-by-block polyphase resampler (up L, down M) that keeps its filter
+    history across calls, so consecutive blocks resample as one stream with
+    no edge clicks. Only the output samples are computed: each one is a
+    K-tap dot product with the filter phase it falls on.
+    """
+
+    def __init__(self, orig_sr: int, target_sr: int, taps_per_phase: int = 16):
+        from math import gcd
+
+        g = gcd(int(orig_sr), int(target_sr))
+        self.up, self.down = int(target_sr) // g, int(orig_sr) // g
+        self.passthrough = self.up == self.down == 1
+        if self.passthrough:
+            return
+
+        from scipy.signal import firwin   # ships with librosa
+
+        k = taps_per_phase
+        h = firwin(self.up * k, 1.0 / max(self.up, self.down), window=("kaiser", 5.0)) * self.up
+        self._phases = h.reshape(k, self.up).T.astype(np.float32)   # [phase, tap] = h[phase + tap * up]
+        self._taps = np.arange(k)
+        self._tail = np.zeros(k - 1, dtype=np.float32)   # last K-1 input samples
+        self._n_in = 0    # input samples consumed so far
+        self._n_out = 0   # next output sample index
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        block = np.asarray(block, dtype=np.float32)
+        if self.passthrough:
+            return block
+
+        ext = np.concatenate((self._tail, block))
+        ext_base = self._n_in - len(self._tail)   # absolute input index of ext[0]
+        self._n_in += len(block)
+
+        # outputs whose newest input sample has arrived
+        n_end = (self._n_in * self.up - 1) // self.down + 1 if self._n_in else 0
+        n = np.arange(self._n_out, n_end, dtype=np.int64)
+        self._n_out = n_end
+        self._tail = ext[len(ext) - len(self._tail):]
+        if len(n) == 0:
+            return np.zeros(0, dtype=np.float32)
+
+        m = n * self.down
+        newest = m // self.up - ext_base
+        windows = ext[newest[:, None] - self._taps[None, :]]
+        return np.einsum("ij,ij->i", windows, self._phases[m % self.up]).astype(np.float32, copy=False)
+
+
+def read_wav(path) -> tuple[np.ndarray, int]:
+    """PCM WAV (8/16/24/32-bit) -> (mono float32 in [-1, 1], sample rate)."""
+    import wave
+
+    with wave.open(str(path), "rb") as wf:
+        sr, ch, width = wf.getframerate(), wf.getnchannels(), wf.getsampwidth()
+        raw = wf.readframes(wf.getnframes())
+
+    if width == 1:
+        x = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        x = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        v = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        x = (np.where(v >= 1 << 23, v - (1 << 24), v)).astype(np.float32) / float(1 << 23)
+    elif width == 4:
+        x = np.frombuffer(raw, dtype="<i4").astype(np.float32) / float(1 << 31)
+    else:
+        raise ValueError(f"unsupported WAV sample width {width} in {path}")
+
+    if ch > 1:
+        x = x.reshape(-1, ch).mean(axis=1)
+    return x, sr
+
+
+def load_wav_16k(path) -> np.ndarray:
+    """read_wav() resampled to the 16 kHz mono float32 the ASR/VAD expect."""
+    x, sr = read_wav(path)
+    return resample_poly(x, sr, 16000)
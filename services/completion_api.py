@@ -0,0 +1,186 @@
+# AImy/services/completion_api.py
+import json
+import queue
+import threading
+import time
+
+from core.event_names import CHAT_ASSISTANT_DELTA, LLM_REQUEST_QUEUED, LLM_RESPONSE_DONE, REQUEST_LLM
+
+MODEL_NAME = "qwen2.5-1.5b-instruct-ax"
+
+
+class CompletionBridge:
+    """
+    Turns the bus' per-request events back into a request/response for the
+    OpenAI-compatible /v1/chat/completions endpoint.
+
+    start() registers a queue for a request id and publishes REQUEST_LLM;
+    LLM_REQUEST_QUEUED, CHAT_ASSISTANT_DELTA and LLM_RESPONSE_DONE events
+    with that id land in the queue as ("queued"|"delta"|"done", payload).
+    Events for ids nobody waits on are ignored.
+    """
+
+    def __init__(self, bus):
+        self.bus = bus
+        self._waiting = {}
+        self._lock = threading.Lock()
+
+        bus.subscribe(LLM_REQUEST_QUEUED, lambda evt: self._route("queued", evt))
+        bus.subscribe(CHAT_ASSISTANT_DELTA, lambda evt: self._route("delta", evt))
+        bus.subscribe(LLM_RESPONSE_DONE, lambda evt: self._route("done", evt))
+
+    def start(self, request_id: str, llm_payload: dict) -> queue.Queue:
+        q = queue.Queue()
+        with self._lock:
+            self._waiting[request_id] = q
+        self.bus.publish(REQUEST_LLM, {**llm_payload, "request_id": request_id})
+        return q
+
+    def finish(self, request_id: str):
+        with self._lock:
+            self._waiting.pop(request_id, None)
+
+    def _route(self, kind: str, evt):
+        payload = evt.payload or {}
+        with self._lock:
+            q = self._waiting.get(payload.get("request_id"))
+        if q is not None:
+            q.put((kind, payload))
+
+
+# ---------- OpenAI request / response shapes ----------
+class InvalidRequest(ValueError):
+    """A request field the endpoint can't use; answered as a 400 invalid_request_error."""
+
+    def __init__(self, message: str, param: str | None = None):
+        super().__init__(message)
+        self.param = param
+
+    def body(self) -> dict:
+        return {"error": {"message": str(self), "type": "invalid_request_error", "param": self.param}}
+
+
+def parse_request(data: dict) -> dict:
+    """
+    REQUEST_LLM payload for an OpenAI chat request. Only the last user
+    message is sent: history lives server-side per session ("user" or
+    "session_id" picks one; without either the request is stateless).
+    System messages are not applied (the system prompt is a prefilled
+    persona, choose one with "persona"). Raises InvalidRequest.
+    """
+    messages = data.get("messages") or []
+    text = ""
+    for m in reversed(messages):
+        if m.get("role") == "user":
+            content = m.get("content")
+            if isinstance(content, list):   # [{"type": "text", "text": ...}, ...]
+                content = " ".join(p.get("text", "") for p in content if isinstance(p, dict))
+            text = (content or "").strip()
+            break
+
+    payload = {"text": text, "source": "api"}
+    limits = {}
+    for param in ("max_completion_tokens", "max_tokens"):
+        max_tokens = data.get(param)
+        if max_tokens is None:
+            continue
+        if isinstance(max_tokens, bool) or not isinstance(max_tokens, int) or max_tokens < 1:
+            raise InvalidRequest(f"{param} must be a positive integer, got {max_tokens!r}", param)
+        limits["max_new_tokens"] = max_tokens
+        break
+    stop = data.get("stop")
+    if stop:
+        if isinstance(stop, str):
+            stop = [stop]
+        if not isinstance(stop, list) or not all(isinstance(s, str) for s in stop):
+            raise InvalidRequest("stop must be a string or a list of strings", "stop")
+        limits["stop"] = stop
+    if limits:
+        payload["limits"] = limits
+
+    session = data.get("session_id") or data.get("user")
+    if session:
+        payload["session"] = str(session)
+    else:
+        payload["stateless"] = True
+    if data.get("persona"):
+        payload["persona"] = data["persona"]
+    return payload
+
+
+def completion_body(request_id: str, created: int, done: dict, queue_position: int) -> dict:
+    return {
+        "id": request_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": MODEL_NAME,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": done.get("text", "")},
+            "finish_reason": done.get("finish_reason"),
+        }],
+        "usage": done.get("usage", {}),
+        "timing": {**done.get("timing", {}), "queue_position": queue_position},
+        "origin": done.get("origin"),
+    }
+
+
+def chunk(request_id: str, created: int, delta: dict | None = None, finish_reason=None, **extra) -> str:
+    body = {
+        "id": request_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": MODEL_NAME,
+        "choices": [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        **extra,
+    }
+    return f"data: {json.dumps(body, ensure_ascii=False)}\n\n"
+
+
+def stream_events(bridge: CompletionBridge, request_id: str, q: queue.Queue, timeout_s: float,
+                  position_fn=None):
+    """
+    SSE generator: a role chunk, queue_position chunks (empty choices) while
+    waiting for the accelerator, one chunk per decoded piece, a final chunk
+    with finish_reason plus usage/timing, then [DONE].
+    """
+    created = int(time.time())
+    deadline = time.monotonic() + timeout_s
+    streamed = False
+    last_position = None
+    try:
+        yield chunk(request_id, created, {"role": "assistant", "content": ""})
+        while True:
+            try:
+                kind, payload = q.get(timeout=0.5)
+            except queue.Empty:
+                if time.monotonic() > deadline:
+                    yield chunk(request_id, created, {}, "error", error="timeout")
+                    break
+                if not streamed and position_fn is not None:
+                    pos = position_fn()
+                    if pos is not None and pos != last_position:
+                        last_position = pos
+                        yield chunk(request_id, created, queue_position=pos)
+                else:
+                    yield ": keepalive\n\n"
+                continue
+
+            if kind == "queued":
+                last_position = payload.get("position", 0)
+                yield chunk(request_id, created, queue_position=last_position)
+            elif kind == "delta" and payload.get("delta"):
+                streamed = True
+                yield chunk(request_id, created, {"content": payload["delta"]})
+            elif kind == "done":
+                if not streamed and payload.get("text"):
+                    # cache / skill answers arrive whole
+                    yield chunk(request_id, created, {"content": payload["text"]})
+                yield chunk(
+                    request_id, created, {}, payload.get("finish_reason"),
+                    usage=payload.get("usage", {}), timing=payload.get("timing", {}),
+                )
+                break
+        yield "data: [DONE]\n\n"
+    finally:
+        bridge.finish(request_id)
@@ -0,0 +1,183 @@
+# AImy/services/llm_cache.py
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from loguru import logger
+
+_trailing_punct_re = re.compile(r"[\s?!.,]+$")
+_space_re = re.compile(r"\s+")
+
+
+def normalize_prompt(text: str) -> str:
+    """
+    Case and whitespace-insensitive form of a user prompt, minus trailing
+    ?!., — other punctuation is kept, so "5+3" / "5-3" / "12.5%" stay distinct.
+    """
+    text = _space_re.sub(" ", (text or "").lower()).strip()
+    return _trailing_punct_re.sub("", text)
+
+
+class LLMResponseCache:
+    """
+    Answer cache in front of QwenAdapter.generate().
+
+      - key: normalized user text + anything that changes the answer
+        (system prompt, sampling config, generation limits)
+      - in-memory LRU of max_entries, each entry valid for ttl_s
+      - optional SQLite backing (db_path) capped at disk_max_entries,
+        least recently used rows are pruned; survives restarts
+      - hit / miss / store / bypass counters via stats()
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_s: float = 7 * 24 * 3600,
+                 db_path: Path | None = None, disk_max_entries: int = 2000):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.disk_max_entries = disk_max_entries
+
+        self._mem = OrderedDict()   # key -> (answer, created)
+        self._lock = threading.Lock()
+        self._db = None
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.bypassed = 0
+
+        if db_path:
+            self._open_db(Path(db_path))
+
+    # ---------- keys ----------
+    @staticmethod
+    def make_key(user_text: str, **context) -> str:
+        blob = json.dumps({"q": normalize_prompt(user_text), **context}, sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    # ---------- public ----------
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            item = self._mem.get(key)
+            if item is not None:
+                answer, created = item
+                if now - created <= self.ttl_s:
+                    self._mem.move_to_end(key)
+                    self.hits += 1
+                    self._touch_db(key, now)
+                    return answer
+                del self._mem[key]
+
+            answer = self._get_db(key, now)
+            if answer is not None:
+                self._put_mem(key, answer[0], answer[1])
+                self.hits += 1
+                return answer[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, answer: str):
+        if not answer:
+            return
+        now = time.time()
+        with self._lock:
+            self._put_mem(key, answer, now)
+            self._put_db(key, answer, now)
+            self.stores += 1
+
+    def note_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "bypassed": self.bypassed,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "mem_entries": len(self._mem),
+            }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # ---------- memory ----------
+    def _put_mem(self, key, answer, created):
+        self._mem[key] = (answer, created)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    # ---------- disk ----------
+    def _open_db(self, path: Path):
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(str(path), check_same_thread=False)
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                " key TEXT PRIMARY KEY, answer TEXT NOT NULL,"
+                " created REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            db.execute("DELETE FROM answers WHERE created < ?", (time.time() - self.ttl_s,))
+            db.commit()
+            self._db = db
+            n = db.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            logger.info(f"[LLM-CACHE] {n} cached answers loaded from {path}")
+        except sqlite3.Error as e:
+            logger.warning(f"[LLM-CACHE] disk cache disabled: {e}")
+            self._db = None
+
+    def _get_db(self, key, now):
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute("SELECT answer, created FROM answers WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_s:
+                self._db.execute("DELETE FROM answers WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._touch_db(key, now)
+            return row
+        except sqlite3.Error as e:
+            logger.warning(f"[LLM-CACHE] read failed: {e}")
+            return None
+
+    def _touch_db(self, key, now):
+        if self._db is None:
+            return
+        try:
+            self._db.execute("UPDATE answers SET last_used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+        except sqlite3.Error:
+            pass
+
+    def _put_db(self, key, answer, now):
+        if self._db is None:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers (key, answer, created, last_used) VALUES (?, ?, ?, ?)",
+                (key, answer, now, now),
+            )
+            self._db.execute(
+                "DELETE FROM answers WHERE key IN ("
+                " SELECT key FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.disk_max_entries,),
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"[LLM-CACHE] write failed: {e}")
@@ -0,0 +1,87 @@
+# AImy/services/llm_scheduler.py
+import threading
+from collections import OrderedDict, deque
+
+from loguru import logger
+
+
+class RoundRobinScheduler:
+    """
+    Fair front door to the AxclExecutor for LLM jobs.
+
+    Jobs queue per session and only one LLM job sits in the executor at a
+    time; when it finishes, the next job is taken from the next session in
+    round-robin order. A chatty client therefore cannot starve the others,
+    while jobs within one session keep their order. TTS/ASR tasks still go
+    straight to the executor and interleave as before.
+    """
+
+    def __init__(self, executor):
+        self.executor = executor
+        self._queues = OrderedDict()   # session -> deque[(tag, fn, cb, key)], next to run first
+        self._running = None           # (session, its remaining jobs) while a job runs
+        self._lock = threading.Lock()
+
+    def submit(self, session: str, tag: str, fn, callback=None, key=None):
+        """Queue a job; `key` (e.g. a request id) lets position() find it later."""
+        with self._lock:
+            job = (tag, fn, callback, key)
+            if self._running is not None and self._running[0] == session:
+                self._running[1].append(job)
+            else:
+                self._queues.setdefault(session, deque()).append(job)
+        self._dispatch()
+
+    def pending(self) -> dict:
+        with self._lock:
+            out = {s: len(q) for s, q in self._queues.items()}
+            if self._running is not None and self._running[1]:
+                out[self._running[0]] = len(self._running[1])
+            return out
+
+    def position(self, key) -> int | None:
+        """
+        Jobs that will run before the queued job with this key, counting the
+        one in the executor (0 = runs next). None once it has started.
+        """
+        with self._lock:
+            lines = [list(q) for q in self._queues.values()]
+            if self._running is not None:
+                lines.append(list(self._running[1]))
+            ahead = 1 if self._running is not None else 0
+
+        # replay the round-robin order over a snapshot of the queues
+        while lines:
+            nxt = []
+            for q in lines:
+                if q.pop(0)[3] == key:
+                    return ahead
+                ahead += 1
+                if q:
+                    nxt.append(q)
+            lines = nxt
+        return None
+
+    def _dispatch(self):
+        with self._lock:
+            if self._running is not None or not self._queues:
+                return
+            # the session leaves the line while its job runs and rejoins at
+            # the back, behind everyone who arrived in the meantime
+            session, q = self._queues.popitem(last=False)
+            tag, fn, cb, _ = q.popleft()
+            self._running = (session, q)
+
+        def run():
+            try:
+                return fn()
+            finally:
+                with self._lock:
+                    s, rest = self._running
+                    self._running = None
+                    if rest:
+                        self._queues[s] = rest
+                self._dispatch()
+
+        logger.debug(f"[LLM] dispatch {tag} for session {session!r}")
+        self.executor.submit(tag, run, cb)
@@ -1,58 +1,392 @@
 from loguru import logger
 from core.event_names import (
     REQUEST_LLM,
+    USER_TEXT_PARTIAL,
     REQUEST_SPEAK,
+    REQUEST_SPEAK_CHUNK,
     CHAT_ASSISTANT_MESSAGE,
+    CHAT_ASSISTANT_DELTA,
+    LLM_REQUEST_QUEUED,
+    LLM_RESPONSE_DONE,
 )
+from services.speech.sentence_chunker import SentenceChunker
+from adapters.llm_conversation import Conversation
+from adapters.llm_limits import GenerationLimits
+from services.llm_cache import LLMResponseCache
+from services.llm_scheduler import RoundRobinScheduler
+from collections import OrderedDict
+from dataclasses import asdict
+import threading
+import time
+import uuid
+import config
+
+# Only answers that ended on their own (or on a requested bound) are cached
+_CACHEABLE_STOPS = ("eos", "stop", "voice_target", "max_new_tokens")
+
+# QwenAdapter stop reasons -> OpenAI-style finish_reason
+_FINISH_REASONS = {
+    "eos": "stop",
+    "stop": "stop",
+    "voice_target": "stop",
+    "repetition": "stop",
+    "max_new_tokens": "length",
+    "context": "length",
+    "deadline": "length",
+}
+
+
+def new_request_id() -> str:
+    return f"chatcmpl-{uuid.uuid4().hex[:24]}"
 
 class LLMService:
     """
-    Stateless LLM worker:
+    LLM worker with per-session conversation memory:
     - listens for REQUEST_LLM
-    - runs inference
+    - runs inference, continuing the session's conversation (config.LLM_MULTI_TURN,
+      on by default) unless the request is stateless
     - emits CHAT_ASSISTANT_MESSAGE
     - optionally emits REQUEST_SPEAK (voice only)
+
+    With config.LLM_STREAM_TTS, voice requests are decoded with
+    generate_stream() and each finished sentence is published as
+    REQUEST_SPEAK_CHUNK while decoding continues.
+
+    With config.LLM_MULTI_TURN, each session (payload["session"], default
+    config.LLM_DEFAULT_SESSION) has its own Conversation so follow-ups only
+    prefill the new user turn; it resets after an idle period. Jobs are
+    scheduled round-robin across sessions, and the adapter parks idle
+    sessions' K/V rows in host memory between turns.
+
+    payload["persona"] picks one of config.LLM_PERSONAS (default
+    config.LLM_DEFAULT_PERSONA); switching persona restarts the conversation.
+
+    An optional payload["limits"] dict overrides GenerationLimits defaults
+    (max_new_tokens, stop, deadline_s, repeat_ngram, repeat_max,
+    voice_target_chars).
+
+    Every request carries a request_id (generated if the payload has none)
+    that is echoed on LLM_REQUEST_QUEUED, CHAT_ASSISTANT_DELTA (per decoded
+    piece), CHAT_ASSISTANT_MESSAGE and LLM_RESPONSE_DONE (always last, with
+    usage and timing). payload["stateless"] skips the session history and
+    source "api" keeps answers out of the dashboard chat.
+
+    An optional SkillRouter gets the first look at every request; skills it
+    answers never reach the executor.
+
+    With config.LLM_CACHE_ENABLED, answers to fresh (history-free) prompts
+    are cached; a hit is published straight away without touching the
+    executor. payload["no_cache"] or non-greedy sampling bypasses it.
     """
 
-    def __init__(self, bus, executor, llm):
+    def __init__(self, bus, executor, llm, router=None):
         self.bus = bus
         self.executor = executor
         self.llm = llm
+        self.router = router
+
+        self.scheduler = RoundRobinScheduler(executor)
+        self.sessions = OrderedDict()   # session id -> Conversation (LRU)
+        self._sessions_lock = threading.Lock()
 
+        self.cache = None
+        if config.LLM_CACHE_ENABLED:
+            self.cache = LLMResponseCache(
+                max_entries=config.LLM_CACHE_MAX_ENTRIES,
+                ttl_s=config.LLM_CACHE_TTL_S,
+                db_path=config.LLM_CACHE_DB_PATH,
+                disk_max_entries=config.LLM_CACHE_DISK_MAX_ENTRIES,
+            )
+
+        self._spec_text = None
         bus.subscribe(REQUEST_LLM, self.on_request_llm)
+        if config.LLM_SPECULATIVE_PREFILL:
+            bus.subscribe(USER_TEXT_PARTIAL, self.on_partial_text)
 
     def on_request_llm(self, evt):
         payload = evt.payload or {}
         user_text = payload.get("text", "").strip()
         source = payload.get("source", "voice")  # default = voice
+        request_id = payload.get("request_id") or new_request_id()
+        self._spec_text = None
+        payload = {**payload, "request_id": request_id}
+        t_submit = time.monotonic()
 
         if not user_text:
             logger.info("[LLM] Empty REQUEST_LLM text, skipping")
+            self._publish_done(payload, "", origin="none", finish_reason="stop")
+            return
+
+        if self.router is not None:
+            routed = self.router.handle(user_text, source, payload)
+            if routed:
+                skill, result = routed
+                self._publish_done(payload, result.text, origin=f"skill:{skill}", finish_reason="stop")
+                return
+
+        limits = GenerationLimits.from_payload(payload.get("limits"), voice=(source == "voice"))
+        persona = payload.get("persona") or config.LLM_DEFAULT_PERSONA
+        session = str(payload.get("session") or config.LLM_DEFAULT_SESSION)
+        stateless = bool(payload.get("stateless"))
+        payload["session"] = session
+
+        cache_key = self._cache_key(user_text, payload, limits, persona, session)
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached:
+                logger.info(f"[LLM] {request_id}: cache hit, skipping generation")
+                self._publish_cached(user_text, cached, source, persona, session, payload)
+                return
+
+        if source == "voice" and config.LLM_STREAM_TTS:
+            self._submit_streamed_voice(user_text, limits, cache_key, persona, session, payload, t_submit, stateless)
             return
 
         def task():
-            logger.debug("[LLM] Generating response")
-            return self.llm.generate(user_text)
+            logger.debug(f"[LLM] {request_id}: generating response (session {session!r})")
+            t_start = time.monotonic()
+            answer, error = "", None
+            try:
+                answer = self.llm.generate_stream(
+                    user_text,
+                    chunk_cb=self._delta_publisher(payload),
+                    conversation=None if stateless else self._active_conversation(session),
+                    limits=limits,
+                    persona=persona,
+                )
+                self._cache_store(cache_key, answer)
+                return answer
+            except Exception as e:
+                error = repr(e)
+                raise
+            finally:
+                self._publish_done(payload, answer, origin="llm", queue_s=t_start - t_submit, error=error)
 
         def cb(answer):
             answer = (answer or "").strip()
             if not answer:
                 return
 
-            # 1) Always send to chat
-            self.bus.publish(
-                CHAT_ASSISTANT_MESSAGE,
-                {"text": answer}
-            )
+            # 1) Send to chat (API clients get their answer from LLM_RESPONSE_DONE)
+            if source != "api":
+                self.bus.publish(
+                    CHAT_ASSISTANT_MESSAGE,
+                    {"text": answer, "session": session, "request_id": request_id}
+                )
 
             # 2) Speak only if voice input
-            source = evt.payload.get("source", "voice")
-
             if source == "voice":
                 logger.debug("[LLM] Voice source → requesting TTS")
                 self.bus.publish(REQUEST_SPEAK, {"text": answer})
             else:
                 logger.debug("[LLM] Text source → skipping TTS")
 
+        self._schedule(payload, "LLM:Qwen:oneshot", task, cb)
+
+    # ---------- speculative prefill ----------
+    def on_partial_text(self, evt):
+        """Stable partial transcript -> prefill its prompt while the speaker finishes."""
+        payload = evt.payload or {}
+        text = (payload.get("text") or "").strip()
+        if not payload.get("stable") or not text or text == self._spec_text:
+            return
+        if self.router is not None and self.router.match(text) is not None:
+            return   # a skill will answer; keep the accelerator free
+        self._spec_text = text
+        session = config.LLM_DEFAULT_SESSION
+
+        def task():
+            self.llm.speculative_prefill(
+                text, conversation=self._active_conversation(session), persona=config.LLM_DEFAULT_PERSONA
+            )
+
+        self.scheduler.submit(session, "LLM:Qwen:spec_prefill", task)
+
+    # ---------- request tracking ----------
+    def _schedule(self, payload: dict, tag: str, task, cb):
+        rid = payload["request_id"]
+        self.scheduler.submit(payload["session"], tag, task, cb, key=rid)
+        position = self.scheduler.position(rid) or 0
+        if position:
+            logger.info(f"[LLM] {rid}: queued, {position} job(s) ahead")
+        self.bus.publish(
+            LLM_REQUEST_QUEUED,
+            {"request_id": rid, "session": payload["session"], "position": position},
+        )
+
+    def queue_position(self, request_id: str) -> int | None:
+        return self.scheduler.position(request_id)
+
+    def _delta_publisher(self, payload: dict, then=None):
+        rid, session, source = payload["request_id"], payload.get("session"), payload.get("source")
+
+        def on_piece(piece):
+            # Runs on the executor worker, between decode steps.
+            self.bus.publish(
+                CHAT_ASSISTANT_DELTA,
+                {"request_id": rid, "session": session, "source": source, "delta": piece},
+            )
+            if then is not None:
+                then(piece)
+        return on_piece
+
+    def _publish_done(self, payload: dict, text: str, origin: str, finish_reason: str | None = None,
+                      queue_s: float = 0.0, error: str | None = None):
+        """LLM_RESPONSE_DONE: the one event every request ends with, answered or not."""
+        usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        timing = {"queue_s": round(queue_s, 4)}
+        if origin == "llm":
+            m = self.llm.last_metrics()
+            finish_reason = _FINISH_REASONS.get(self.llm.last_stop_reason, "stop")
+            if m is not None and error is None:
+                usage = {
+                    "prompt_tokens": m.prompt_tokens,
+                    "completion_tokens": m.new_tokens,
+                    "total_tokens": m.prompt_tokens + m.new_tokens,
+                    "cached_prompt_tokens": m.reused_tokens,
+                }
+                timing.update(
+                    ttft_s=round(m.ttft_s, 4),
+                    prefill_s=round(m.prefill_s, 4),
+                    decode_s=round(m.decode_s, 4),
+                    total_s=round(m.total_s, 4),
+                    tokens_per_s=round(m.tokens_per_s, 2),
+                )
+        self.bus.publish(
+            LLM_RESPONSE_DONE,
+            {
+                "request_id": payload.get("request_id"),
+                "session": payload.get("session"),
+                "text": (text or "").strip(),
+                "origin": origin,
+                "finish_reason": "error" if error else (finish_reason or "stop"),
+                "usage": usage,
+                "timing": timing,
+                "error": error,
+            },
+        )
+
+    # ---------- response cache ----------
+    def _cache_key(self, user_text: str, payload: dict, limits, persona=None, session=None):
+        """Cache key for this request, or None when the cache must be bypassed."""
+        if self.cache is None:
+            return None
+        with self._sessions_lock:
+            conv = self.sessions.get(session)
+        has_history = (
+            not payload.get("stateless")
+            and conv is not None and conv.turns and not conv.is_stale() and conv.persona == persona
+        )
+        if payload.get("no_cache") or has_history or not self.llm.is_deterministic():
+            self.cache.note_bypass()
+            return None
+        return LLMResponseCache.make_key(user_text, limits=asdict(limits), **self.llm.cache_context(persona))
+
+    def _cache_store(self, cache_key, answer):
+        if cache_key and self.llm.last_stop_reason in _CACHEABLE_STOPS:
+            self.cache.put(cache_key, (answer or "").strip())
+
+    def _publish_cached(self, user_text: str, answer: str, source: str, persona=None, session=None, payload=None):
+        payload = payload or {}
+        if source != "api":
+            self.bus.publish(
+                CHAT_ASSISTANT_MESSAGE,
+                {"text": answer, "session": session, "request_id": payload.get("request_id")},
+            )
+        if source == "voice":
+            self.bus.publish(REQUEST_SPEAK, {"text": answer})
+        self._publish_done(payload, answer, origin="cache", finish_reason="stop")
+
+        if config.LLM_MULTI_TURN and not payload.get("stateless"):
+            # keep multi-turn history complete; CPU-only, queued so it never
+            # races a generation that is touching the same conversation
+            self.scheduler.submit(
+                session,
+                "LLM:Qwen:record_turn",
+                lambda: self.llm.record_turn(self._active_conversation(session), user_text, answer, persona),
+            )
+
+    def cache_stats(self) -> dict:
+        return self.cache.stats() if self.cache else {}
+
+    def _active_conversation(self, session: str):
+        # Called on the executor worker, right before generation
+        if not config.LLM_MULTI_TURN:
+            return None
+        with self._sessions_lock:
+            conv = self.sessions.get(session)
+            if conv is None:
+                conv = Conversation(
+                    max_turns=config.LLM_HISTORY_MAX_TURNS,
+                    idle_reset_s=config.LLM_HISTORY_IDLE_RESET_S,
+                )
+                self.sessions[session] = conv
+            self.sessions.move_to_end(session)
+            dropped = []
+            while len(self.sessions) > config.LLM_MAX_SESSIONS:
+                old_id, old = self.sessions.popitem(last=False)
+                dropped.append(old)
+                logger.info(f"[LLM] Session {old_id!r} dropped (max {config.LLM_MAX_SESSIONS})")
+
+        for old in dropped:
+            self.llm.drop_session(old)
+        if conv.is_stale():
+            logger.info(f"[LLM] Session {session!r} idle, starting fresh")
+            self.llm.drop_session(conv)
+            conv.reset()
+        return conv
+
+    def session_stats(self) -> dict:
+        with self._sessions_lock:
+            sessions = {
+                sid: {"turns": len(c.turns), "history_tokens": c.history_len(), "persona": c.persona}
+                for sid, c in self.sessions.items()
+            }
+        return {"sessions": sessions, "pending": self.scheduler.pending()}
+
+    # ---------- streamed voice ----------
+    def _submit_streamed_voice(self, user_text: str, limits, cache_key=None, persona=None, session=None,
+                               payload=None, t_submit=None, stateless=False):
+        chunker = SentenceChunker(
+            first_min_chars=config.TTS_STREAM_FIRST_MIN_CHARS,
+            clause_min_chars=config.TTS_STREAM_CLAUSE_MIN_CHARS,
+            max_chars=config.TTS_STREAM_MAX_CHARS,
+        )
+
+        def speak_sentences(piece):
+            for sentence in chunker.push(piece):
+                self.bus.publish(REQUEST_SPEAK_CHUNK, {"text": sentence, "final": False})
+
+        on_piece = self._delta_publisher(payload, then=speak_sentences)
+
+        def task():
+            logger.debug(f"[LLM] {payload['request_id']}: generating streamed response")
+            t_start = time.monotonic()
+            answer, error = "", None
+            try:
+                answer = self.llm.generate_stream(
+                    user_text,
+                    chunk_cb=on_piece,
+                    conversation=None if stateless else self._active_conversation(session),
+                    limits=limits,
+                    persona=persona,
+                )
+                self._cache_store(cache_key, answer)
+                return answer
+            except Exception as e:
+                error = repr(e)
+                raise
+            finally:
+                # Tail goes out on the worker too, so the TTS queue sees chunks in order
+                self.bus.publish(REQUEST_SPEAK_CHUNK, {"text": chunker.flush(), "final": True})
+                self._publish_done(payload, answer, origin="llm", queue_s=t_start - (t_submit or t_start), error=error)
+
+        def cb(answer):
+            answer = (answer or "").strip()
+            if answer:
+                self.bus.publish(
+                    CHAT_ASSISTANT_MESSAGE,
+                    {"text": answer, "session": session, "request_id": payload["request_id"]},
+                )
 
-        self.executor.submit("LLM:Qwen:oneshot", task, cb)
+        self._schedule(payload, "LLM:Qwen:stream", task, cb)
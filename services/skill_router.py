@@ -0,0 +1,155 @@
+# AImy/services/skill_router.py
+import importlib
+import threading
+import time
+
+from loguru import logger
+
+from core.event_names import CHAT_ASSISTANT_MESSAGE, REQUEST_SPEAK, REQUEST_SPEAK_CHUNK
+from services.llm_cache import normalize_prompt
+from services.skills.classifier import ExampleClassifier
+
+
+class SkillRegistry:
+    """
+    Skills by name, in registration order (first match wins).
+
+    Plugins are modules exposing register(registry); list their import paths
+    in config.SKILL_PLUGINS.
+    """
+
+    def __init__(self):
+        self._skills = {}
+        self._lock = threading.Lock()
+
+    def register(self, skill):
+        with self._lock:
+            if skill.name in self._skills:
+                logger.warning(f"[SKILL] Replacing skill '{skill.name}'")
+            self._skills[skill.name] = skill
+
+    def unregister(self, name: str):
+        with self._lock:
+            self._skills.pop(name, None)
+
+    def get(self, name: str):
+        return self._skills.get(name)
+
+    def skills(self) -> list:
+        with self._lock:
+            return list(self._skills.values())
+
+    def load_plugins(self, modules):
+        for mod_name in modules:
+            try:
+                importlib.import_module(mod_name).register(self)
+                logger.info(f"[SKILL] Plugin loaded: {mod_name}")
+            except Exception as e:
+                logger.exception(f"[SKILL] Plugin {mod_name} failed to load: {e}")
+
+
+class SkillStats:
+    """Per-skill hit counts and handler latency."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._skills = {}   # name -> {"hits", "total_s", "max_s", "last_s"}
+        self.fallthrough = 0
+
+    def record(self, name: str, dt: float):
+        with self._lock:
+            s = self._skills.setdefault(name, {"hits": 0, "total_s": 0.0, "max_s": 0.0, "last_s": 0.0})
+            s["hits"] += 1
+            s["total_s"] += dt
+            s["max_s"] = max(s["max_s"], dt)
+            s["last_s"] = dt
+
+    def note_fallthrough(self):
+        with self._lock:
+            self.fallthrough += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "fallthrough": self.fallthrough,
+                "skills": {
+                    name: {
+                        "hits": s["hits"],
+                        "avg_ms": round(1000 * s["total_s"] / s["hits"], 3),
+                        "max_ms": round(1000 * s["max_s"], 3),
+                        "last_ms": round(1000 * s["last_s"], 3),
+                    }
+                    for name, s in self._skills.items()
+                },
+            }
+
+
+class SkillRouter:
+    """
+    Fast path in front of LLMService for trivial intents (time, date,
+    stop, plugins). Runs on the caller's thread, never touches the
+    AxclExecutor:
+
+      normalized text -> skill regexes -> optional example classifier
+        hit : skill.handle() -> CHAT_ASSISTANT_MESSAGE (+ REQUEST_SPEAK for voice),
+              returns (skill name, SkillResult)
+        miss: returns None and the request goes on to Qwen
+    """
+
+    def __init__(self, bus, registry: SkillRegistry, use_classifier: bool = False, min_score: float = 0.75):
+        self.bus = bus
+        self.registry = registry
+        self.stats = SkillStats()
+
+        self.classifier = None
+        if use_classifier:
+            self.classifier = ExampleClassifier(min_score=min_score)
+            for skill in registry.skills():
+                self.classifier.add(skill.name, skill.examples)
+
+    def match(self, text: str):
+        norm = normalize_prompt(text)
+        if not norm:
+            return None
+        for skill in self.registry.skills():
+            if skill.matches(norm):
+                return skill
+        if self.classifier is not None:
+            name, score = self.classifier.predict(norm)
+            if name:
+                logger.debug(f"[SKILL] classifier -> {name} ({score:.2f})")
+                return self.registry.get(name)
+        return None
+
+    def handle(self, text: str, source: str, payload: dict | None = None):
+        """(skill name, SkillResult) if a skill answered (and published) the request, else None."""
+        payload = payload or {}
+        t0 = time.perf_counter()
+        skill = self.match(text)
+        result = None
+        if skill is not None:
+            try:
+                result = skill.handle(text, payload)
+            except Exception as e:
+                logger.exception(f"[SKILL] '{skill.name}' failed: {e}")
+
+        if result is None:
+            self.stats.note_fallthrough()
+            return None
+
+        self.stats.record(skill.name, time.perf_counter() - t0)
+        logger.info(f"[SKILL] '{skill.name}' answered locally")
+
+        if result.text and source != "api":
+            self.bus.publish(
+                CHAT_ASSISTANT_MESSAGE,
+                {"text": result.text, "session": payload.get("session"), "request_id": payload.get("request_id")},
+            )
+        if source == "voice":
+            speak = result.text if result.speak is None else result.speak
+            if speak:
+                self.bus.publish(REQUEST_SPEAK, {"text": speak})
+            else:
+                # nothing to say: an empty final chunk ends the turn (-> SPEECH_PLAYED)
+                self.bus.publish(REQUEST_SPEAK_CHUNK, {"text": "", "final": True})
+        return skill.name, result
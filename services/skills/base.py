@@ -0,0 +1,39 @@
+# AImy/services/skills/base.py
+import re
+from dataclasses import dataclass
+
+
+@dataclass
+class SkillResult:
+    """
+    What a skill answered.
+
+      text  : shown in the chat window
+      speak : spoken for voice requests (None = same as text, "" = say nothing
+              and just end the turn)
+    """
+    text: str
+    speak: str | None = None
+
+
+class Skill:
+    """
+    A locally answered intent.
+
+    Subclasses set `name`, full-utterance `patterns` (regexes matched against
+    the normalized text: lowercase, no punctuation) and optional `examples`
+    for the fallback classifier, and implement handle().
+    """
+    name = "skill"
+    patterns = ()
+    examples = ()
+
+    def __init__(self):
+        self._compiled = [re.compile(p) for p in self.patterns]
+
+    def matches(self, norm_text: str) -> bool:
+        return any(r.fullmatch(norm_text) for r in self._compiled)
+
+    def handle(self, text: str, payload: dict) -> SkillResult | None:
+        """Return None to decline (the request then falls through to the LLM)."""
+        raise NotImplementedError
@@ -0,0 +1,61 @@
+# AImy/services/skills/builtin.py
+from datetime import datetime
+
+from services.skills.base import Skill, SkillResult
+
+# optional lead-in / politeness around a command ("hey amy what time is it please")
+_PRE = r"(?:(?:hey|hi|ok|okay) )?(?:amy |ay mee )?(?:can you )?(?:please )?"
+_POST = r"(?: (?:now|right now|please|today|thanks|thank you))*"
+
+
+class TimeSkill(Skill):
+    name = "time"
+    patterns = (
+        _PRE + r"what(?:'?s| is) the (?:current )?time" + _POST,
+        _PRE + r"what time is it" + _POST,
+        _PRE + r"tell me the (?:current )?time" + _POST,
+        _PRE + r"(?:the )?(?:current )?time" + _POST,
+    )
+    examples = ("what time is it", "what's the time", "tell me the time", "current time")
+
+    def handle(self, text, payload):
+        now = datetime.now()
+        return SkillResult(f"It's {now.strftime('%I:%M %p').lstrip('0')}.")
+
+
+class DateSkill(Skill):
+    name = "date"
+    patterns = (
+        _PRE + r"what(?:'?s| is) (?:the |today'?s )?date" + _POST,
+        _PRE + r"what day is (?:it|today)" + _POST,
+        _PRE + r"what(?:'?s| is) today" + _POST,
+        _PRE + r"tell me (?:the |today'?s )?date" + _POST,
+        _PRE + r"(?:today'?s )?date" + _POST,
+    )
+    examples = ("what's the date", "what day is it", "what is today's date", "tell me the date")
+
+    def handle(self, text, payload):
+        now = datetime.now()
+        return SkillResult(f"Today is {now.strftime('%A, %B')} {now.day}, {now.year}.")
+
+
+class StopSkill(Skill):
+    """Ends the turn without an answer; the assistant goes back to looking."""
+    name = "stop"
+    patterns = (
+        _PRE + r"(?:stop|cancel|never ?mind|be quiet|quiet|shut up|that'?s all|nothing|go to sleep)" + _POST,
+    )
+    examples = ("stop", "cancel", "never mind", "be quiet", "that's all")
+
+    def handle(self, text, payload):
+        return SkillResult("Okay.", speak="")
+
+
+BUILTIN_SKILLS = {cls.name: cls for cls in (TimeSkill, DateSkill, StopSkill)}
+
+
+def register(registry, names=None):
+    """Register the built-in skills (all, or only those in `names`)."""
+    for name, cls in BUILTIN_SKILLS.items():
+        if names is None or name in names:
+            registry.register(cls())
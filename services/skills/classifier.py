@@ -0,0 +1,66 @@
+# AImy/services/skills/classifier.py
+import math
+from collections import Counter
+
+
+# politeness / wake words that never change the intent
+_FILLER = ("hey", "hi", "ok", "okay", "amy", "please", "now", "thanks", "thank", "you", "can")
+
+
+def _features(text: str) -> Counter:
+    """Words plus character trigrams (robust to small ASR slips)."""
+    feats = Counter(text.split())
+    padded = f" {text} "
+    feats.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return feats
+
+
+def _cosine(a: Counter, b: Counter, b_norm: float) -> float:
+    dot = sum(v * b.get(k, 0) for k, v in a.items())
+    a_norm = math.sqrt(sum(v * v for v in a.values()))
+    return dot / (a_norm * b_norm) if a_norm and b_norm else 0.0
+
+
+class ExampleClassifier:
+    """
+    Tiny CPU intent classifier: nearest example by cosine similarity of
+    word + character-trigram counts. Catches paraphrases the regexes miss
+    ("time please what is it") without any model download; a few dozen
+    examples score in well under a millisecond.
+
+    A prediction also needs min_coverage of the utterance's words to appear
+    in that skill's examples, so "what time is it in tokyo" is left to the LLM.
+    """
+
+    def __init__(self, min_score: float = 0.75, min_coverage: float = 0.8):
+        self.min_score = min_score
+        self.min_coverage = min_coverage
+        self._examples = []   # (skill name, features, norm)
+        self._vocab = {}      # skill name -> words seen in its examples
+
+    def add(self, name: str, examples):
+        vocab = self._vocab.setdefault(name, set(_FILLER))
+        for ex in examples:
+            f = _features(ex)
+            self._examples.append((name, f, math.sqrt(sum(v * v for v in f.values()))))
+            vocab.update(ex.split())
+
+    def remove(self, name: str):
+        self._examples = [e for e in self._examples if e[0] != name]
+        self._vocab.pop(name, None)
+
+    def predict(self, norm_text: str):
+        """Returns (skill name, score), or (None, best score) below min_score."""
+        feats = _features(norm_text)
+        best, best_score = None, 0.0
+        for name, f, norm in self._examples:
+            s = _cosine(feats, f, norm)
+            if s > best_score:
+                best, best_score = name, s
+        if best_score < self.min_score:
+            return None, best_score
+        words = norm_text.split()
+        covered = sum(w in self._vocab[best] for w in words)
+        if covered < self.min_coverage * len(words):
+            return None, best_score
+        return best, best_score
@@ -0,0 +1,82 @@
+import re
+
+from adapters.sentence_boundary import sentence_end
+
+# ---------------------------------------------------------------------
+# Incremental sentence / clause segmentation for streaming TTS
+# ---------------------------------------------------------------------
+
+# Clause break: only used once the pending buffer is long enough that
+# waiting for a full sentence would delay audio noticeably.
+_clause_end_re = re.compile(r"[,;:]\s")
+
+
+class SentenceChunker:
+    """
+    Accumulates streamed LLM text pieces and emits speakable chunks.
+
+      push(piece) -> list of completed chunks (possibly empty)
+      flush()     -> whatever is left at end of generation
+
+    The first chunk uses a lower clause threshold so audio can start
+    as early as possible; later chunks prefer whole sentences.
+    """
+
+    def __init__(self, first_min_chars: int = 12, clause_min_chars: int = 60, max_chars: int = 220):
+        self.first_min_chars = first_min_chars
+        self.clause_min_chars = clause_min_chars
+        self.max_chars = max_chars
+        self._buf = ""
+        self._emitted = 0
+
+    def push(self, piece: str) -> list:
+        if not piece:
+            return []
+        self._buf += piece
+
+        chunks = []
+        while True:
+            chunk = self._take_chunk()
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return chunks
+
+    def flush(self) -> str:
+        rest = self._buf.strip()
+        self._buf = ""
+        if rest:
+            self._emitted += 1
+        return rest
+
+    def _take_chunk(self) -> str:
+        buf = self._buf
+
+        end = sentence_end(buf)
+        if end is not None:
+            return self._cut(end)
+
+        clause_min = self.first_min_chars if self._emitted == 0 else self.clause_min_chars
+        if len(buf) >= clause_min:
+            # first clause boundary past the threshold
+            cut = None
+            for m in _clause_end_re.finditer(buf):
+                if m.end() >= clause_min:
+                    cut = m.end()
+                    break
+            if cut is not None:
+                return self._cut(cut)
+
+        if len(buf) >= self.max_chars:
+            # no punctuation for a long time; split on the last space
+            sp = buf.rfind(" ", 0, self.max_chars)
+            return self._cut(sp + 1 if sp > 0 else self.max_chars)
+
+        return ""
+
+    def _cut(self, end: int) -> str:
+        chunk = self._buf[:end].strip()
+        self._buf = self._buf[end:]
+        if chunk:
+            self._emitted += 1
+        return chunk
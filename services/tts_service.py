@@ -1,12 +1,23 @@
 # AImy/services/tts_service.py
+import queue
+import threading
 from loguru import logger
-from core.event_names import REQUEST_SPEAK, SPEECH_PLAYED
+from core.event_names import REQUEST_SPEAK, REQUEST_SPEAK_CHUNK, SPEECH_PLAYED
 from services.speech.tts_normalization import normalize_for_tts
 
+_END_OF_STREAM = object()
+
 class TTSService:
     """
     Super simple:
       REQUEST_SPEAK -> synth (Melo) -> play_wav -> SPEECH_PLAYED -> resume vision
+
+    Streamed replies:
+      REQUEST_SPEAK_CHUNK -> synth inline -> player queue -> play in order;
+      SPEECH_PLAYED fires once after the final chunk has played.
+      Chunks are published from the LLM task on the AxclExecutor worker, so
+      the Melo decoder runs between decode steps and accelerator work stays
+      serialized; playback of sentence N overlaps decoding of sentence N+1.
     """
     def __init__(self, bus, executor, tts_adapter, audio_out):
         self.bus = bus
@@ -14,7 +25,12 @@ class TTSService:
         self.tts = tts_adapter
         self.audio = audio_out
 
+        self._play_q = queue.Queue()
+        self._player = threading.Thread(target=self._player_loop, daemon=True, name="tts-player")
+        self._player.start()
+
         bus.subscribe(REQUEST_SPEAK, self._on_request_speak)
+        bus.subscribe(REQUEST_SPEAK_CHUNK, self._on_request_speak_chunk)
 
     def _on_request_speak(self, evt):
         speech_text = normalize_for_tts(evt.payload["text"])
@@ -25,6 +41,29 @@ class TTSService:
 
         def cb(wav_path):
             self.audio.play_wav(wav_path)
-            self.bus.publish(SPEECH_PLAYED, None)          
+            self.bus.publish(SPEECH_PLAYED, None)
 
         self.executor.submit("TTS:Melo:synth", task, cb)
+
+    # ---------- streamed chunks ----------
+    def _on_request_speak_chunk(self, evt):
+        payload = evt.payload or {}
+        text = (payload.get("text") or "").strip()
+
+        # runs on the publisher's thread: the executor worker (see class docstring)
+        if text:
+            try:
+                self._play_q.put(self.tts.synth(normalize_for_tts(text)))
+            except Exception as e:
+                logger.exception(f"[TTS] chunk synth failed: {e}")
+
+        if payload.get("final"):
+            self._play_q.put(_END_OF_STREAM)
+
+    def _player_loop(self):
+        while True:
+            item = self._play_q.get()
+            if item is _END_OF_STREAM:
+                self.bus.publish(SPEECH_PLAYED, None)
+                continue
+            self.audio.play_wav(item)
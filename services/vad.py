@@ -0,0 +1,271 @@
+# AImy/services/vad.py
+import json
+import threading
+from collections import deque
+
+import numpy as np
+from loguru import logger
+
+import config
+
+SAMPLE_RATE = 16000
+
+# fixed-threshold defaults (the "rms" engine)
+RMS_START = 0.015   # start talking
+RMS_END   = 0.010   # stay talking
+
+
+def rms(x: np.ndarray) -> float:
+    return float(np.sqrt(np.mean(x * x, dtype=np.float32)) + 1e-12)
+
+
+# ---------- features ----------
+def spectral_features(frames: np.ndarray, sample_rate: int = SAMPLE_RATE, band_hz=(300, 3400)) -> dict:
+    """
+    Per-frame features for a [n, frame_len] batch (one rfft for the batch):
+      band_db  : mean power in the speech band, dB (only differences matter)
+      flatness : geometric / arithmetic mean of the band power (0 tonal .. 1 white noise)
+      zcr      : zero-crossing rate
+    """
+    frames = np.atleast_2d(np.asarray(frames, dtype=np.float32))
+    n_fft = 1 << max(0, int(np.ceil(np.log2(frames.shape[1]))))
+    spec = np.abs(np.fft.rfft(frames * np.hanning(frames.shape[1]).astype(np.float32), n=n_fft, axis=1)) ** 2
+    freqs = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    band = spec[:, (freqs >= band_hz[0]) & (freqs <= band_hz[1])] + 1e-12
+
+    mean = band.mean(axis=1)
+    signs = np.signbit(frames)
+    return {
+        "band_db": 10.0 * np.log10(mean / n_fft),
+        "flatness": np.exp(np.log(band).mean(axis=1)) / mean,
+        "zcr": (signs[:, 1:] != signs[:, :-1]).mean(axis=1),
+    }
+
+
+def frame_signal(audio: np.ndarray, frame_len: int) -> np.ndarray:
+    """[n, frame_len] view of consecutive frames (the tail that does not fill a frame is dropped)."""
+    n = len(audio) // frame_len
+    return np.asarray(audio[:n * frame_len], dtype=np.float32).reshape(n, frame_len)
+
+
+# ---------- engines ----------
+class RmsVAD:
+    """The original fixed thresholds: speech while RMS is above RMS_START (RMS_END once talking)."""
+
+    name = "rms"
+
+    def __init__(self, start: float = RMS_START, end: float = RMS_END):
+        self.start, self.end = start, end
+
+    def reset(self):
+        pass
+
+    def observe(self, block: np.ndarray):
+        pass
+
+    def is_speech(self, block: np.ndarray, speaking: bool) -> bool:
+        return rms(block) > (self.end if speaking else self.start)
+
+
+class SpectralVAD:
+    """
+    Speech-band SNR over a tracked noise floor, gated by spectral shape.
+
+    The floor is the minimum band energy over the last VAD_FLOOR_WINDOW_MS
+    (minimum statistics: pauses between words reach it, steady noise
+    becomes it), so a fan or a TV raises the floor instead of looking like
+    endless speech; frames taken as speech raise it only slowly. Speech starts on a voiced frame (low flatness) well
+    above the floor and continues on voiced or fricative (high ZCR) frames
+    above a lower margin.
+    """
+
+    name = "spectral"
+
+    def __init__(self, profile: dict | None = None, block_ms: int = 30):
+        profile = profile or {}
+        self.start_db = profile.get("start_margin_db", config.VAD_START_MARGIN_DB)
+        self.end_db = profile.get("end_margin_db", config.VAD_END_MARGIN_DB)
+        self.max_flatness = profile.get("max_flatness", config.VAD_MAX_FLATNESS)
+        self.zcr_unvoiced = profile.get("zcr_unvoiced", config.VAD_ZCR_UNVOICED)
+        self.band_hz = tuple(config.VAD_BAND_HZ)
+
+        self._history = deque(maxlen=max(1, config.VAD_FLOOR_WINDOW_MS // block_ms))
+        if "noise_db" in profile:
+            self._history.append(float(profile["noise_db"]))
+        self._lock = threading.Lock()
+        self.last = {}
+
+    @property
+    def noise_db(self) -> float | None:
+        with self._lock:
+            return min(self._history) if self._history else None
+
+    def reset(self):
+        pass   # the floor carries over between utterances on purpose
+
+    def observe(self, block: np.ndarray):
+        """Track the floor from audio nobody is listening to (between turns)."""
+        self.is_speech(block, False)
+
+    def is_speech(self, block: np.ndarray, speaking: bool) -> bool:
+        f = spectral_features(block, band_hz=self.band_hz)
+        band_db, flatness, zcr = float(f["band_db"][0]), float(f["flatness"][0]), float(f["zcr"][0])
+        with self._lock:
+            floor = min(self._history) if self._history else band_db
+            snr = band_db - floor
+            voiced = flatness < self.max_flatness
+            if speaking:
+                speech = snr > self.end_db and (voiced or zcr > self.zcr_unvoiced)
+            else:
+                speech = snr > self.start_db and voiced
+            # speech frames may lift the floor by at most end_db per window, so
+            # long unbroken speech is not slowly mistaken for the floor
+            self._history.append(min(band_db, floor + self.end_db) if speech else band_db)
+        self.last = {"band_db": band_db, "floor_db": floor, "flatness": flatness, "zcr": zcr, "speech": speech}
+        return speech
+
+    @staticmethod
+    def calibrate(ambient: np.ndarray, frame_len: int = 480) -> dict:
+        """
+        Profile for a room from a few seconds of its background noise: the
+        typical floor, and a start margin wide enough that the noise's own
+        swings do not trigger.
+        """
+        f = spectral_features(frame_signal(ambient, frame_len))
+        band_db = f["band_db"]
+        if len(band_db) == 0:
+            raise ValueError("[VAD] calibration needs at least one frame of audio")
+        floor = float(np.percentile(band_db, 10))
+        swing = float(np.percentile(band_db, 95)) - floor
+        return {
+            "noise_db": round(floor, 2),
+            "start_margin_db": round(max(config.VAD_START_MARGIN_DB, swing + 3.0), 2),
+            "end_margin_db": round(max(config.VAD_END_MARGIN_DB, swing + 1.0), 2),
+            "max_flatness": round(min(config.VAD_MAX_FLATNESS, float(np.percentile(f["flatness"], 5))), 3),
+            "zcr_unvoiced": config.VAD_ZCR_UNVOICED,
+        }
+
+
+class SileroVAD:
+    """
+    Silero VAD (v5 ONNX) on the CPU through onnxruntime. The model takes
+    512-sample windows at 16 kHz (plus 64 samples of context), so blocks
+    are re-chunked and the newest window's probability is used.
+    """
+
+    name = "silero"
+    WINDOW = 512
+    CONTEXT = 64
+
+    def __init__(self, model_path, threshold: float = 0.5, neg_threshold: float = 0.35):
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = 1
+        opts.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(str(model_path), sess_options=opts, providers=["CPUExecutionProvider"])
+        self.threshold, self.neg_threshold = threshold, neg_threshold
+        self._sr = np.array(SAMPLE_RATE, dtype=np.int64)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._state = np.zeros((2, 1, 128), dtype=np.float32)
+        self._context = np.zeros(self.CONTEXT, dtype=np.float32)
+        self._pending = np.zeros(0, dtype=np.float32)
+        self.prob = 0.0
+
+    def _run(self, window: np.ndarray) -> float:
+        x = np.concatenate((self._context, window))[None, :]
+        out, self._state = self.session.run(None, {"input": x, "state": self._state, "sr": self._sr})
+        self._context = window[-self.CONTEXT:]
+        return float(out[0][0])
+
+    def observe(self, block: np.ndarray):
+        pass   # no floor to track; the model is only run while listening
+
+    def is_speech(self, block: np.ndarray, speaking: bool) -> bool:
+        with self._lock:
+            self._pending = np.concatenate((self._pending, np.asarray(block, dtype=np.float32)))
+            while len(self._pending) >= self.WINDOW:
+                self.prob = self._run(self._pending[:self.WINDOW])
+                self._pending = self._pending[self.WINDOW:]
+            return self.prob > (self.neg_threshold if speaking else self.threshold)
+
+
+# ---------- calibration profiles ----------
+def load_profile(name: str | None) -> dict | None:
+    if not name or config.VAD_PROFILE_PATH is None or not config.VAD_PROFILE_PATH.exists():
+        return None
+    profiles = json.loads(config.VAD_PROFILE_PATH.read_text())
+    if name not in profiles:
+        logger.warning(f"[VAD] No calibration profile '{name}' in {config.VAD_PROFILE_PATH}")
+    return profiles.get(name)
+
+
+def save_profile(name: str, profile: dict):
+    path = config.VAD_PROFILE_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    profiles = json.loads(path.read_text()) if path.exists() else {}
+    profiles[name] = profile
+    path.write_text(json.dumps(profiles, indent=2))
+
+
+def make_vad(engine: str | None = None, profile: str | None = None, block_ms: int = 30):
+    """VAD for config.VAD_ENGINE ("rms" | "spectral" | "silero"); silero falls back to spectral."""
+    engine = engine or config.VAD_ENGINE
+    if engine == "rms":
+        return RmsVAD()
+    if engine == "silero":
+        try:
+            return SileroVAD(config.VAD_SILERO_PATH, config.VAD_SILERO_THRESHOLD, config.VAD_SILERO_NEG_THRESHOLD)
+        except Exception as e:
+            logger.warning(f"[VAD] Silero unavailable ({e!r}), using the spectral VAD")
+    elif engine != "spectral":
+        raise ValueError(f"Unknown VAD_ENGINE: {engine}")
+    return SpectralVAD(load_profile(profile or config.VAD_PROFILE), block_ms=block_ms)
+
+
+# ---------- endpointing ----------
+class Endpointer:
+    """
+    Utterance start/end on top of a per-block VAD decision: speech starts
+    after min_speech_ms of (leaky) voiced time and the utterance ends after
+    end_sil_ms of silence or at max_utter_ms. push() returns "silence",
+    "maxlen" or None.
+    """
+
+    def __init__(self, vad, block_ms: int, min_speech_ms: int, end_sil_ms: int, max_utter_ms: int):
+        self.vad = vad
+        self.block_ms = block_ms
+        self.min_speech_ms = min_speech_ms
+        self.end_sil_ms = end_sil_ms
+        self.max_utter_ms = max_utter_ms
+        self.reset()
+
+    def reset(self):
+        self.speaking = False
+        self.above_ms = 0
+        self.silence_ms = 0
+        self.utter_ms = 0
+        self.vad.reset()
+
+    def push(self, block: np.ndarray):
+        if self.vad.is_speech(block, self.speaking):
+            self.above_ms += self.block_ms
+            self.silence_ms = 0
+        else:
+            self.silence_ms += self.block_ms
+            self.above_ms = max(0, self.above_ms - self.block_ms // 2)
+
+        if not self.speaking and self.above_ms >= self.min_speech_ms:
+            self.speaking = True
+            self.utter_ms = 0
+
+        if self.speaking:
+            self.utter_ms += self.block_ms
+            if self.silence_ms >= self.end_sil_ms:
+                return "silence"
+            if self.utter_ms >= self.max_utter_ms:
+                return "maxlen"
+        return None
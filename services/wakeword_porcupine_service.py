@@ -1,17 +1,21 @@
 # AImy/services/wakeword_porcupine_service.py
 import threading
 import pvporcupine
-import pyaudio
-import struct
 import time
+import numpy as np
 from loguru import logger
+
+import config
 from core.event_names import WAKEWORD_DETECTED
 from core.states import AssistantState
+from services.vad import make_vad
+from services.audio_capture import SAMPLE_RATE
 
 class WakeWordService:
-    def __init__(self, bus, controller, keyword_path, sensitivity=0.6, access_key=None):
+    def __init__(self, bus, controller, hub, keyword_path, sensitivity=0.6, access_key=None):
         self.bus = bus
         self.controller = controller
+        self.hub = hub
         self.keyword_path = keyword_path
         self.sensitivity = sensitivity
         self.access_key = access_key
@@ -20,6 +24,8 @@ class WakeWordService:
         self._thread = None
 
     def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
         self._running = True
         self._thread = threading.Thread(target=self._run, daemon=True)
         self._thread.start()
@@ -28,39 +34,81 @@ class WakeWordService:
     def stop(self):
         self._running = False
 
+    def _capture_command(self, reader, porcupine):
+        """
+        Keep reading after the keyword: speech that starts within
+        WAKE_COMMAND_WAIT_MS is taken as the command and captured until
+        WAKE_COMMAND_END_SIL_MS of silence. Returns 16 kHz float32 audio,
+        or None when the wake word was said on its own.
+        """
+        n = porcupine.frame_length
+        frame_ms = 1000 * n / SAMPLE_RATE
+        keyword_end = reader.position
+        self.vad.reset()
+        preroll = config.ASR_PREROLL_MS * SAMPLE_RATE // 1000
+        speech_start = None
+        speech_ms = silence_ms = elapsed_ms = 0.0
+        speaking = False
+
+        while elapsed_ms < config.WAKE_COMMAND_MAX_MS:
+            frame = reader.read(n)
+            if frame is None:
+                return None
+            elapsed_ms += frame_ms
+            loud = self.vad.is_speech(frame, speaking)
+
+            if speaking:
+                silence_ms = 0.0 if loud else silence_ms + frame_ms
+                if loud:
+                    speech_ms += frame_ms
+                if silence_ms >= config.WAKE_COMMAND_END_SIL_MS:
+                    break
+            elif loud:
+                speaking = True
+                speech_start = max(keyword_end, reader.position - n - preroll)
+                speech_ms += frame_ms
+            elif elapsed_ms >= config.WAKE_COMMAND_WAIT_MS:
+                return None
+
+        if speech_ms < config.WAKE_COMMAND_MIN_MS:
+            return None
+        audio = self.hub.window(speech_start, reader.position - speech_start).copy()
+        logger.info(f"[WAKEWORD] Command follows keyword ({len(audio) / SAMPLE_RATE:.2f}s)")
+        return audio
+
     def _run(self):
         porcupine = pvporcupine.create(
             access_key=self.access_key,
             keyword_paths=[str(self.keyword_path)],
             sensitivities=[self.sensitivity],
         )
-
-        pa = pyaudio.PyAudio()
-        stream = pa.open(
-            rate=porcupine.sample_rate,
-            channels=1,
-            format=pyaudio.paInt16,
-            input=True,
-            frames_per_buffer=porcupine.frame_length,
-        )
+        if porcupine.sample_rate != SAMPLE_RATE:
+            raise ValueError(f"[WAKEWORD] Porcupine wants {porcupine.sample_rate} Hz, hub gives {SAMPLE_RATE} Hz")
+        reader = self.hub.reader("porcupine")
+        self.vad = make_vad(block_ms=1000 * porcupine.frame_length // SAMPLE_RATE)
 
         try:
             while self._running:
                 # Only listen while LOOKING
                 if self.controller.get_state() != AssistantState.LOOKING:
+                    reader.seek_live()
                     time.sleep(0.05)
                     continue
 
-                pcm = stream.read(porcupine.frame_length, exception_on_overflow=False)
-                pcm = struct.unpack_from(
-                    "h" * porcupine.frame_length, pcm
-                )
+                frame = reader.read(porcupine.frame_length)
+                if frame is None:
+                    continue
+                self.vad.observe(frame)
+                pcm = (np.clip(frame, -1.0, 1.0) * 32767).astype(np.int16)
 
-                result = porcupine.process(pcm)
+                result = porcupine.process(pcm.tolist())
                 if result >= 0:
                     logger.info("[WAKEWORD] Detected: hey amy")
-                    self.bus.publish(WAKEWORD_DETECTED, None)
+                    payload = None
+                    if config.WAKE_COMMAND_ENABLED:
+                        audio = self._capture_command(reader, porcupine)
+                        if audio is not None:
+                            payload = {"source": "porcupine", "command_audio": audio}
+                    self.bus.publish(WAKEWORD_DETECTED, payload)
         finally:
-            stream.close()
-            pa.terminate()
             porcupine.delete()
@@ -2,29 +2,40 @@
 import threading
 import time
 import json
-import queue
-import sounddevice as sd
+
+import numpy as np
 from vosk import Model, KaldiRecognizer
 from loguru import logger
 
+import config
 from core.event_names import WAKEWORD_DETECTED
 from core.states import AssistantState
 from config import VOSK_MODEL_PATH, VOSK_WAKEWORD
+from services.audio_capture import SAMPLE_RATE
 
-MIC_SAMPLE_RATE = 44100
-MIC_CHANNELS = 1
+BLOCK_SAMPLES = 2880   # 180 ms @ 16 kHz
 
 _vosk_model_cache = None
 
 class WakeWordService:
-    def __init__(self, bus, controller):
+    """
+    Vosk wake word on the shared capture hub. The thread lives as long as
+    the service and only feeds the recognizer while LOOKING; in any other
+    state the reader stays at the live edge, and a fresh recognizer is
+    made when listening resumes.
+    """
+
+    def __init__(self, bus, controller, hub):
         self.bus = bus
         self.controller = controller
+        self.hub = hub
 
         self._running = False
         self._thread = None
 
     def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
         self._running = True
         self._thread = threading.Thread(target=self._run, daemon=True)
         self._thread.start()
@@ -33,6 +44,37 @@ class WakeWordService:
     def stop(self):
         self._running = False
 
+    # ---------- wake + command in one utterance ----------
+    @staticmethod
+    def _wake_end(words: list) -> int | None:
+        """Index of the last word of the wake phrase in a Vosk word list."""
+        n = len(VOSK_WAKEWORD.split())
+        for i in range(len(words) - n + 1):
+            if VOSK_WAKEWORD in " ".join(w.get("word", "") for w in words[i:i + n]):
+                return i + n - 1
+        return None
+
+    def _command_audio(self, result: dict, base: int, end: int):
+        """
+        Audio spoken after the wake phrase in this utterance (a copy out of
+        the ring), or None when the utterance was (nearly) just the wake
+        phrase. Vosk word times count from the recognizer's first sample,
+        which sits at hub position `base`; `end` is the position fed so far.
+        """
+        words = result.get("result") or []
+        end_idx = self._wake_end(words)
+        if end_idx is None or end_idx == len(words) - 1:
+            return None
+
+        start = max(base + int(words[end_idx]["end"] * SAMPLE_RATE), end - self.hub.capacity)
+        n = min(end - start, config.WAKE_COMMAND_MAX_MS * SAMPLE_RATE // 1000)
+        if n * 1000 < config.WAKE_COMMAND_MIN_MS * SAMPLE_RATE:
+            return None
+
+        heard = " ".join(w["word"] for w in words[end_idx + 1:])
+        logger.info(f"[WAKEWORD] Command follows wake phrase ({n / SAMPLE_RATE:.2f}s): {heard!r}")
+        return self.hub.window(start, n).copy()
+
     def _load_model(self):
         global _vosk_model_cache
         if _vosk_model_cache is None:
@@ -40,47 +82,53 @@ class WakeWordService:
             _vosk_model_cache = Model(str(VOSK_MODEL_PATH))
         return _vosk_model_cache
 
+    def _new_recognizer(self, model):
+        recognizer = KaldiRecognizer(model, SAMPLE_RATE)
+        if config.WAKE_COMMAND_ENABLED:
+            recognizer.SetWords(True)
+        return recognizer
+
     def _run(self):
         model = self._load_model()
-        recognizer = KaldiRecognizer(model, MIC_SAMPLE_RATE)
-
-        audio_q = queue.Queue()
-
-        def callback(indata, frames, time_info, status):
-            if status:
-                logger.warning(f"[WAKEWORD] Audio status: {status}")
-            audio_q.put(bytes(indata))
+        reader = self.hub.reader("wakeword")
+        recognizer, base = None, 0
 
         try:
-            with sd.RawInputStream(
-                samplerate=MIC_SAMPLE_RATE,
-                blocksize=8000,
-                dtype="int16",
-                channels=MIC_CHANNELS,
-                callback=callback,
-            ):
-                while self._running:
-                    # Only listen while LOOKING
-                    if self.controller.get_state() != AssistantState.LOOKING:
-                        time.sleep(0.05)
+            while self._running:
+                # Only listen while LOOKING
+                if self.controller.get_state() != AssistantState.LOOKING:
+                    recognizer = None
+                    reader.seek_live()
+                    time.sleep(0.05)
+                    continue
+
+                if recognizer is None:
+                    recognizer = self._new_recognizer(model)
+                    base = reader.position
+
+                block = reader.read(BLOCK_SAMPLES)
+                if block is None:
+                    continue
+                pcm = (np.clip(block, -1.0, 1.0) * 32767).astype(np.int16)
+
+                if recognizer.AcceptWaveform(pcm.tobytes()):
+                    result = json.loads(recognizer.Result())
+                    text = result.get("text", "").lower()
+
+                    if not text:
                         continue
 
-                    data = audio_q.get()
-
-                    if recognizer.AcceptWaveform(data):
-                        result = json.loads(recognizer.Result())
-                        text = result.get("text", "").lower()
-
-                        if not text:
-                            continue
-
-                        logger.debug(f"[WAKEWORD] Heard: {text}")
-
-                        if VOSK_WAKEWORD in text:
-                            logger.info(f"[WAKEWORD] Detected: {VOSK_WAKEWORD}")
-                            self._running = False # stop mic upon wakeword detected
-                            self.bus.publish(WAKEWORD_DETECTED, None)
-                            break # exit loop to close mic stream
+                    logger.debug(f"[WAKEWORD] Heard: {text}")
+
+                    if VOSK_WAKEWORD in text:
+                        logger.info(f"[WAKEWORD] Detected: {VOSK_WAKEWORD}")
+                        payload = None
+                        if config.WAKE_COMMAND_ENABLED:
+                            audio = self._command_audio(result, base, reader.position)
+                            if audio is not None:
+                                payload = {"source": "vosk", "command_audio": audio}
+                        recognizer = None
+                        self.bus.publish(WAKEWORD_DETECTED, payload)
 
         except Exception as e:
             logger.exception(f"[WAKEWORD] Vosk error: {e}")
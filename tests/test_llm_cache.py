@@ -0,0 +1,23 @@
+# AImy/tests/test_llm_cache.py
+from pathlib import Path
+import sys
+
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+pytest.importorskip("loguru")
+
+from services.llm_cache import LLMResponseCache, normalize_prompt
+
+
+def test_arithmetic_prompts_get_different_keys():
+    prompts = ["What is 5+3?", "what is 5-3", "What is 5*3", "What is 5/3", "What is 12.5% of 8?", "What is 125 of 8?"]
+    keys = {LLMResponseCache.make_key(p, system="s") for p in prompts}
+    assert len(keys) == len(prompts)
+
+
+def test_case_whitespace_and_trailing_punctuation_fold():
+    assert normalize_prompt("  What   IS the time?! ") == normalize_prompt("what is the time")
+    assert LLMResponseCache.make_key("Hello, there.", system="s") == LLMResponseCache.make_key("hello, there", system="s")
@@ -0,0 +1,71 @@
+# AImy/tests/test_llm_prompt_fit.py
+from pathlib import Path
+import sys
+
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+pytest.importorskip("transformers")
+pytest.importorskip("axengine")
+
+import config
+from adapters.llm_conversation import Conversation
+from adapters.llm_qwen import QwenAdapter
+
+
+class CharTokenizer:
+    """One id per character; enough for prompt-length bookkeeping."""
+    eos_token_id = 1
+
+    def encode(self, text, add_special_tokens=False):
+        return [ord(c) for c in text]
+
+
+@pytest.fixture
+def adapter():
+    llm = QwenAdapter("unused", "unused")
+    llm.tokenizer = CharTokenizer()
+    llm._prefix_ids = [2] * 20
+    llm._user_tail_ids = [3] * 5
+    llm._turn_sep_ids = [4] * 3
+    llm._fragments_ok = True
+    llm.persona = "default"
+    llm.max_context = config.LLM_REPLY_RESERVE + 200
+    return llm
+
+
+def test_user_turn_longer_than_context_is_truncated(adapter):
+    conv = Conversation()
+    conv.persona = "default"
+    conv.turns = [[5] * 50]
+
+    token_ids, start_pos, user_start = adapter._prepare_prompt("x" * 1000, conv)
+
+    assert len(token_ids) <= adapter.max_context - config.LLM_REPLY_RESERVE
+    assert token_ids[:20] == adapter._prefix_ids
+    assert token_ids[-5:] == adapter._user_tail_ids
+    assert conv.turns == []
+    assert user_start == 20
+
+
+def test_short_user_turn_keeps_history(adapter):
+    conv = Conversation()
+    conv.persona = "default"
+    conv.turns = [[5] * 50]
+
+    token_ids, _, user_start = adapter._prepare_prompt("hello", conv)
+
+    assert user_start == 70
+    assert token_ids == adapter._prefix_ids + [5] * 50 + [ord(c) for c in "hello"] + [3] * 5
+
+
+def test_no_room_for_user_turn_raises(adapter):
+    conv = Conversation()
+    conv.persona = "default"
+    conv.turns = [[5] * 50]
+    adapter.max_context = config.LLM_REPLY_RESERVE + 24
+
+    with pytest.raises(ValueError, match="No room for a user turn"):
+        adapter._prepare_prompt("x" * 100, conv)
@@ -5,6 +5,7 @@ import threading
 import argparse
 import subprocess
 import queue
+import json
 import requests
 from services.vision.frame_broadcast import get_jpeg_frame
 import services.vision.frame_broadcast as fb
@@ -24,14 +25,46 @@ def push_state_change(payload):
     if state:
         state_queue.put(state)
 
+# Chat events for /chat/stream:
+#   ("message", {"id", "role", "text"})  whole message (replaces an id's text)
+#   ("delta",   {"id", "delta"})         append to a streaming assistant message
+# chat_buffer keeps assembled messages for replay; chat_by_id points at the
+# buffered dict so deltas extend it in place.
 chat_queue = queue.Queue()
 CHAT_BUFFER_SIZE = 50
 chat_buffer = deque(maxlen=CHAT_BUFFER_SIZE)
+chat_by_id = {}
+chat_lock = threading.Lock()
 
-def push_chat_message(role, text):
-    msg = {"role": role, "text": text}
-    chat_queue.put(msg)
-    chat_buffer.append(msg)   
+def _buffer_message(msg):
+    chat_buffer.append(msg)
+    if msg.get("id"):
+        chat_by_id[msg["id"]] = msg
+    live = {id(m) for m in chat_buffer}
+    for k in [k for k, m in chat_by_id.items() if id(m) not in live]:
+        del chat_by_id[k]
+
+def push_chat_message(role, text, msg_id=None):
+    msg = {"id": msg_id, "role": role, "text": text}
+    with chat_lock:
+        existing = chat_by_id.get(msg_id) if msg_id else None
+        if existing is not None:
+            existing["text"] = text
+        else:
+            _buffer_message(msg)
+    chat_queue.put(("message", dict(msg)))
+
+def push_chat_delta(msg_id, delta):
+    with chat_lock:
+        msg = chat_by_id.get(msg_id)
+        if msg is None:
+            _buffer_message({"id": msg_id, "role": "assistant", "text": delta})
+        else:
+            msg["text"] += delta
+    chat_queue.put(("delta", {"id": msg_id, "delta": delta}))
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 LOG_FILE = os.path.join(os.path.dirname(__file__), "..", "assistant.log")
 
@@ -129,15 +162,17 @@ def mic_stream():
 @app.route("/chat/stream")
 def chat_stream():
     def generate():
-        # replay existing chat
-        for msg in chat_buffer:
-            yield f"data: {msg['role']}|{msg['text']}\n\n"
+        # replay existing chat (streaming messages as assembled so far)
+        with chat_lock:
+            replay = [dict(m) for m in chat_buffer]
+        for msg in replay:
+            yield _sse("message", msg)
 
         # live stream
         while True:
             try:
-                msg = chat_queue.get(timeout=1)
-                yield f"data: {msg['role']}|{msg['text']}\n\n"
+                event, data = chat_queue.get(timeout=1)
+                yield _sse(event, data)
             except queue.Empty:
                 yield ": keepalive\n\n"
     return Response(generate(), mimetype="text/event-stream")
@@ -165,9 +200,14 @@ def chat_submit():
 @app.route("/push_chat", methods=["POST"])
 def push_chat():
     data = request.get_json(force=True)
-    msg = {"role": data["role"], "text": data["text"]}
-    chat_queue.put(msg)
-    chat_buffer.append(msg)
+    push_chat_message(data["role"], data["text"], data.get("id"))
+    return {"ok": True}
+
+@app.route("/push_chat_delta", methods=["POST"])
+def push_chat_delta_route():
+    data = request.get_json(force=True)
+    if data.get("id") and data.get("delta"):
+        push_chat_delta(data["id"], data["delta"])
     return {"ok": True}
 
 # ----------------- HEADER BUTTONS ------------
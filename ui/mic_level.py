@@ -1,5 +1,6 @@
 # core/mic_level.py
 import queue
+import numpy as np
 
 mic_level_queue = queue.Queue(maxsize=5)
 
@@ -8,3 +9,12 @@ def publish_mic_level(level: float):
         mic_level_queue.put_nowait(level)
     except queue.Full:
         pass
+
+
+def publish_block_level(block):
+    """Capture-hub listener: one meter reading per 16 kHz float32 block."""
+    if len(block) == 0:
+        return
+    energy = float(np.sqrt(np.mean(block * block, dtype=np.float32)))
+    # Map ~0.01–0.06 RMS → 0.0–1.0
+    publish_mic_level(min(1.0, max(0.0, (energy - 0.01) * 20)))
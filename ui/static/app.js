@@ -119,20 +119,43 @@ document.addEventListener("DOMContentLoaded", () => {
 
   const chatSource = new EventSource("/chat/stream");
 
-  chatSource.onmessage = (event) => {
-    const data = event.data;
-    if (!data || !data.includes("|")) return;
+  // assistant messages stream in as deltas keyed by message id
+  const chatById = new Map();
 
-    const [role, text] = data.split("|", 2);
-    if (!text) return;
+  function atBottom() {
+    return chatHistory.scrollHeight - chatHistory.scrollTop - chatHistory.clientHeight < 40;
+  }
 
-    const msg = document.createElement("div");
-    msg.className = `chat-msg ${role}`;
-    msg.textContent = text;
+  function chatBubble(id, role) {
+    let msg = id ? chatById.get(id) : null;
+    if (!msg) {
+      msg = document.createElement("div");
+      msg.className = `chat-msg ${role}`;
+      chatHistory.appendChild(msg);
+      if (id) chatById.set(id, msg);
+    }
+    return msg;
+  }
 
-    chatHistory.appendChild(msg);
-    chatHistory.scrollTop = chatHistory.scrollHeight;
-  };
+  // whole message: new bubble, or final text for a streamed one
+  chatSource.addEventListener("message", (event) => {
+    const data = JSON.parse(event.data);
+    if (!data.text && !chatById.has(data.id)) return;
+
+    const stick = atBottom();
+    chatBubble(data.id, data.role).textContent = data.text;
+    if (stick) chatHistory.scrollTop = chatHistory.scrollHeight;
+  });
+
+  chatSource.addEventListener("delta", (event) => {
+    const data = JSON.parse(event.data);
+    if (!data.delta) return;
+
+    const stick = atBottom();
+    const msg = chatBubble(data.id, "assistant");
+    msg.textContent = msg.textContent + data.delta;
+    if (stick) chatHistory.scrollTop = chatHistory.scrollHeight;
+  });
 
   chatSource.onerror = (err) => {
     console.error("[CHAT SSE ERROR]", err);